@@ -0,0 +1,107 @@
+"""
+Model registry admin endpoints
+List model versions, activate one (loaded and warmed up in the background,
+then swapped in atomically) and roll back to the previous one
+"""
+
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.core.security import admin_enabled, admin_token_valid
+from app.models_ml.model_loader import ActivationInProgressError, ml_models
+from app.schemas.model_registry import (
+    ModelActivationResponse,
+    ModelVersionInfo,
+    ModelVersionsResponse,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _check_token(token: Optional[str]):
+    # Sin ADMIN_TOKEN configurado los endpoints quedan cerrados
+    if not admin_enabled():
+        raise HTTPException(
+            status_code=403,
+            detail="Administración de modelos deshabilitada: configure ADMIN_TOKEN",
+        )
+    if not admin_token_valid(token):
+        raise HTTPException(status_code=401, detail="Token de administración inválido")
+
+
+def _in_progress() -> HTTPException:
+    """409 when another activation or rollback holds the registry"""
+    return HTTPException(
+        status_code=409, detail="Ya hay una activación de modelos en curso"
+    )
+
+
+@router.get("/models", response_model=ModelVersionsResponse)
+async def list_models(x_admin_token: Optional[str] = Header(default=None)):
+    """List discovered model versions and which one is serving"""
+    _check_token(x_admin_token)
+    versions = [ModelVersionInfo(**v) for v in ml_models.list_versions()]
+    active = next((v.version for v in versions if v.active), None)
+    return ModelVersionsResponse(
+        active_version=active,
+        activating=ml_models.is_activating(),
+        previous_versions=ml_models.previous_versions(),
+        versions=versions,
+    )
+
+
+@router.post(
+    "/models/{version}/activate",
+    response_model=ModelActivationResponse,
+    status_code=202,
+)
+async def activate_model(
+    version: str,
+    x_admin_token: Optional[str] = Header(default=None),
+):
+    """
+    Load, warm up and activate a model version without downtime
+
+    Returns immediately; the current version keeps serving until the new
+    one is ready. Poll GET /models for the result (a failed activation
+    shows up there with state "failed" and its error).
+    """
+    _check_token(x_admin_token)
+    try:
+        # Reserva la activación antes de responder: una segunda petición
+        # concurrente recibe 409 en lugar de quedar en cola
+        ml_models.start_activation(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Versión {version} no existe")
+    except ActivationInProgressError:
+        raise _in_progress()
+
+    return ModelActivationResponse(
+        version=version,
+        state="loading",
+        message="La versión se activará cuando termine su carga y calentamiento",
+    )
+
+
+@router.post("/models/rollback", response_model=ModelActivationResponse)
+async def rollback_model(x_admin_token: Optional[str] = Header(default=None)):
+    """Re-activate the previously active model version"""
+    _check_token(x_admin_token)
+    try:
+        # La versión anterior sigue en memoria: el cambio es inmediato
+        bundle = await run_in_threadpool(ml_models.rollback, blocking=False)
+    except ActivationInProgressError:
+        raise _in_progress()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error rolling back models: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Error al revertir la versión: {str(e)}"
+        )
+    return ModelActivationResponse(
+        version=bundle.name, state="active", message="Versión anterior reactivada"
+    )
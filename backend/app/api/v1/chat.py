@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.schemas.chat import ChatRequest, ChatResponse, ConversationResponse
 from app.schemas.user import UserCreate, UserResponse
 from app.services.chat_service import gemini_service
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
 from app.models import Conversation, Message
 from app.models.user import User
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import json
 import uuid
 
 
@@ -54,7 +58,7 @@ async def chat_endpoint(req: ChatRequest, db: Session = Depends(get_db)):
 
         try:
             # Usar servicio con session_id (gestiona historial en memoria)
-            response_text = gemini_service.generate_response(
+            response_text = await gemini_service.generate_response(
                 prompt=req.message, session_id=session_id
             )
 
@@ -66,8 +70,37 @@ async def chat_endpoint(req: ChatRequest, db: Session = Depends(get_db)):
             )
 
     # --- FLUJO 2: USUARIO REGISTRADO (BASE DE DATOS) ---
-    # Si hay user_id, usamos el flujo persistente original
+    # Si hay user_id, usamos el flujo persistente original.
+    # Las consultas (síncronas) van al threadpool para no bloquear el event loop
+    conversation, history_dicts = await run_in_threadpool(_load_conversation, db, req)
 
+    # 4. Generar respuesta con Gemini
+    try:
+        response_text = await gemini_service.generate_response(
+            req.message, history=history_dicts, history_key=str(conversation.id)
+        )
+    except Exception as e:
+        print(f"Error externo Gemini: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="El servicio de IA no está disponible momentáneamente",
+        )
+
+    # 5. Guardar interacción en una sola transacción atómica
+    await run_in_threadpool(
+        _save_interaction, db, conversation, req.message, response_text
+    )
+
+    return ChatResponse(
+        response=response_text,
+        conversation_id=str(conversation.id),
+    )
+
+
+def _load_conversation(
+    db: Session, req: ChatRequest
+) -> Tuple[Conversation, List[Dict[str, str]]]:
+    """Usuario, conversación e historial reciente del flujo registrado"""
     # 1. Obtener o crear usuario (con manejo de concurrencia)
     user = db.query(User).filter(User.id == req.user_id).first()
     if not user:
@@ -98,36 +131,30 @@ async def chat_endpoint(req: ChatRequest, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(conversation)
 
-    # 3. Obtener historial (limitado a últimos 20 mensajes para eficiencia)
+    # 3. Obtener historial reciente (el servicio lo ajusta al presupuesto de
+    # tokens y resume lo anterior)
     messages = (
         db.query(Message)
         .filter(Message.conversation_id == conversation.id)
         .order_by(Message.created_at.desc())
-        .limit(20)
+        .limit(settings.CHAT_HISTORY_LOAD_LIMIT)
         .all()
     )
     # Reordenar cronológicamente para el prompt
     messages.reverse()
 
     history_dicts = [{"role": msg.role, "content": msg.content} for msg in messages]
+    return conversation, history_dicts
 
-    # 4. Generar respuesta con Gemini
-    try:
-        response_text = gemini_service.generate_response(
-            req.message, history=history_dicts
-        )
-    except Exception as e:
-        print(f"Error externo Gemini: {e}")
-        raise HTTPException(
-            status_code=503,
-            detail="El servicio de IA no está disponible momentáneamente",
-        )
 
-    # 5. Guardar interacción en una sola transacción atómica
+def _save_interaction(
+    db: Session, conversation: Conversation, prompt: str, response_text: str
+):
+    """Guarda la pregunta y la respuesta en una sola transacción"""
     try:
         # Guardar mensaje del usuario
         user_message = Message(
-            conversation_id=conversation.id, role="user", content=req.message
+            conversation_id=conversation.id, role="user", content=prompt
         )
         db.add(user_message)
 
@@ -146,9 +173,100 @@ async def chat_endpoint(req: ChatRequest, db: Session = Depends(get_db)):
         print(f"Error guardando mensajes: {e}")
         raise HTTPException(status_code=500, detail="Error guardando la conversación")
 
-    return ChatResponse(
-        response=response_text,
-        conversation_id=str(conversation.id),
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Un evento Server-Sent Events con datos JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _load_conversation_for_stream(
+    req: ChatRequest,
+) -> Tuple[str, List[Dict[str, str]]]:
+    """Como _load_conversation, con su propia sesión (no dura todo el stream)"""
+    db = SessionLocal()
+    try:
+        conversation, history_dicts = _load_conversation(db, req)
+        return str(conversation.id), history_dicts
+    finally:
+        db.close()
+
+
+def _save_streamed_interaction(conversation_id: str, prompt: str, response_text: str):
+    db = SessionLocal()
+    try:
+        conversation = db.get(Conversation, conversation_id)
+        _save_interaction(db, conversation, prompt, response_text)
+    finally:
+        db.close()
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest, request: Request):
+    """
+    Chat con la respuesta en streaming (Server-Sent Events)
+
+    Eventos: ``meta`` (session_id o conversation_id), un ``token`` por
+    fragmento de texto de Gemini, y ``done`` con la respuesta completa una
+    vez guardada (o ``error``). Si el cliente se desconecta se cancela la
+    generación y no se guarda nada.
+    """
+    if not req.message or not req.message.strip():
+        raise HTTPException(status_code=400, detail="El mensaje no puede estar vacío")
+
+    session_id: Optional[str] = None
+    conversation_id: Optional[str] = None
+    history: Optional[List[Dict[str, str]]] = None
+    if req.session_id or not req.user_id:
+        # Sesión anónima: el servicio guarda el historial en memoria
+        session_id = req.session_id or str(uuid.uuid4())
+        meta = {"session_id": session_id}
+    else:
+        conversation_id, history = await run_in_threadpool(
+            _load_conversation_for_stream, req
+        )
+        meta = {"conversation_id": conversation_id}
+
+    async def events() -> AsyncIterator[str]:
+        yield _sse("meta", meta)
+        parts: List[str] = []
+        stream = gemini_service.stream_response(
+            req.message,
+            history=history,
+            session_id=session_id,
+            history_key=conversation_id,
+        )
+        try:
+            async for delta in stream:
+                if await request.is_disconnected():
+                    print("🔌 Cliente desconectado, generación cancelada")
+                    return
+                parts.append(delta)
+                yield _sse("token", {"text": delta})
+        except Exception as e:
+            print(f"Error en chat streaming: {e}")
+            yield _sse("error", {"detail": "El servicio de IA no está disponible"})
+            return
+        finally:
+            await stream.aclose()
+
+        response_text = "".join(parts)
+        if conversation_id:
+            try:
+                await run_in_threadpool(
+                    _save_streamed_interaction,
+                    conversation_id,
+                    req.message,
+                    response_text,
+                )
+            except HTTPException as e:
+                yield _sse("error", {"detail": e.detail})
+                return
+        yield _sse("done", {"response": response_text, **meta})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
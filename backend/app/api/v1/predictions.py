@@ -4,13 +4,19 @@ Endpoints for ML predictions: price classification and anomaly detection
 """
 
 from fastapi import APIRouter, HTTPException
+from pydantic import ValidationError
 from app.schemas.prediction import (
     PredioInput,
     PriceClassificationResponse,
     AnomalyDetectionResponse,
     PredictionFullResponse,
+    PredictionBatchRequest,
+    PredictionBatchItem,
+    PredictionBatchResponse,
 )
 from app.services.prediction_service import prediction_service
+from app.core.executor import inference_executor, InferenceSaturatedError
+from app.services.coalescer import prediction_coalescer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,6 +24,23 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _saturated(e: InferenceSaturatedError) -> HTTPException:
+    """503 returned right away when the inference executor is full"""
+    logger.warning(f"Rejecting prediction request: {e}")
+    return HTTPException(
+        status_code=503,
+        detail="El servicio de predicción está saturado, intenta de nuevo",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _predict_single(kind: str, single_fn, predio: PredioInput) -> dict:
+    """Score one predio, through the micro-batching coalescer when enabled"""
+    if prediction_coalescer.enabled:
+        return await prediction_coalescer.submit(kind, predio.model_dump())
+    return await inference_executor.run(single_fn, predio.model_dump())
+
+
 @router.post("/classify-price", response_model=PriceClassificationResponse)
 async def classify_price(predio: PredioInput):
     """
@@ -26,8 +49,12 @@ async def classify_price(predio: PredioInput):
     Returns one of: ALTO, BAJO, MEDIO, LUJO
     """
     try:
-        result = prediction_service.clasificar_precio(predio.model_dump())
+        result = await _predict_single(
+            "clasificacion", prediction_service.clasificar_precio, predio
+        )
         return PriceClassificationResponse(**result)
+    except InferenceSaturatedError as e:
+        raise _saturated(e)
     except Exception as e:
         logger.error(f"Error in price classification endpoint: {e}")
         raise HTTPException(
@@ -43,8 +70,12 @@ async def detect_anomaly(predio: PredioInput):
     Returns anomaly detection result (possible fraud, money laundering, or data errors)
     """
     try:
-        result = prediction_service.detectar_anomalia(predio.model_dump())
+        result = await _predict_single(
+            "anomalia", prediction_service.detectar_anomalia, predio
+        )
         return AnomalyDetectionResponse(**result)
+    except InferenceSaturatedError as e:
+        raise _saturated(e)
     except Exception as e:
         logger.error(f"Error in anomaly detection endpoint: {e}")
         raise HTTPException(
@@ -60,10 +91,85 @@ async def full_prediction(predio: PredioInput):
     Returns both classification and anomaly detection results in a single call
     """
     try:
-        result = prediction_service.prediccion_completa(predio.model_dump())
+        result = await _predict_single(
+            "completa", prediction_service.prediccion_completa, predio
+        )
         return PredictionFullResponse(**result)
+    except InferenceSaturatedError as e:
+        raise _saturated(e)
     except Exception as e:
         logger.error(f"Error in full prediction endpoint: {e}")
         raise HTTPException(
             status_code=500, detail=f"Error al realizar predicción completa: {str(e)}"
         )
+
+
+def _score_batch(modo: str, predios: list) -> list:
+    """
+    Validate and score a batch; runs on the inference executor
+
+    Validating up to 50k rows is CPU-bound too, so it happens here, in the
+    same executor call as the models, and not on the event loop.
+    """
+    resultados: list = [None] * len(predios)
+    valid_indices = []
+    valid_predios = []
+
+    for idx, raw in enumerate(predios):
+        try:
+            valid_predios.append(PredioInput.model_validate(raw).model_dump())
+            valid_indices.append(idx)
+        except ValidationError as e:
+            campos = ", ".join(
+                ".".join(str(loc) for loc in err["loc"]) for err in e.errors()
+            )
+            resultados[idx] = PredictionBatchItem(
+                indice=idx, error=f"Datos inválidos en: {campos}"
+            )
+
+    if modo == "classify-price":
+        scored = [
+            {"clasificacion": r} if "error" not in r else r
+            for r in prediction_service.clasificar_precio_batch(valid_predios)
+        ]
+    elif modo == "detect-anomaly":
+        scored = [
+            {"deteccion_anomalia": r} if "error" not in r else r
+            for r in prediction_service.detectar_anomalia_batch(valid_predios)
+        ]
+    else:
+        scored = prediction_service.prediccion_completa_batch(valid_predios)
+
+    for idx, result in zip(valid_indices, scored):
+        resultados[idx] = PredictionBatchItem(indice=idx, **result)
+    return resultados
+
+
+@router.post("/batch", response_model=PredictionBatchResponse)
+async def batch_prediction(request: PredictionBatchRequest):
+    """
+    Score many properties in a single call
+
+    Each row is validated independently: invalid rows are reported with an
+    error in their position and do not fail the rest of the batch. Results
+    are returned in the same order as the input.
+    """
+    try:
+        resultados = await inference_executor.run(
+            _score_batch, request.modo, request.predios
+        )
+    except InferenceSaturatedError as e:
+        raise _saturated(e)
+    except Exception as e:
+        logger.error(f"Error in batch prediction endpoint: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Error al realizar predicción por lotes: {str(e)}"
+        )
+
+    fallidos = sum(1 for item in resultados if item.error is not None)
+    return PredictionBatchResponse(
+        total=len(resultados),
+        exitosos=len(resultados) - fallidos,
+        fallidos=fallidos,
+        resultados=resultados,
+    )
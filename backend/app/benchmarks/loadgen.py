@@ -0,0 +1,484 @@
+"""
+Concurrent load generator for the prediction and chat endpoints
+Drives /api/v1/predictions/* and /api/v1/chat with generated payloads, at a
+fixed concurrency (closed loop) or a fixed request rate (open loop), and
+reports throughput, latency percentiles and error rates per endpoint.
+
+With --in-process the ASGI app runs inside this process with the database
+and Gemini stubbed out, so no server or external service is needed.
+
+Usage:
+    python -m app.benchmarks.loadgen --in-process --concurrency 32 --duration 20
+    python -m app.benchmarks.loadgen --url http://127.0.0.1:8000 --rate 200
+    python -m app.benchmarks.loadgen --in-process --mix full=1,chat=1 --output load.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import httpx
+import numpy as np
+from app.services.synthetic_predios import categorias_de_modelos, generar_predios
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIX = "full=4,classify-price=2,detect-anomaly=2,batch=1,chat=1"
+
+ENDPOINTS = {
+    "full": "/api/v1/predictions/full",
+    "classify-price": "/api/v1/predictions/classify-price",
+    "detect-anomaly": "/api/v1/predictions/detect-anomaly",
+    "batch": "/api/v1/predictions/batch",
+    "chat": "/api/v1/chat",
+    "chat-stream": "/api/v1/chat/stream",
+}
+
+PREGUNTAS = [
+    "¿Qué es una anomalía en una transacción inmobiliaria?",
+    "¿Cómo se clasifica el rango de precio de un predio?",
+    "¿Qué significa la dinámica inmobiliaria?",
+    "¿Qué municipios tienen más transacciones atípicas?",
+    "Explícame qué es el código de naturaleza jurídica",
+]
+
+
+# ----------------------------------------------------------------------
+# In-process app with stubbed database and LLM
+# ----------------------------------------------------------------------
+
+
+class _StubGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates = []
+        self.function_calls = None
+
+
+class _StubGeminiModels:
+    """``client.aio.models`` answering after a fixed delay"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def generate_content(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return _StubGeminiResponse("Respuesta simulada para pruebas de carga.")
+
+    async def generate_content_stream(self, **kwargs):
+        return self._stream()
+
+    async def _stream(self):
+        # Primer fragmento a mitad de la latencia, el resto repartido
+        words = "Respuesta simulada para pruebas de carga.".split(" ")
+        await asyncio.sleep(self.latency / 2)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.latency / 2 / (len(words) - 1))
+            yield _StubGeminiResponse(word if i == 0 else " " + word)
+
+
+class StubGeminiClient:
+    """
+    Stand-in for ``genai.Client`` with a configurable response latency
+
+    Only the async API (``client.aio.models``) exists, the one GeminiService
+    uses.
+    """
+
+    def __init__(self, latency: float):
+        self.aio = type("Aio", (), {"models": _StubGeminiModels(latency)})()
+
+
+class _NoDatabase:
+    """Session stand-in: the load test only uses the anonymous chat flow"""
+
+    def __getattr__(self, name):
+        raise RuntimeError("Database access is disabled in in-process load tests")
+
+    def close(self):
+        pass
+
+
+def _no_db():
+    yield _NoDatabase()
+
+
+def build_in_process_app(models_path: Optional[str], llm_latency: float):
+    """ASGI app with models loaded, Gemini stubbed and no database"""
+    from app.core.database import get_db
+    from app.main import create_app
+    from app.models_ml.model_loader import ml_models
+    from app.services.chat_service import gemini_service
+
+    ml_models.load_models(path=Path(models_path) if models_path else None)
+    gemini_service.client = StubGeminiClient(llm_latency)
+    app = create_app()
+    app.dependency_overrides[get_db] = _no_db
+    return app
+
+
+# ----------------------------------------------------------------------
+# Requests
+# ----------------------------------------------------------------------
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse endpoint weights, e.g. "full=4,chat=1" -> {"full": 4.0, "chat": 1.0}"""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(
+                f"Unknown endpoint '{name}', expected one of {', '.join(ENDPOINTS)}"
+            )
+        weights[name] = float(weight or 1)
+    if not any(weights.values()):
+        raise ValueError("The endpoint mix needs at least one positive weight")
+    return weights
+
+
+class RequestFactory:
+    """Picks the next endpoint by weight and builds its payload"""
+
+    def __init__(
+        self,
+        mix: Dict[str, float],
+        predios: List[Dict[str, Any]],
+        batch_size: int,
+        chat_sessions: int,
+        seed: int,
+    ):
+        self.rng = random.Random(seed)
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.predios = itertools.cycle(predios)
+        self.pool = predios
+        self.batch_size = batch_size
+        self.sessions = [
+            str(uuid.UUID(int=self.rng.getrandbits(128))) for _ in range(chat_sessions)
+        ]
+
+    def next(self) -> Tuple[str, Dict[str, Any]]:
+        name = self.rng.choices(self.names, self.weights)[0]
+        return name, self.payload(name)
+
+    def payload(self, name: str) -> Dict[str, Any]:
+        if name == "batch":
+            start = self.rng.randrange(len(self.pool))
+            rows = [
+                self.pool[(start + i) % len(self.pool)] for i in range(self.batch_size)
+            ]
+            return {"predios": rows, "modo": "full"}
+        if name in ("chat", "chat-stream"):
+            return {
+                "message": self.rng.choice(PREGUNTAS),
+                "session_id": self.rng.choice(self.sessions),
+            }
+        return next(self.predios)
+
+
+class Recorder:
+    """Latencies and outcomes per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name: str, latency: float, status: str):
+        self.latencies[name].append(latency)
+        self.statuses[name][status] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        all_latencies: List[float] = []
+        total_errors = 0
+        for name in sorted(self.latencies):
+            latencies = self.latencies[name]
+            all_latencies.extend(latencies)
+            errors = sum(
+                n for s, n in self.statuses[name].items() if not s.startswith("2")
+            )
+            total_errors += errors
+            endpoints[name] = _summary(latencies, errors, elapsed)
+            endpoints[name]["status_codes"] = dict(self.statuses[name])
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "overall": _summary(all_latencies, total_errors, elapsed),
+            "endpoints": endpoints,
+        }
+
+
+def _summary(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    n = len(latencies)
+    if n == 0:
+        return {"requests": 0}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "requests": n,
+        "errors": errors,
+        "error_rate": errors / n,
+        "throughput_rps": n / elapsed if elapsed > 0 else None,
+        "latency_ms": {
+            "mean": float(values.mean()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(values.max()),
+        },
+    }
+
+
+async def _send(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    name: str,
+    payload: Dict[str, Any],
+    started: float,
+):
+    """Send one request; latency is measured from ``started``"""
+    try:
+        response = await client.post(ENDPOINTS[name], json=payload)
+        status = str(response.status_code)
+    except httpx.TimeoutException:
+        status = "timeout"
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    recorder.record(name, time.perf_counter() - started, status)
+
+
+async def run_closed_loop(
+    client: httpx.AsyncClient,
+    factory: RequestFactory,
+    recorder: Recorder,
+    concurrency: int,
+    duration: float,
+    max_requests: Optional[int],
+):
+    """``concurrency`` virtual users, each sending its next request on reply"""
+    deadline = time.perf_counter() + duration
+    sent = itertools.count()
+
+    async def user():
+        while time.perf_counter() < deadline:
+            if max_requests is not None and next(sent) >= max_requests:
+                return
+            name, payload = factory.next()
+            await _send(client, recorder, name, payload, time.perf_counter())
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+
+
+async def run_open_loop(
+    client: httpx.AsyncClient,
+    factory: RequestFactory,
+    recorder: Recorder,
+    rate: float,
+    duration: float,
+    max_requests: Optional[int],
+    max_in_flight: int,
+):
+    """
+    Start requests at ``rate`` per second regardless of the replies
+
+    Latency counts from the scheduled start, so time spent waiting for an
+    in-flight slot is included (no coordinated omission).
+    """
+    start = time.perf_counter()
+    total = int(rate * duration)
+    if max_requests is not None:
+        total = min(total, max_requests)
+    slots = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+
+    async def fire(name, payload, scheduled):
+        async with slots:
+            await _send(client, recorder, name, payload, scheduled)
+
+    for i in range(total):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        name, payload = factory.next()
+        task = asyncio.create_task(fire(name, payload, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def run_load(args) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+
+    if args.in_process:
+        app = build_in_process_app(args.models_path, args.llm_latency_ms / 1000)
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://loadgen"
+        from app.models_ml.model_loader import ml_models
+
+        categorias = categorias_de_modelos(ml_models.active())
+    else:
+        transport = None
+        base_url = args.url
+        categorias = {}
+
+    predios = generar_predios(
+        args.payload_pool,
+        seed=args.seed,
+        departamentos=categorias.get("DEPARTAMENTO"),
+        municipios=categorias.get("MUNICIPIO"),
+    )
+    factory = RequestFactory(
+        mix, predios, args.batch_size, args.chat_sessions, seed=args.seed
+    )
+    recorder = Recorder()
+    max_in_flight = args.concurrency
+
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url=base_url,
+        timeout=args.timeout,
+        limits=httpx.Limits(
+            max_connections=max_in_flight, max_keepalive_connections=max_in_flight
+        ),
+    ) as client:
+        # Una petición por endpoint antes de medir (carga perezosa de modelos)
+        warmup = Recorder()
+        for name in mix:
+            await _send(
+                client, warmup, name, factory.payload(name), time.perf_counter()
+            )
+
+        started = time.perf_counter()
+        if args.rate:
+            await run_open_loop(
+                client,
+                factory,
+                recorder,
+                args.rate,
+                args.duration,
+                args.requests,
+                max_in_flight,
+            )
+        else:
+            await run_closed_loop(
+                client,
+                factory,
+                recorder,
+                args.concurrency,
+                args.duration,
+                args.requests,
+            )
+        elapsed = time.perf_counter() - started
+
+    report = recorder.report(elapsed)
+    report["config"] = {
+        "target": "in-process" if args.in_process else args.url,
+        "mode": f"rate={args.rate}/s" if args.rate else "closed-loop",
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": mix,
+        "batch_size": args.batch_size,
+        "payload_pool": args.payload_pool,
+        "llm_latency_ms": args.llm_latency_ms if args.in_process else None,
+    }
+    return report
+
+
+def _print_report(report: Dict[str, Any]):
+    print(
+        f"{'endpoint':<16}{'requests':>9}{'err%':>7}{'req/s':>9}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    )
+    rows = list(report["endpoints"].items()) + [("overall", report["overall"])]
+    for name, summary in rows:
+        if not summary.get("requests"):
+            continue
+        latency = summary["latency_ms"]
+        print(
+            f"{name:<16}{summary['requests']:>9}{summary['error_rate'] * 100:>7.1f}"
+            f"{summary['throughput_rps']:>9.1f}{latency['p50']:>9.1f}"
+            f"{latency['p95']:>9.1f}{latency['p99']:>9.1f}{latency['max']:>9.1f}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.benchmarks.loadgen",
+        description="Concurrent load test of the IMDADIC prediction and chat API",
+    )
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument(
+        "--url", default="http://127.0.0.1:8000", help="Base URL of a running API"
+    )
+    target.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run the ASGI app in this process with stubbed DB and Gemini",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="Virtual users (closed loop) or max in-flight requests (with --rate)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help="Requests per second (open loop); default is closed loop",
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds")
+    parser.add_argument(
+        "--requests", type=int, default=None, help="Stop after this many requests"
+    )
+    parser.add_argument(
+        "--mix",
+        default=DEFAULT_MIX,
+        help=f"Endpoint weights (default {DEFAULT_MIX})",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="Predios per /batch request"
+    )
+    parser.add_argument(
+        "--payload-pool",
+        type=int,
+        default=1000,
+        help="Distinct predios cycled through (small pools hit the cache)",
+    )
+    parser.add_argument(
+        "--chat-sessions", type=int, default=50, help="Distinct chat session ids"
+    )
+    parser.add_argument(
+        "--llm-latency-ms",
+        type=float,
+        default=300.0,
+        help="Latency of the stubbed Gemini client (--in-process)",
+    )
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--models-path", default=None, help="Model directory (--in-process)"
+    )
+    parser.add_argument("--output", type=Path, default=None, help="JSON report file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run_load(args))
+    _print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
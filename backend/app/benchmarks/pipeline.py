@@ -0,0 +1,307 @@
+"""
+Per-stage microbenchmarks of the prediction pipeline
+Times each stage of PredictionService in-process (no server) at several
+batch sizes and writes the results as JSON, to compare releases.
+
+Usage:
+    python -m app.benchmarks.pipeline --output bench.json
+    python -m app.benchmarks.pipeline --sizes 1 100 10000 --compare bench.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import logging
+from app.services.synthetic_predios import categorias_de_modelos, generar_predios
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+STAGES = [
+    "normalize_text",
+    "preparar",
+    "encode",
+    "scale",
+    "lightgbm_predict",
+    "iforest_flat",
+    "iforest_sklearn",
+    "end_to_end",
+]
+
+# Tiempo mínimo medido por etapa y tamaño (se repite hasta alcanzarlo)
+DEFAULT_MIN_TIME = 0.5
+MIN_REPEATS = 3
+MAX_REPEATS = 1000
+
+# Diferencias menores a esto se consideran ruido al comparar corridas
+NOISE_FLOOR_S = 20e-6
+
+
+def _measure(fn: Callable[[], Any], min_time: float) -> List[float]:
+    """Run ``fn`` until ``min_time`` seconds were measured (3+ runs)"""
+    fn()  # calentamiento, fuera de la medición
+    times: List[float] = []
+    while len(times) < MIN_REPEATS or (
+        sum(times) < min_time and len(times) < MAX_REPEATS
+    ):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def _stage_functions(
+    service, models, predios: List[Dict[str, Any]]
+) -> Dict[str, Callable[[], Any]]:
+    """Zero-argument callables for each stage, inputs prepared beforehand"""
+    preprocessor = models.get_anomaly_preprocessor()
+    prepared = service.preparar(predios, models)
+    classifier_view = prepared.classifier_view()
+    anomaly_view = prepared.anomaly_view()
+    matrix = preprocessor.transform(anomaly_view)
+    unscaled = matrix.copy()
+    textos = [p.get("DEPARTAMENTO") for p in predios] + [
+        p.get("MUNICIPIO") for p in predios
+    ]
+    encoded_columns = {
+        col: anomaly_view[col] for col in preprocessor.encoders if col in anomaly_view
+    }
+    iforest = models.get_anomaly_detector()
+    scorer = models.get_anomaly_scorer()
+
+    def iforest_sklearn():
+        with warnings.catch_warnings():
+            # Matriz sin nombres de columnas, igual que en producción
+            warnings.simplefilter("ignore")
+            iforest.predict(matrix)
+            iforest.score_samples(matrix)
+
+    return {
+        # Llamada por fila, como en la ruta original (preparar deduplica)
+        "normalize_text": lambda: [service._normalize_text(t) for t in textos],
+        # Normalización + construcción del DataFrame + categorías
+        "preparar": lambda: service.preparar(predios, models),
+        "encode": lambda: [
+            preprocessor.encode(col, values) for col, values in encoded_columns.items()
+        ],
+        # En el lugar: el costo no depende de los valores
+        "scale": lambda: preprocessor.scale_columns(unscaled),
+        "lightgbm_predict": lambda: models.get_classifier().predict(classifier_view),
+        "iforest_flat": lambda: scorer.predict_and_score(matrix),
+        "iforest_sklearn": iforest_sklearn,
+        "end_to_end": lambda: service.prediccion_completa_batch(predios, models),
+    }
+
+
+def run_benchmarks(
+    sizes: List[int],
+    stages: List[str],
+    min_time: float = DEFAULT_MIN_TIME,
+    seed: int = 0,
+    models_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Time every stage at every batch size
+
+    Returns:
+        {"meta": {...}, "results": [{"stage", "batch_size", "repeats",
+        "min_s", "median_s", "mean_s", "max_s", "rows_per_s", "us_per_row"}]}
+    """
+    from app.models_ml.model_loader import ml_models
+    from app.services.prediction_service import PredictionService
+
+    ml_models.load_models(path=Path(models_path) if models_path else None)
+    models = ml_models.active()
+    # Sin caché: se mide el cómputo, no los aciertos
+    service = PredictionService()
+    categorias = categorias_de_modelos(models)
+    all_predios = generar_predios(
+        max(sizes),
+        seed=seed,
+        departamentos=categorias.get("DEPARTAMENTO"),
+        municipios=categorias.get("MUNICIPIO"),
+    )
+
+    started = time.perf_counter()
+    results = []
+    for size in sizes:
+        functions = _stage_functions(service, models, all_predios[:size])
+        for stage in stages:
+            times = _measure(functions[stage], min_time)
+            median = statistics.median(times)
+            results.append(
+                {
+                    "stage": stage,
+                    "batch_size": size,
+                    "repeats": len(times),
+                    "min_s": min(times),
+                    "median_s": median,
+                    "mean_s": statistics.fmean(times),
+                    "max_s": max(times),
+                    "rows_per_s": size / median if median > 0 else None,
+                    "us_per_row": median / size * 1e6,
+                }
+            )
+            logger.info(
+                f"{stage:>18} n={size:<7} median {median * 1000:10.3f} ms "
+                f"({median / size * 1e6:9.2f} µs/row, {len(times)} runs)"
+            )
+
+    return {
+        "meta": _environment(models, seed, min_time, time.perf_counter() - started),
+        "results": results,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment(models, seed: int, min_time: float, elapsed: float) -> Dict:
+    packages = {}
+    for package in ("numpy", "pandas", "lightgbm", "scikit-learn"):
+        try:
+            packages[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            packages[package] = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "model_version": models.name,
+        "model_fingerprint": models.get_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "packages": packages,
+        "seed": seed,
+        "min_time_s": min_time,
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> List[Dict[str, Any]]:
+    """
+    Best time of each (stage, batch_size) against a previous run
+
+    The minimum over the repeats is compared because it is the least
+    sensitive to scheduler noise; slowdowns under ``NOISE_FLOOR_S`` are
+    ignored.
+
+    Returns:
+        Rows with ``ratio`` (current / baseline) and a ``regression`` flag
+        when the current run is slower by more than ``threshold``
+    """
+    previous = {(r["stage"], r["batch_size"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before = previous.get((result["stage"], result["batch_size"]))
+        if before is None or before["min_s"] <= 0:
+            continue
+        ratio = result["min_s"] / before["min_s"]
+        rows.append(
+            {
+                "stage": result["stage"],
+                "batch_size": result["batch_size"],
+                "baseline_s": before["min_s"],
+                "current_s": result["min_s"],
+                "ratio": ratio,
+                "regression": ratio > 1 + threshold
+                and result["min_s"] - before["min_s"] > NOISE_FLOOR_S,
+            }
+        )
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.benchmarks.pipeline",
+        description="Per-stage benchmarks of the IMDADIC prediction pipeline",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help=f"Batch sizes (default {' '.join(map(str, DEFAULT_SIZES))})",
+    )
+    parser.add_argument(
+        "--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to run"
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=DEFAULT_MIN_TIME,
+        help=f"Seconds measured per stage and size (default {DEFAULT_MIN_TIME})",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("bench_pipeline.json"),
+        help="JSON results file (default bench_pipeline.json)",
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        default=None,
+        help="Previous results file; exit 1 on regressions",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="Slowdown tolerated by --compare (default 0.15 = 15%%)",
+    )
+    parser.add_argument(
+        "--models-path", default=None, help="Directory with the model artifacts"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    report = run_benchmarks(
+        sorted(set(args.sizes)),
+        args.stages,
+        min_time=args.min_time,
+        seed=args.seed,
+        models_path=args.models_path,
+    )
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    logger.info(f"Results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        rows = compare(baseline, report, args.threshold)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(
+                f"{row['stage']:>18} n={row['batch_size']:<7} "
+                f"{row['baseline_s'] * 1000:10.3f} ms -> "
+                f"{row['current_s'] * 1000:10.3f} ms  x{row['ratio']:.2f} {flag}"
+            )
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 
 class Settings(BaseSettings):
-    GEMINI_API_KEY: str
+    # Opcional: sin clave la API arranca y solo el chat responde con error
+    GEMINI_API_KEY: str | None = None
     DEBUG: bool = True
 
     SYSTEM_PROMPT: str | None = None  # Se cargará desde knowledge_base
@@ -17,6 +18,61 @@ class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: str
 
+    # Inference executor (model calls run off the event loop)
+    INFERENCE_WORKERS: int = 4
+    INFERENCE_MAX_QUEUE: int = 64
+
+    # Prediction result cache
+    PREDICTION_CACHE_SIZE: int = 10000
+    PREDICTION_CACHE_TTL: int = 3600  # segundos
+
+    # Micro-batching of concurrent single-predio requests (opt-in)
+    PREDICTION_COALESCE_ENABLED: bool = False
+    PREDICTION_COALESCE_MAX_WAIT_MS: float = 5.0
+    PREDICTION_COALESCE_MAX_BATCH: int = 256
+
+    # Warm up the prediction pipeline after startup; /ready waits for it
+    MODEL_WARMUP: bool = True
+
+    # Anonymous chat sessions (least recently used evicted first)
+    # CHAT_SESSION_BACKEND: "memory" (one worker) or "sqlite" (shared by the
+    # workers of a host, WAL mode, at CHAT_SESSION_SQLITE_PATH)
+    CHAT_SESSION_BACKEND: str = "memory"
+    CHAT_SESSION_SQLITE_PATH: str = "data/chat_sessions.sqlite3"
+    CHAT_MAX_SESSIONS: int = 1000
+    CHAT_SESSION_TTL: int = 3600  # segundos
+    CHAT_SESSION_MAX_BYTES: int = 64 * 1024
+    CHAT_SESSIONS_MAX_TOTAL_BYTES: int = 64 * 1024 * 1024
+
+    # Chat history sent to Gemini: recent turns within a token budget, older
+    # ones folded into a rolling summary ("extractive" local or "gemini")
+    CHAT_HISTORY_TOKEN_BUDGET: int = 2000
+    CHAT_HISTORY_SUMMARY_TOKENS: int = 300
+    CHAT_HISTORY_SUMMARIZER: str = "extractive"
+    CHAT_HISTORY_SUMMARY_CACHE_SIZE: int = 1000
+    CHAT_HISTORY_LOAD_LIMIT: int = 50  # mensajes leídos de la BD por turno
+
+    # Per-turn retrieval of knowledge base chunks (BM25) with a short core
+    # prompt, instead of the full knowledge base as system prompt
+    CHAT_RETRIEVAL_ENABLED: bool = True
+    CHAT_RETRIEVAL_TOP_K: int = 4
+
+    # Answers served from memory for FAQ matches and repeated first questions
+    CHAT_ANSWER_CACHE_ENABLED: bool = True
+    CHAT_ANSWER_CACHE_SIZE: int = 1000
+    CHAT_ANSWER_CACHE_TTL: int = 3600  # segundos
+    CHAT_ANSWER_CACHE_THRESHOLD: float = 0.8  # similitud de Jaccard
+
+    # Model registry admin endpoints (X-Admin-Token header; disabled when unset)
+    ADMIN_TOKEN: str | None = None
+
+    # Per-request profiling (X-Profile: <ADMIN_TOKEN> header or sampling), written to PROFILING_DIR
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_PER_MINUTE: int = 6
+    PROFILING_MAX_FILES: int = 500
+
     class Config:
         env_file = str(BASE_DIR / ".env")
         env_file_encoding = "utf-8"
@@ -0,0 +1,107 @@
+"""
+Inference executor
+Runs CPU-bound model calls off the event loop, on a bounded thread pool
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+import logging
+from app.core.config import settings
+from app.core.metrics import INFERENCE_QUEUE_WAIT_SECONDS, INFERENCE_REJECTED
+from app.core.profiling import ProfileSession, active_session
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class InferenceSaturatedError(Exception):
+    """Raised when the executor already has its maximum number of pending calls"""
+
+
+class InferenceExecutor:
+    """
+    Thread pool dedicated to model inference.
+
+    LightGBM and NumPy release the GIL during the heavy work, so threads give
+    real parallelism while sharing the models already loaded in memory.
+    Calls beyond ``max_workers + max_queue`` are rejected immediately instead
+    of queueing without bound.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="inference"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Calls running or waiting in the queue"""
+        return self._pending
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls waiting for a free worker"""
+        return max(0, self._pending - self.max_workers)
+
+    @staticmethod
+    def _timed(
+        submitted: float, call: Callable[[], T], profile: Optional[ProfileSession]
+    ) -> T:
+        INFERENCE_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - submitted)
+        # Petición bajo perfilado: el trabajo del hilo se suma a su perfil
+        if profile is not None:
+            return profile.run(call)
+        return call()
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run ``fn(*args, **kwargs)`` on the pool and await its result.
+
+        Raises:
+            InferenceSaturatedError: if the pool and its queue are full
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                INFERENCE_REJECTED.inc()
+                raise InferenceSaturatedError(
+                    f"Inference queue full ({self._pending} pending calls)"
+                )
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(
+                self._timed,
+                time.perf_counter(),
+                partial(fn, *args, **kwargs),
+                active_session(),
+            )
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is released when the work really ends, even if the
+        # awaiting request is cancelled before that
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        logger.info("Shutting down inference executor")
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Global executor instance
+inference_executor = InferenceExecutor(
+    max_workers=settings.INFERENCE_WORKERS, max_queue=settings.INFERENCE_MAX_QUEUE
+)
@@ -0,0 +1,342 @@
+"""
+Prometheus-style metrics
+Lightweight counters, histograms and callback gauges rendered in the
+Prometheus text exposition format, plus an ASGI middleware that records
+request latency per route. Recording is a dict lookup and a bisect under a
+lock, cheap enough to stay enabled in production.
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Segundos: de 1 ms (caché, filas sueltas) a 10 s (lotes grandes, Gemini)
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+LabelValues = Tuple[str, ...]
+GaugeValue = Union[float, Dict[LabelValues, float]]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in items
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram per label combination"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiqueta: [conteos por bucket (+Inf al final), suma, total]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the ``with`` block (also on exceptions)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+        lines = self.header()
+        names = self.labelnames + ("le",)
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {n}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """
+    Gauge read at scrape time
+
+    ``callback`` returns a number, or a dict from label values to numbers
+    when the gauge has labels.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], GaugeValue],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+            if value is None:
+                return []
+            if not isinstance(value, dict):
+                value = {(): value}
+            samples = [
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+                for key, v in value.items()
+            ]
+        except Exception as e:
+            # Una métrica rota no debe tumbar todo el /metrics
+            logger.warning(f"Metric {self.name} unavailable: {e}")
+            return []
+        return self.header() + samples
+
+
+class MetricsRegistry:
+    """Metrics exposed by /metrics, in registration order"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Reemplazar permite volver a crear la app (p. ej. en tests)
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], GaugeValue],
+        labelnames=(),
+        kind: str = "gauge",
+    ) -> CallbackGauge:
+        return self.register(
+            CallbackGauge(name, documentation, callback, labelnames, kind)
+        )
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry
+metrics = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method and status",
+    ("method", "route", "status"),
+)
+MODEL_INFERENCE_SECONDS = metrics.histogram(
+    "model_inference_duration_seconds",
+    "Time spent inside one model call",
+    ("model",),
+)
+MODEL_BATCH_ROWS = metrics.histogram(
+    "model_inference_batch_rows",
+    "Rows scored per model call",
+    ("model",),
+    buckets=(1, 2, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000),
+)
+PREPROCESSING_SECONDS = metrics.histogram(
+    "prediction_preprocessing_duration_seconds",
+    "Time spent preparing model inputs",
+    ("stage",),
+)
+INFERENCE_QUEUE_WAIT_SECONDS = metrics.histogram(
+    "inference_queue_wait_seconds",
+    "Time a call waited for a free inference worker",
+)
+INFERENCE_REJECTED = metrics.counter(
+    "inference_rejected_total",
+    "Calls rejected because the inference executor was full",
+)
+GEMINI_REQUEST_SECONDS = metrics.histogram(
+    "gemini_request_duration_seconds",
+    "Latency of Gemini generate_content calls",
+    ("call", "status"),
+)
+CHAT_TOOL_CALL_SECONDS = metrics.histogram(
+    "chat_tool_call_duration_seconds",
+    "Time spent running one chat tool call on the inference executor",
+    ("tool", "status"),
+)
+KNOWLEDGE_RETRIEVAL_SECONDS = metrics.histogram(
+    "chat_knowledge_retrieval_duration_seconds",
+    "Time spent retrieving knowledge base chunks for a chat turn",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01),
+)
+DB_POOL_CHECKOUTS = metrics.counter(
+    "db_pool_checkouts_total",
+    "Connections checked out from the SQLAlchemy pool",
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording ``HTTP_REQUEST_SECONDS``
+
+    Requests are labelled with the route template (``/api/v1/chat``, not the
+    raw path) so the number of series stays bounded; unmatched paths share
+    a single label. Streaming responses are timed until their last chunk.
+    """
+
+    def __init__(self, app, exclude: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope.get("method", ""),
+                route=getattr(route, "path", None) or "unmatched",
+                status=str(status["code"]),
+            )
+
+
+def observe_model_call(model: str, rows: int):
+    """Context manager timing one model call over ``rows`` rows"""
+    MODEL_BATCH_ROWS.observe(rows, model=model)
+    return MODEL_INFERENCE_SECONDS.time(model=model)
@@ -0,0 +1,284 @@
+"""
+Opt-in per-request profiling
+Wraps selected prediction / chat requests in cProfile and writes the profile
+(plus a JSON summary with route, payload hash and wall time) to a local
+directory. Requests are picked by an ``X-Profile`` header or a sampling rate,
+and the number of profiles is bounded so it can stay enabled in production.
+"""
+
+import asyncio
+import contextvars
+import cProfile
+import hashlib
+import io
+import json
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+import logging
+from app.core.security import admin_token_valid
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PROFILE_HEADER = b"x-profile"
+
+# Funciones listadas en el resumen JSON de cada perfil
+TOP_FUNCTIONS = 25
+
+
+# Desde Python 3.12 cProfile usa sys.monitoring, con un solo perfilador
+# activo por proceso: habilitar un segundo lanza ValueError. Todo perfilador
+# se habilita con este candado tomado
+_profiler_lock = threading.Lock()
+
+
+class ProfileSession:
+    """
+    One profiled request.
+
+    Each step of the handler coroutine on the event loop runs under
+    ``main`` (``step``), so the coroutines of other requests that run in
+    between are left out; calls sent to the inference executor are
+    profiled in their worker thread with ``run`` and merged when the
+    profile is written. Only one profiler is enabled at a time: worker
+    calls wait for the loop step to finish, and a loop step that finds a
+    worker call being profiled runs unprofiled (``skipped_steps``).
+    """
+
+    def __init__(self):
+        self.main = cProfile.Profile()
+        self.worker_profiles: List[cProfile.Profile] = []
+        self.skipped_steps = 0
+        self._lock = threading.Lock()
+
+    def step(self, advance: Callable[[], T]) -> T:
+        # En el event loop nunca se espera el candado
+        if not _profiler_lock.acquire(blocking=False):
+            self.skipped_steps += 1
+            return advance()
+        try:
+            self.main.enable()
+            try:
+                return advance()
+            finally:
+                self.main.disable()
+        finally:
+            _profiler_lock.release()
+
+    def run(self, call: Callable[[], T]) -> T:
+        profile = cProfile.Profile()
+        with _profiler_lock:
+            profile.enable()
+            try:
+                return call()
+            finally:
+                profile.disable()
+                with self._lock:
+                    self.worker_profiles.append(profile)
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.main, stream=io.StringIO())
+        with self._lock:
+            for profile in self.worker_profiles:
+                stats.add(profile)
+        return stats
+
+
+class _ProfiledCoroutine:
+    """Awaits ``coro`` running each of its steps under ``session.step``"""
+
+    def __init__(self, coro, session: ProfileSession):
+        self.coro = coro
+        self.session = session
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            try:
+                if error is None:
+                    yielded = self.session.step(lambda: self.coro.send(value))
+                else:
+                    yielded = self.session.step(lambda: self.coro.throw(error))
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+
+_active_session: contextvars.ContextVar[Optional[ProfileSession]] = (
+    contextvars.ContextVar("profile_session", default=None)
+)
+
+
+def active_session() -> Optional[ProfileSession]:
+    """Profile session of the current request, if it is being profiled"""
+    return _active_session.get()
+
+
+def _top_functions(stats: pstats.Stats, limit: int) -> List[Dict[str, Any]]:
+    rows = []
+    for (filename, line, function), entry in stats.stats.items():
+        _, calls, own, cumulative, _ = entry
+        rows.append(
+            {
+                "function": f"{function} ({Path(filename).name}:{line})",
+                "calls": calls,
+                "own_s": round(own, 6),
+                "cumulative_s": round(cumulative, 6),
+            }
+        )
+    rows.sort(key=lambda row: row["cumulative_s"], reverse=True)
+    return rows[:limit]
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling a bounded share of the requests
+
+    A request is profiled when profiling is enabled, its path starts with
+    one of ``prefixes`` and either it carries an ``X-Profile`` header equal
+    to ``ADMIN_TOKEN`` (ignored when none is configured) or it falls in the
+    ``sample_rate``. At most one request is profiled at a time (cProfile
+    owns the process's profiling hook) and at most ``max_per_minute`` per
+    minute; other requests run untouched. Profiles are written off the
+    event loop and the oldest files are removed beyond ``max_files``.
+    """
+
+    def __init__(
+        self,
+        app,
+        enabled: bool = False,
+        sample_rate: float = 0.0,
+        directory: str = "profiles",
+        max_per_minute: int = 6,
+        max_files: int = 500,
+        prefixes: Sequence[str] = ("/api/v1/predictions", "/api/v1/chat"),
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.directory = Path(directory)
+        self.max_per_minute = max_per_minute
+        self.max_files = max_files
+        self.prefixes = tuple(prefixes)
+        self._busy = False
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+
+    def _requested(self, scope) -> Optional[str]:
+        """Why this request should be profiled ("header", "sample") or None"""
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER:
+                # Solo con ADMIN_TOKEN: sin token nadie puede pedir un perfil
+                valid = admin_token_valid(value.decode("latin-1"))
+                return "header" if valid else None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def _acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if self._busy or len(self._recent) >= self.max_per_minute:
+                return False
+            self._busy = True
+            self._recent.append(now)
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not self.enabled
+            or scope["type"] != "http"
+            or not scope.get("path", "").startswith(self.prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        reason = self._requested(scope)
+        if reason is None or not self._acquire():
+            await self.app(scope, receive, send)
+            return
+
+        payload_hash = hashlib.sha256()
+        status = {"code": 500}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                payload_hash.update(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        session = ProfileSession()
+        token = _active_session.set(session)
+        started = time.perf_counter()
+        try:
+            await _ProfiledCoroutine(
+                self.app(scope, receive_wrapper, send_wrapper), session
+            )
+        finally:
+            wall_time = time.perf_counter() - started
+            _active_session.reset(token)
+            self._release()
+            route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+            metadata = {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "method": scope.get("method", ""),
+                "route": route,
+                "path": scope.get("path", ""),
+                "status": status["code"],
+                "payload_sha256": payload_hash.hexdigest(),
+                "wall_time_s": round(wall_time, 6),
+                "reason": reason,
+            }
+            try:
+                await asyncio.to_thread(self._write, session, metadata)
+            except Exception as e:
+                logger.warning(f"Could not write request profile: {e}")
+
+    def _write(self, session: ProfileSession, metadata: Dict[str, Any]) -> Path:
+        """Write ``<name>.prof`` (pstats format) and ``<name>.json``"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        slug = metadata["route"].strip("/").replace("/", "_") or "root"
+        name = (
+            f"{stamp}_{metadata['method']}_{slug}_"
+            f"{metadata['payload_sha256'][:12]}_{metadata['wall_time_s'] * 1000:.0f}ms"
+        )
+
+        stats = session.stats()
+        stats.dump_stats(self.directory / f"{name}.prof")
+        metadata["worker_calls"] = len(session.worker_profiles)
+        metadata["skipped_steps"] = session.skipped_steps
+        metadata["top_functions"] = _top_functions(stats, TOP_FUNCTIONS)
+        (self.directory / f"{name}.json").write_text(
+            json.dumps(metadata, indent=2), encoding="utf-8"
+        )
+        logger.info(f"Request profile written: {self.directory / name}.prof")
+        self._prune()
+        return self.directory / f"{name}.prof"
+
+    def _prune(self):
+        profiles = sorted(self.directory.glob("*.prof"))
+        for old in profiles[: max(0, len(profiles) - self.max_files)]:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".json").unlink(missing_ok=True)
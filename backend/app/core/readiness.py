@@ -0,0 +1,41 @@
+"""
+Readiness state
+Tracks whether this worker finished its warmup, separately from liveness:
+``/health`` answers as soon as the process is up, ``/ready`` only once the
+worker can serve traffic at full speed.
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+# Estados del calentamiento
+WARMUP_PENDING = "pending"
+WARMUP_RUNNING = "running"
+WARMUP_DONE = "done"
+WARMUP_FAILED = "failed"
+WARMUP_SKIPPED = "skipped"
+
+
+class Readiness:
+    """Warmup status of the worker (the DB is checked live by /ready)"""
+
+    def __init__(self):
+        self.warmup_status = WARMUP_PENDING
+        self.warmup_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def set_warmup(self, status: str, error: Optional[str] = None):
+        with self._lock:
+            self.warmup_status = status
+            self.warmup_error = error
+
+    @property
+    def warmed_up(self) -> bool:
+        return self.warmup_status in (WARMUP_DONE, WARMUP_SKIPPED)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"status": self.warmup_status, "error": self.warmup_error}
+
+
+# Global readiness instance
+readiness = Readiness()
@@ -0,0 +1,23 @@
+"""
+Admin token checks
+Shared by the model admin endpoints and the profiling header. Without an
+``ADMIN_TOKEN`` configured every check fails (closed by default).
+"""
+
+import secrets
+from typing import Optional
+from app.core.config import settings
+
+
+def admin_enabled() -> bool:
+    """Whether an ``ADMIN_TOKEN`` is configured"""
+    return bool(settings.ADMIN_TOKEN)
+
+
+def admin_token_valid(token: Optional[str]) -> bool:
+    """Constant-time comparison of ``token`` with ``ADMIN_TOKEN``"""
+    if not admin_enabled() or not token:
+        return False
+    return secrets.compare_digest(
+        token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8")
+    )
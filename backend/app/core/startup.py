@@ -0,0 +1,55 @@
+"""
+Startup timing report
+Records how long each cold-start stage takes (module import, DB check,
+model load, warmup) so slow boots can be attributed to a stage.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """Duration of each startup stage, in the order they ran"""
+
+    def __init__(self):
+        self._stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self._stages[stage] = seconds
+        logger.info(f"⏱️ Startup stage {stage}: {seconds * 1000:.1f} ms")
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the ``with`` block as stage ``name`` (also on exceptions)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def seconds(self, stage: str) -> Optional[float]:
+        return self._stages.get(stage)
+
+    def as_dict(self) -> Dict[str, float]:
+        """{stage: seconds} plus ``total``"""
+        with self._lock:
+            stages = {name: round(s, 4) for name, s in self._stages.items()}
+        stages["total"] = round(sum(stages.values()), 4)
+        return stages
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name} {seconds * 1000:.0f} ms"
+            for name, seconds in self.as_dict().items()
+        )
+
+
+# Global startup report instance
+startup_report = StartupReport()
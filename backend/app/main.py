@@ -1,12 +1,39 @@
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy import text
 from app.api.v1.chat import router as chat_router
 from app.core.config import settings
 from app.core.database import engine
 from app.api.v1.predictions import router as predictions_router
+from app.api.v1.admin import router as admin_router
 from app.models_ml.model_loader import ml_models
+from app.core.executor import inference_executor
+from app.core.metrics import MetricsMiddleware, metrics
+from app.core.profiling import ProfilingMiddleware
+from app.services.answer_cache import answer_cache
+from app.services.history_window import history_window
+from app.services.knowledge_index import get_knowledge_index
+from app.services.session_store import get_session_store
+from app.services.coalescer import prediction_coalescer
+from app.services.prediction_cache import prediction_cache
+from app.core.startup import startup_report
+from app.core.readiness import (
+    WARMUP_DONE,
+    WARMUP_FAILED,
+    WARMUP_RUNNING,
+    WARMUP_SKIPPED,
+    readiness,
+)
+
+startup_report.record("import", time.perf_counter() - _import_started)
 
 
 def check_database_connection():
@@ -23,6 +50,149 @@ def check_database_connection():
         return False
 
 
+def ping_database() -> bool:
+    """SELECT 1 sin imprimir nada, para las sondas de /ready"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+
+async def warmup_in_background():
+    """Calienta el pipeline fuera del event loop; /ready espera a que termine"""
+    from app.services.warmup import warmup_pipeline
+
+    readiness.set_warmup(WARMUP_RUNNING)
+    try:
+        with startup_report.stage("warmup"):
+            await asyncio.to_thread(warmup_pipeline)
+        readiness.set_warmup(WARMUP_DONE)
+    except Exception as e:
+        print(f"❌ Error en el calentamiento de modelos: {e}")
+        readiness.set_warmup(WARMUP_FAILED, str(e))
+
+
+def register_runtime_metrics():
+    """Gauges read from the live objects at scrape time"""
+    metrics.gauge_callback(
+        "inference_executor_pending",
+        "Inference calls running or queued",
+        lambda: inference_executor.pending,
+    )
+    metrics.gauge_callback(
+        "inference_executor_queue_depth",
+        "Inference calls waiting for a free worker",
+        lambda: inference_executor.queue_depth,
+    )
+    metrics.gauge_callback(
+        "inference_executor_workers",
+        "Inference worker threads",
+        lambda: inference_executor.max_workers,
+    )
+
+    for key, kind in (
+        ("hits", "counter"),
+        ("misses", "counter"),
+        ("evictions", "counter"),
+        ("entries", "gauge"),
+        ("hit_ratio", "gauge"),
+    ):
+        suffix = "_total" if kind == "counter" else ""
+        metrics.gauge_callback(
+            f"prediction_cache_{key}{suffix}",
+            f"Prediction cache {key.replace('_', ' ')}",
+            lambda key=key: prediction_cache.stats()[key],
+            kind=kind,
+        )
+    metrics.gauge_callback(
+        "prediction_coalescer_batches_total",
+        "Micro-batches run by the prediction coalescer",
+        lambda: prediction_coalescer.batches,
+        kind="counter",
+    )
+    metrics.gauge_callback(
+        "prediction_coalescer_rows_total",
+        "Rows scored through the prediction coalescer",
+        lambda: prediction_coalescer.rows,
+        kind="counter",
+    )
+
+    metrics.gauge_callback(
+        "chat_active_sessions",
+        "Chat sessions held by the session store",
+        lambda: get_session_store().memory_usage()["sessions"],
+    )
+    metrics.gauge_callback(
+        "chat_session_bytes",
+        "Chat history text held by the session store, in bytes",
+        lambda: get_session_store().memory_usage()["bytes"],
+    )
+    metrics.gauge_callback(
+        "chat_session_evictions_total",
+        "Chat sessions evicted (expired, LRU or over the memory cap)",
+        lambda: get_session_store().memory_usage()["evictions"],
+        kind="counter",
+    )
+    metrics.gauge_callback(
+        "chat_answer_cache_hits_total",
+        "Chat questions answered from memory, by source (faq, cache)",
+        lambda: {(source,): hits for source, hits in answer_cache.hits.items()},
+        labelnames=("source",),
+        kind="counter",
+    )
+    metrics.gauge_callback(
+        "chat_answer_cache_misses_total",
+        "Chat questions not found in the answer cache",
+        lambda: answer_cache.misses,
+        kind="counter",
+    )
+    metrics.gauge_callback(
+        "chat_answer_cache_entries",
+        "Generated answers held in the chat answer cache",
+        lambda: answer_cache.stats()["entries"],
+    )
+    metrics.gauge_callback(
+        "chat_history_summaries_total",
+        "History summaries reused from cache (hit) or updated (update)",
+        lambda: {
+            ("hit",): history_window.summary_hits,
+            ("update",): history_window.summary_updates,
+        },
+        labelnames=("result",),
+        kind="counter",
+    )
+    metrics.gauge_callback(
+        "db_pool_checked_out",
+        "Connections currently checked out from the SQLAlchemy pool",
+        lambda: (
+            engine.pool.checkedout() if hasattr(engine.pool, "checkedout") else None
+        ),
+    )
+    metrics.gauge_callback(
+        "app_ready",
+        "1 once warmup finished (the DB is checked by /ready only)",
+        lambda: int(readiness.warmed_up),
+    )
+    metrics.gauge_callback(
+        "app_startup_seconds",
+        "Duration of each startup stage",
+        lambda: {(stage,): s for stage, s in startup_report.as_dict().items()},
+        labelnames=("stage",),
+    )
+    metrics.gauge_callback(
+        "model_active_info",
+        "Active model version",
+        lambda: (
+            {(ml_models.active().name, ml_models.get_version()): 1}
+            if ml_models.is_loaded()
+            else None
+        ),
+        labelnames=("version", "fingerprint"),
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -33,18 +203,39 @@ async def lifespan(app: FastAPI):
     print("🚀 Iniciando aplicación...")
 
     # 1. Verificar Base de Datos
-    db_status = check_database_connection()
+    with startup_report.stage("db_check"):
+        db_status = check_database_connection()
     if not db_status:
         print("⚠️ Advertencia: La aplicación inició sin conexión a BD.")
 
-    # 2. Cargar Modelos de ML
+    # 2. Cargar Modelos de ML (registro; los artefactos se cargan al primer uso)
     print("🧠 Cargando modelos de ML...")
-    ml_models.load_models()  # Asegúrate que esto no bloquee demasiado si es síncrono
+    with startup_report.stage("model_load"):
+        ml_models.load_models()
+
+    # 3. Índice de recuperación de la base de conocimiento del chat
+    if settings.CHAT_RETRIEVAL_ENABLED:
+        with startup_report.stage("knowledge_index"):
+            get_knowledge_index()
+
+    # 4. Calentamiento en segundo plano: /health responde de inmediato y
+    # /ready devuelve 503 hasta que termine
+    warmup_task = None
+    if settings.MODEL_WARMUP:
+        warmup_task = asyncio.create_task(warmup_in_background())
+    else:
+        readiness.set_warmup(WARMUP_SKIPPED)
+
+    print(f"⏱️ Arranque: {startup_report.summary()}")
 
     yield  # La aplicación corre aquí
 
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+
     # --- CÓDIGO DE CIERRE (SHUTDOWN) ---
     print("🛑 Cerrando aplicación y liberando recursos...")
+    inference_executor.shutdown()
     # Aquí podrías cerrar conexiones a BD o limpiar memoria de modelos si fuera necesario
     # ml_models.unload()
 
@@ -60,6 +251,20 @@ def create_app() -> FastAPI:
         lifespan=lifespan,
     )
 
+    # Perfilado opt-in por petición (cabecera X-Profile o muestreo)
+    app.add_middleware(
+        ProfilingMiddleware,
+        enabled=settings.PROFILING_ENABLED,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        directory=settings.PROFILING_DIR,
+        max_per_minute=settings.PROFILING_MAX_PER_MINUTE,
+        max_files=settings.PROFILING_MAX_FILES,
+    )
+
+    # Latencia por ruta para /metrics
+    app.add_middleware(MetricsMiddleware)
+    register_runtime_metrics()
+
     # Configurar CORS
     app.add_middleware(
         CORSMiddleware,
@@ -77,6 +282,7 @@ def create_app() -> FastAPI:
     app.include_router(
         predictions_router, prefix="/api/v1/predictions", tags=["Predictions"]
     )
+    app.include_router(admin_router, prefix="/api/v1/admin", tags=["Admin"])
 
     @app.get("/")
     async def root():
@@ -93,8 +299,36 @@ def create_app() -> FastAPI:
         return {
             "status": "healthy" if models_loaded else "degraded",
             "models_loaded": models_loaded,
+            "model_version": ml_models.active().name if models_loaded else None,
+            "artifacts": ml_models.load_report(),
+            "startup": startup_report.as_dict(),
         }
 
+    @app.get("/ready")
+    async def readiness_check():
+        """
+        Readiness: models loaded, warmup finished and the DB answering.
+        Returns 503 until then so rolling deploys skip cold workers.
+        """
+        models_loaded = ml_models.is_loaded()
+        database = await run_in_threadpool(ping_database)
+        ready = models_loaded and readiness.warmed_up and database
+        return JSONResponse(
+            status_code=200 if ready else 503,
+            content={
+                "status": "ready" if ready else "not_ready",
+                "models_loaded": models_loaded,
+                "warmup": readiness.as_dict(),
+                "database": database,
+            },
+        )
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics_endpoint():
+        return PlainTextResponse(
+            metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
     return app
 
 
@@ -0,0 +1,347 @@
+"""
+Array-backed Isolation Forest scorer
+Flattens the trees of a fitted sklearn IsolationForest into contiguous NumPy
+node arrays at load time and scores a whole batch with one vectorized
+traversal, reproducing IsolationForest.predict / score_samples exactly.
+The node arrays can be saved as plain ``.npy`` files and memory-mapped back,
+so every worker process on a host shares the same physical pages
+"""
+
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# Filas procesadas por bloque (limita la memoria de la matriz filas x árboles)
+ROWS_PER_BLOCK = 8192
+
+# Hasta este tamaño de bloque el recorrido NumPy es más rápido que Tree.apply
+NUMPY_MAX_ROWS = 128
+
+# Arreglos de nodos que se guardan como .npy (el resto va en meta.json)
+ARRAY_FIELDS = (
+    "roots",
+    "feature",
+    "threshold",
+    "children",
+    "missing_left",
+    "leaf_value",
+)
+
+
+def _average_path_length(n_samples_leaf: np.ndarray) -> np.ndarray:
+    """Average path length of an unsuccessful BST search (same as sklearn)"""
+    n_samples_leaf = np.asarray(n_samples_leaf, dtype=np.float64)
+    average_path_length = np.zeros(n_samples_leaf.shape)
+
+    mask_1 = n_samples_leaf <= 1
+    mask_2 = n_samples_leaf == 2
+    not_mask = ~np.logical_or(mask_1, mask_2)
+
+    average_path_length[mask_1] = 0.0
+    average_path_length[mask_2] = 1.0
+    average_path_length[not_mask] = (
+        2.0 * (np.log(n_samples_leaf[not_mask] - 1.0) + np.euler_gamma)
+        - 2.0 * (n_samples_leaf[not_mask] - 1.0) / n_samples_leaf[not_mask]
+    )
+    return average_path_length
+
+
+def _node_depths(tree) -> np.ndarray:
+    """Depth of every node, counting the root as 1 (nodes in the decision path)"""
+    depths = np.ones(tree.node_count, dtype=np.float64)
+    for node in range(tree.node_count):
+        for child in (tree.children_left[node], tree.children_right[node]):
+            if child != -1:
+                depths[child] = depths[node] + 1
+    return depths
+
+
+class FlatIsolationForest:
+    """
+    Isolation Forest stored as flat node arrays.
+
+    Node ``i`` of tree ``t`` lives at ``roots[t] + i``. ``children`` holds
+    the (right, left) pair of every node so the next node is
+    ``children[2 * node + go_left]``; leaves point to themselves and have an
+    infinite threshold, so every row can take exactly ``max_depth`` steps.
+    ``leaf_value`` holds the per-tree depth contribution
+    ``decision_path_length + average_path_length - 1`` that sklearn adds when
+    a sample lands in that node.
+
+    Small blocks are traversed with NumPy gathers; large blocks reuse the
+    compiled ``Tree.apply`` of each tree (when the sklearn trees are kept or
+    can be loaded through ``trees_loader``), which is faster there and
+    reaches the same leaves.
+    """
+
+    def __init__(
+        self,
+        roots: np.ndarray,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        missing_left: np.ndarray,
+        leaf_value: np.ndarray,
+        max_depth: int,
+        denominator: float,
+        offset: float,
+        trees: Optional[list] = None,
+        trees_loader: Optional[Callable[[], list]] = None,
+    ):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.leaf_value = leaf_value
+        self.max_depth = max_depth
+        self.denominator = denominator
+        self.offset = offset
+        # (Tree, columnas de la entrada en el orden del árbol) para Tree.apply;
+        # con trees_loader se cargan solo cuando llega el primer bloque grande
+        self._trees = trees
+        self._trees_loader = trees_loader
+        self._trees_lock = threading.Lock()
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def has_trees(self) -> bool:
+        return self._trees is not None or self._trees_loader is not None
+
+    @property
+    def trees(self) -> Optional[list]:
+        if self._trees is None and self._trees_loader is not None:
+            with self._trees_lock:
+                if self._trees is None:
+                    self._trees = self._trees_loader()
+        return self._trees
+
+    @staticmethod
+    def _columns(model, feature_names: Optional[Sequence[str]]) -> np.ndarray:
+        """Column of the input matrix for every feature the model was fitted on"""
+        column_of = np.arange(model.n_features_in_)
+        fitted_names = getattr(model, "feature_names_in_", None)
+        if feature_names is not None and fitted_names is not None:
+            position = {name: i for i, name in enumerate(feature_names)}
+            column_of = np.array([position[name] for name in fitted_names])
+        return column_of
+
+    @classmethod
+    def compiled_trees(
+        cls, model, feature_names: Optional[Sequence[str]] = None
+    ) -> List[Tuple[object, np.ndarray]]:
+        """(Tree, input columns) pairs used by the compiled traversal"""
+        column_of = cls._columns(model, feature_names)
+        return [
+            (estimator.tree_, column_of[np.asarray(features)])
+            for estimator, features in zip(
+                model.estimators_, model.estimators_features_
+            )
+        ]
+
+    @classmethod
+    def from_estimator(
+        cls, model, feature_names: Optional[Sequence[str]] = None
+    ) -> "FlatIsolationForest":
+        """
+        Flatten a fitted ``sklearn.ensemble.IsolationForest``
+
+        Args:
+            model: Fitted IsolationForest
+            feature_names: Column order of the matrices that will be scored.
+                Defaults to the order the model was fitted with.
+        """
+        column_of = cls._columns(model, feature_names)
+
+        dpl_per_tree = getattr(model, "_decision_path_lengths", None)
+        apl_per_tree = getattr(model, "_average_path_length_per_tree", None)
+
+        roots: List[int] = []
+        parts = {k: [] for k in ("feature", "threshold", "children", "miss", "leaf")}
+        trees = []
+        offset = 0
+        max_depth = 0
+        for tree_idx, (estimator, features) in enumerate(
+            zip(model.estimators_, model.estimators_features_)
+        ):
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            nodes = np.arange(tree.node_count) + offset
+
+            if dpl_per_tree is not None and apl_per_tree is not None:
+                dpl = dpl_per_tree[tree_idx]
+                apl = apl_per_tree[tree_idx]
+            else:
+                # Versiones de sklearn sin los arreglos precalculados
+                dpl = _node_depths(tree)
+                apl = _average_path_length(tree.n_node_samples)
+
+            features = np.asarray(features)
+            missing = getattr(tree, "missing_go_to_left", None)
+            if missing is None:
+                missing = np.zeros(tree.node_count, dtype=np.uint8)
+
+            roots.append(offset)
+            parts["feature"].append(
+                np.where(is_leaf, 0, column_of[features[tree.feature]])
+            )
+            parts["threshold"].append(np.where(is_leaf, np.inf, tree.threshold))
+            parts["children"].append(
+                np.stack(
+                    [
+                        np.where(is_leaf, nodes, tree.children_right + offset),
+                        np.where(is_leaf, nodes, tree.children_left + offset),
+                    ],
+                    axis=1,
+                ).ravel()
+            )
+            parts["miss"].append(np.asarray(missing, dtype=bool))
+            parts["leaf"].append(dpl + apl - 1.0)
+            trees.append((tree, column_of[features]))
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        denominator = len(model.estimators_) * float(
+            _average_path_length(np.array([model._max_samples]))[0]
+        )
+
+        return cls(
+            roots=np.asarray(roots, dtype=np.intp),
+            feature=np.concatenate(parts["feature"]).astype(np.intp),
+            threshold=np.concatenate(parts["threshold"]).astype(np.float64),
+            children=np.concatenate(parts["children"]).astype(np.intp),
+            missing_left=np.concatenate(parts["miss"]),
+            leaf_value=np.concatenate(parts["leaf"]).astype(np.float64),
+            max_depth=int(max_depth),
+            denominator=denominator,
+            offset=float(model.offset_),
+            trees=trees,
+        )
+
+    def save(self, directory: Path):
+        """
+        Write the node arrays as ``.npy`` files plus a ``meta.json``
+
+        The files are written to a temporary directory and renamed into
+        place, so concurrent workers never see a half-written cache. If
+        another process wins the race its copy is kept.
+        """
+        directory = Path(directory)
+        tmp_dir = directory.with_name(f"{directory.name}.tmp{os.getpid()}")
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            for name in ARRAY_FIELDS:
+                np.save(tmp_dir / f"{name}.npy", getattr(self, name))
+            meta = {
+                "max_depth": self.max_depth,
+                "denominator": self.denominator,
+                "offset": self.offset,
+            }
+            (tmp_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+            os.rename(tmp_dir, directory)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not (directory / "meta.json").exists():
+                raise
+
+    @classmethod
+    def load(
+        cls,
+        directory: Path,
+        mmap_mode: Optional[str] = "r",
+        trees: Optional[list] = None,
+        trees_loader: Optional[Callable[[], list]] = None,
+    ) -> "FlatIsolationForest":
+        """
+        Load arrays written by ``save``
+
+        Args:
+            directory: Directory written by ``save``
+            mmap_mode: ``np.load`` mmap mode; "r" maps the files read-only so
+                the pages live in the OS page cache and are shared between
+                processes. None reads private copies.
+            trees / trees_loader: Optional sklearn trees (or a callable that
+                returns them) for the compiled traversal of large blocks
+        """
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        arrays = {
+            name: np.load(directory / f"{name}.npy", mmap_mode=mmap_mode)
+            for name in ARRAY_FIELDS
+        }
+        return cls(
+            **arrays,
+            max_depth=int(meta["max_depth"]),
+            denominator=float(meta["denominator"]),
+            offset=float(meta["offset"]),
+            trees=trees,
+            trees_loader=trees_loader,
+        )
+
+    def _leaves_numpy(self, X: np.ndarray) -> np.ndarray:
+        """Global leaf reached by every row in every tree, shape (n, T)"""
+        n_rows, n_columns = X.shape
+        flat_X = X.ravel()
+        row_start = (np.arange(n_rows) * n_columns)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        has_nan = bool(np.isnan(X).any())
+
+        for _ in range(self.max_depth):
+            values = flat_X[row_start + self.feature[nodes]]
+            go_left = values <= self.threshold[nodes]
+            if has_nan:
+                go_left = np.where(np.isnan(values), self.missing_left[nodes], go_left)
+            nodes = self.children[2 * nodes + go_left]
+        return nodes
+
+    def _leaves_compiled(self, X: np.ndarray) -> np.ndarray:
+        """Same as ``_leaves_numpy`` using each tree's compiled ``apply``"""
+        leaves = np.empty((X.shape[0], self.n_trees), dtype=np.intp)
+        for tree_idx, (tree, columns) in enumerate(self.trees):
+            X_tree = np.ascontiguousarray(X[:, columns])
+            leaves[:, tree_idx] = tree.apply(X_tree) + self.roots[tree_idx]
+        return leaves
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Same values as ``IsolationForest.score_samples`` (lower = more anomalous)"""
+        # sklearn recorre los árboles en float32
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        scores = np.empty(X.shape[0], dtype=np.float64)
+
+        for start in range(0, X.shape[0], ROWS_PER_BLOCK):
+            block = X[start : start + ROWS_PER_BLOCK]
+            if block.shape[0] > NUMPY_MAX_ROWS and self.has_trees:
+                leaves = self._leaves_compiled(block)
+            else:
+                leaves = self._leaves_numpy(block)
+            contributions = self.leaf_value[leaves]
+            # Suma árbol por árbol, en el mismo orden que sklearn
+            depths = np.zeros(block.shape[0], dtype=np.float64)
+            for tree_idx in range(self.n_trees):
+                depths += contributions[:, tree_idx]
+            if self.denominator != 0:
+                ratio = depths / self.denominator
+            else:
+                ratio = np.ones_like(depths)
+            scores[start : start + ROWS_PER_BLOCK] = -(2 ** (-ratio))
+        return scores
+
+    def predict_and_score(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Labels and scores from a single traversal
+
+        Returns:
+            (labels, scores): labels are -1 (anomaly) / 1 (normal), exactly as
+            ``IsolationForest.predict``; scores as ``score_samples``
+        """
+        scores = self.score_samples(X)
+        labels = np.ones(scores.shape[0], dtype=int)
+        labels[scores - self.offset < 0] = -1
+        return labels, scores
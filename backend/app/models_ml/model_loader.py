@@ -1,69 +1,153 @@
 """
 Model Loader for ML Models
-Loads and maintains trained ML models in memory as singleton
+Loads and maintains trained ML models in memory as singleton.
+
+Each ``ml_models/vN`` directory is one model version (``MLModels``). The
+``ModelRegistry`` discovers the versions, loads and warms up a new one in
+the background and swaps it in atomically; requests keep a reference to the
+bundle they started with, so in-flight work finishes on the old version.
+
+Artifacts are registered at startup and materialized lazily, on first use.
+Pickles are opened with joblib ``mmap_mode`` and the flattened Isolation
+Forest is cached as ``.npy`` files that are memory-mapped back, so the node
+arrays are shared between all the workers of a host through the page cache.
 """
 
-import joblib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 import logging
 
+if TYPE_CHECKING:
+    # joblib / NumPy / pandas se importan al materializar el primer artefacto
+    from app.models_ml.preprocessing import AnomalyPreprocessor
+    from app.models_ml.iforest_scorer import FlatIsolationForest
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Archivo pickle de cada artefacto dentro de la carpeta de la versión.
+# Una carpeta puede cambiarlos con un manifest.json {"files": {...}}
+ARTIFACT_FILES = {
+    "lgbm_classifier": "lgbm_classifier_balanced_{version}.pkl",
+    "model_artifacts": "model_artifacts_{version}.pkl",
+    "isolation_forest": "isolation_forest_{version}.pkl",
+    "anomalies_artifacts": "anomalies_artifacts_{version}.pkl",
+}
+
+MANIFEST_FILE = "manifest.json"
+
+# Carpetas de versión dentro de ml_models: v1, v2, ...
+VERSION_DIR_PATTERN = re.compile(r"^v(\d+)$")
+
+# Orden de carga cuando se pide una carga completa (eager)
+LOAD_ORDER = (
+    "lgbm_classifier",
+    "model_artifacts",
+    "anomalies_artifacts",
+    "anomaly_preprocessor",
+    "anomaly_scorer",
+)
+
+# Subcarpeta de models_path con los arreglos .npy del Isolation Forest
+MMAP_CACHE_DIR = ".mmap_cache"
+
+
+def _default_models_root() -> Path:
+    """``ml_models`` folder at the project root (next to ``backend``)"""
+    current = Path(__file__).resolve()
+
+    # Buscar carpeta backend
+    for parent in current.parents:
+        if parent.name == "backend":
+            backend_dir = parent
+            break
+
+    project_root = backend_dir.parent
+    return project_root / "ml_models"
+
+
+def _memory_usage() -> Tuple[Optional[int], Optional[int]]:
+    """
+    (resident, shared) bytes of this process, from /proc/self/statm
+
+    Shared pages are file-backed (memory-mapped arrays count here and are
+    paid once per host). Returns (None, None) where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            fields = f.read().split()
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        return int(fields[1]) * page_size, int(fields[2]) * page_size
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None, None
+
 
 class MLModels:
-    """Singleton class to load and manage ML models"""
+    """Artifacts of one model version (one ``ml_models/vN`` directory)"""
 
-    def __init__(self):
-        self.lgbm_classifier = None
-        self.model_artifacts = None
-        self.isolation_forest = None
-        self.anomalies_artifacts = None
+    def __init__(self, models_path: Optional[Path] = None, name: Optional[str] = None):
+        self.models_path = models_path or _default_models_root() / "v1"
+        self.name = name or self.models_path.name
+        self.version: Optional[str] = None
+        self.mmap_mode: Optional[str] = "r"
+        self.artifact_files: Dict[str, str] = {}
+        self._artifacts: Dict[str, Any] = {}
+        self._report: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
         self._loaded = False
 
-        current = Path(__file__).resolve()
+    def _resolve_files(self) -> Dict[str, str]:
+        """Artifact file names, from the manifest or the naming convention"""
+        files = {
+            name: template.format(version=self.name)
+            for name, template in ARTIFACT_FILES.items()
+        }
+        manifest_path = self.models_path / MANIFEST_FILE
+        if manifest_path.exists():
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            files.update(manifest.get("files", {}))
+        return files
 
-        # Buscar carpeta backend
-        for parent in current.parents:
-            if parent.name == "backend":
-                backend_dir = parent
-                break
+    def load_models(self, eager: bool = False):
+        """
+        Register the ML artifacts on disk
 
-        project_root = backend_dir.parent
-        self.models_path = project_root / "ml_models" / "v1"
+        Only checks that every file exists and computes the version; each
+        artifact is unpickled the first time it is requested.
 
-    def load_models(self):
-        """Load all ML models and artifacts from disk"""
+        Args:
+            eager: Materialize every artifact now instead of on first use
+        """
         if self._loaded:
             logger.info("Models already loaded, skipping...")
             return
 
         try:
-            logger.info(f"Loading models from: {self.models_path}")
-
-            # Load LightGBM classifier
-            classifier_path = self.models_path / "lgbm_classifier_balanced_v1.pkl"
-            self.lgbm_classifier = joblib.load(classifier_path)
-            logger.info("✓ Loaded LightGBM classifier")
+            logger.info(f"Registering models from: {self.models_path}")
 
-            # Load model artifacts
-            artifacts_path = self.models_path / "model_artifacts_v1.pkl"
-            self.model_artifacts = joblib.load(artifacts_path)
-            logger.info("✓ Loaded model artifacts")
-
-            # Load Isolation Forest
-            iso_forest_path = self.models_path / "isolation_forest_v1.pkl"
-            self.isolation_forest = joblib.load(iso_forest_path)
-            logger.info("✓ Loaded Isolation Forest anomaly detector")
-
-            # Load anomaly detection artifacts
-            anomaly_artifacts_path = self.models_path / "anomalies_artifacts_v1.pkl"
-            self.anomalies_artifacts = joblib.load(anomaly_artifacts_path)
-            logger.info("✓ Loaded anomaly detection artifacts")
+            self.artifact_files = self._resolve_files()
+            paths = [self.models_path / name for name in self.artifact_files.values()]
+            for path in paths:
+                if not path.exists():
+                    raise FileNotFoundError(f"No such file: '{path}'")
 
+            self.version = self._fingerprint(paths)
             self._loaded = True
-            logger.info("🎉 All ML models loaded successfully!")
+            logger.info(
+                f"🎉 ML models {self.name} registered (version {self.version}), "
+                "artifacts load on first use"
+            )
+
+            if eager:
+                for name in LOAD_ORDER:
+                    self._materialize(name)
 
         except FileNotFoundError as e:
             logger.error(f"❌ Model file not found: {e}")
@@ -72,29 +156,533 @@ class MLModels:
             logger.error(f"❌ Error loading models: {e}")
             raise
 
+    @staticmethod
+    def _fingerprint(paths: List[Path]) -> str:
+        """Short id of the loaded artifacts (name, size and mtime of each file)"""
+        digest = hashlib.sha1()
+        for path in paths:
+            stat = path.stat()
+            digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()[:12]
+
+    # ------------------------------------------------------------------
+    # Lazy materialization
+    # ------------------------------------------------------------------
+
+    def _materialize(self, name: str) -> Any:
+        """Return artifact ``name``, loading it (once) if needed"""
+        if name in self._artifacts:
+            return self._artifacts[name]
+
+        with self._lock:
+            if name in self._artifacts:
+                return self._artifacts[name]
+
+            # Las dependencias se cargan antes para no sumar su costo aquí
+            for dependency in self._dependencies(name):
+                self._materialize(dependency)
+
+            rss_before, shared_before = _memory_usage()
+            started = time.perf_counter()
+            value, source = self._load_artifact(name)
+            elapsed = time.perf_counter() - started
+            rss_after, shared_after = _memory_usage()
+
+            self._report[name] = {
+                "source": source,
+                "load_seconds": round(elapsed, 4),
+                "rss_bytes": (
+                    rss_after - rss_before if rss_before is not None else None
+                ),
+                "shared_bytes": (
+                    shared_after - shared_before if shared_before is not None else None
+                ),
+            }
+            self._artifacts[name] = value
+            logger.info(
+                f"✓ Loaded {name} from {source} in {elapsed * 1000:.1f} ms"
+                + (
+                    f" (+{self._report[name]['rss_bytes'] / 2**20:.1f} MiB RSS)"
+                    if rss_before is not None
+                    else ""
+                )
+            )
+            return value
+
+    def _dependencies(self, name: str) -> Tuple[str, ...]:
+        if name == "anomaly_preprocessor":
+            return ("anomalies_artifacts",)
+        if name == "anomaly_scorer":
+            if self._scorer_cache_dir().exists():
+                return ("anomaly_preprocessor",)
+            return ("anomaly_preprocessor", "isolation_forest")
+        return ()
+
+    def _load_artifact(self, name: str) -> Tuple[Any, str]:
+        """Load one artifact; returns (value, description of its source)"""
+        if name in ARTIFACT_FILES:
+            import joblib
+
+            path = self.models_path / self.artifact_files[name]
+            # Los arreglos NumPy dentro del pickle quedan mapeados, no copiados
+            return joblib.load(path, mmap_mode=self.mmap_mode), path.name
+
+        if name == "anomaly_preprocessor":
+            from app.models_ml.preprocessing import AnomalyPreprocessor
+
+            preprocessor = AnomalyPreprocessor(self._artifacts["anomalies_artifacts"])
+            return preprocessor, "anomalies_artifacts"
+
+        if name == "anomaly_scorer":
+            return self._load_anomaly_scorer()
+
+        raise KeyError(f"Unknown model artifact: {name}")
+
+    def _scorer_cache_dir(self) -> Path:
+        """Cache directory for the flattened forest, keyed on file and features"""
+        features = self._materialize("anomaly_preprocessor").features
+        digest = hashlib.sha1(
+            (
+                self._fingerprint(
+                    [self.models_path / self.artifact_files["isolation_forest"]]
+                )
+                + "|"
+                + ",".join(features)
+            ).encode()
+        ).hexdigest()[:12]
+        return self.models_path / MMAP_CACHE_DIR / f"iforest_{digest}"
+
+    def _load_anomaly_scorer(self) -> Tuple["FlatIsolationForest", str]:
+        from app.models_ml.iforest_scorer import FlatIsolationForest
+
+        features = self._artifacts["anomaly_preprocessor"].features
+        cache_dir = self._scorer_cache_dir()
+
+        def trees_loader():
+            # Los árboles de sklearn solo hacen falta para bloques grandes
+            return FlatIsolationForest.compiled_trees(
+                self._materialize("isolation_forest"), feature_names=features
+            )
+
+        if cache_dir.exists():
+            try:
+                scorer = FlatIsolationForest.load(
+                    cache_dir, mmap_mode=self.mmap_mode, trees_loader=trees_loader
+                )
+                return scorer, f"{MMAP_CACHE_DIR}/{cache_dir.name}"
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable scorer cache {cache_dir}: {e}")
+
+        # Flatten the Isolation Forest trees into NumPy node arrays
+        scorer = FlatIsolationForest.from_estimator(
+            self._artifacts["isolation_forest"], feature_names=features
+        )
+        try:
+            scorer.save(cache_dir)
+            scorer = FlatIsolationForest.load(
+                cache_dir, mmap_mode=self.mmap_mode, trees=scorer.trees
+            )
+        except OSError as e:
+            # Carpeta de modelos de solo lectura: se usa la copia en memoria
+            logger.warning(f"Could not write scorer cache {cache_dir}: {e}")
+        return scorer, "isolation_forest (flattened)"
+
+    def load_report(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Load time and memory of each artifact
+
+        Returns:
+            {name: {"loaded", "source", "load_seconds", "rss_bytes",
+            "shared_bytes"}}; byte deltas are measured around the load and
+            are None where /proc is not available
+        """
+        report = {}
+        for name in LOAD_ORDER + ("isolation_forest",):
+            entry = self._report.get(name)
+            report[name] = {"loaded": entry is not None, **(entry or {})}
+        return report
+
+    def warmup(self):
+        """
+        Materialize every artifact and run one synthetic inference per model
+
+        Exercises the same code paths as a real request (LightGBM predict on
+        a categorical frame, anomaly preprocessing, both scorer traversals)
+        so the first request after a swap does not pay for them.
+        """
+        import numpy as np
+        import pandas as pd
+        from app.models_ml.iforest_scorer import NUMPY_MAX_ROWS
+
+        for name in LOAD_ORDER:
+            self._get(name)
+
+        artifacts = self.get_model_artifacts()
+        cat_features = artifacts.get("cat_features", [])
+        row = pd.DataFrame(
+            {
+                feature: pd.Categorical([None]) if feature in cat_features else [0.0]
+                for feature in artifacts.get("all_features", [])
+            }
+        )
+        self.get_classifier().predict(row)
+
+        preprocessor = self.get_anomaly_preprocessor()
+        columns = {
+            feature: (
+                [next(iter(preprocessor.encoders[feature]), None)]
+                if feature in preprocessor.encoders
+                else [0.0]
+            )
+            for feature in preprocessor.features
+        }
+        matrix = preprocessor.transform(columns)
+        scorer = self.get_anomaly_scorer()
+        scorer.predict_and_score(matrix)
+        # Un bloque grande carga los árboles del recorrido compilado
+        scorer.predict_and_score(np.repeat(matrix, NUMPY_MAX_ROWS + 1, axis=0))
+
+    # ------------------------------------------------------------------
+    # Accessors
+    # ------------------------------------------------------------------
+
+    def _get(self, name: str) -> Any:
+        if not self._loaded:
+            raise RuntimeError("Models not loaded. Call load_models() first.")
+        return self._materialize(name)
+
+    @property
+    def lgbm_classifier(self):
+        return self._get("lgbm_classifier") if self._loaded else None
+
+    @property
+    def model_artifacts(self) -> Optional[Dict[str, Any]]:
+        return self._get("model_artifacts") if self._loaded else None
+
+    @property
+    def isolation_forest(self):
+        return self._get("isolation_forest") if self._loaded else None
+
+    @property
+    def anomalies_artifacts(self) -> Optional[Dict[str, Any]]:
+        return self._get("anomalies_artifacts") if self._loaded else None
+
+    @property
+    def anomaly_preprocessor(self) -> Optional["AnomalyPreprocessor"]:
+        return self._get("anomaly_preprocessor") if self._loaded else None
+
+    @property
+    def anomaly_scorer(self) -> Optional["FlatIsolationForest"]:
+        return self._get("anomaly_scorer") if self._loaded else None
+
     def is_loaded(self) -> bool:
         return self._loaded
 
-    def get_classifier(self):
+    def get_version(self) -> str:
         if not self._loaded:
             raise RuntimeError("Models not loaded. Call load_models() first.")
-        return self.lgbm_classifier
+        return self.version
+
+    def get_classifier(self):
+        return self._get("lgbm_classifier")
 
     def get_model_artifacts(self) -> Dict[str, Any]:
-        if not self._loaded:
-            raise RuntimeError("Models not loaded. Call load_models() first.")
-        return self.model_artifacts
+        return self._get("model_artifacts")
 
     def get_anomaly_detector(self):
-        if not self._loaded:
-            raise RuntimeError("Models not loaded. Call load_models() first.")
-        return self.isolation_forest
+        return self._get("isolation_forest")
 
     def get_anomaly_artifacts(self) -> Dict[str, Any]:
-        if not self._loaded:
+        return self._get("anomalies_artifacts")
+
+    def get_anomaly_preprocessor(self) -> "AnomalyPreprocessor":
+        return self._get("anomaly_preprocessor")
+
+    def get_anomaly_scorer(self) -> "FlatIsolationForest":
+        return self._get("anomaly_scorer")
+
+
+class ActivationInProgressError(RuntimeError):
+    """Raised when another activation or rollback of the registry is running"""
+
+
+class ModelRegistry:
+    """
+    Model versions found under ``root_path`` (``v1``, ``v2``, ...).
+
+    Exactly one version is active. Activating another one loads it, runs a
+    warm-up inference and then replaces the active reference in a single
+    assignment; callers that already took a snapshot with ``active()`` keep
+    scoring on the previous version until they finish. Loaded versions are
+    kept in memory so a rollback is immediate.
+
+    The ``get_*`` accessors of ``MLModels`` are forwarded to the active
+    version for callers that only need one artifact.
+    """
+
+    def __init__(self, root_path: Optional[Path] = None):
+        self.root_path = root_path or _default_models_root()
+        self._bundles: Dict[str, MLModels] = {}
+        self._paths: Dict[str, Path] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._active: Optional[MLModels] = None
+        self._history: List[str] = []
+        self._lock = threading.Lock()
+        self._activation_lock = threading.Lock()
+
+    def discover(self) -> Dict[str, Path]:
+        """Version directories under ``root_path``, oldest first"""
+        found: Dict[str, Path] = {}
+        if self.root_path.is_dir():
+            for child in self.root_path.iterdir():
+                if child.is_dir() and VERSION_DIR_PATTERN.match(child.name):
+                    found[child.name] = child
+        found.update(self._paths)
+
+        def order(name: str):
+            match = VERSION_DIR_PATTERN.match(name)
+            return (0, int(match.group(1)), "") if match else (1, 0, name)
+
+        return dict(sorted(found.items(), key=lambda item: order(item[0])))
+
+    def register_path(self, models_path: Path, name: Optional[str] = None) -> str:
+        """Add a version directory outside ``root_path``; returns its name"""
+        name = name or models_path.name
+        self._paths[name] = models_path
+        return name
+
+    def _set_status(self, name: str, state: str, error: Optional[str] = None):
+        status = self._status.setdefault(name, {})
+        status["state"] = state
+        status["error"] = error
+        status["updated_at"] = datetime.now(timezone.utc).isoformat()
+
+    def is_activating(self) -> bool:
+        return self._activation_lock.locked()
+
+    def _claim_activation(self, blocking: bool):
+        """Take the activation slot (released by the caller)"""
+        if not self._activation_lock.acquire(blocking=blocking):
+            raise ActivationInProgressError("A model activation is already in progress")
+
+    def activate(
+        self, name: str, warmup: bool = True, blocking: bool = True
+    ) -> MLModels:
+        """
+        Load ``name``, warm it up and make it the active version (blocking)
+
+        With ``blocking=False`` a running activation or rollback is an error
+        instead of a wait.
+
+        Raises:
+            KeyError: if no such version directory exists
+            ActivationInProgressError: if ``blocking`` is False and another
+                activation is running
+            Exception: whatever the load or warm-up raised; the previously
+                active version stays active
+        """
+        self._claim_activation(blocking)
+        try:
+            return self._activate(name, warmup=warmup, record_history=True)
+        finally:
+            self._activation_lock.release()
+
+    def start_activation(self, name: str, warmup: bool = True) -> threading.Thread:
+        """
+        Activate ``name`` on a background thread and return right away
+
+        The activation slot is taken before returning, so concurrent callers
+        get ActivationInProgressError instead of queueing. The outcome is
+        reported by ``list_versions`` ("active" or "failed" with its error).
+
+        Raises:
+            KeyError: if no such version directory exists
+            ActivationInProgressError: if another activation is running
+        """
+        if name not in self.discover():
+            raise KeyError(f"Unknown model version: {name}")
+        self._claim_activation(blocking=False)
+
+        def run():
+            try:
+                self._activate(name, warmup=warmup, record_history=True)
+            except Exception as e:
+                logger.error(f"Background activation of {name} failed: {e}")
+            finally:
+                self._activation_lock.release()
+
+        thread = threading.Thread(target=run, name=f"activate-{name}", daemon=True)
+        try:
+            thread.start()
+        except Exception:
+            self._activation_lock.release()
+            raise
+        return thread
+
+    def _activate(self, name: str, warmup: bool, record_history: bool) -> MLModels:
+        """Activation proper; the caller holds ``_activation_lock``"""
+        versions = self.discover()
+        if name not in versions:
+            raise KeyError(f"Unknown model version: {name}")
+
+        bundle = self._bundles.get(name)
+        if bundle is None:
+            bundle = MLModels(versions[name], name=name)
+        self._set_status(name, "loading")
+        started = time.perf_counter()
+        try:
+            bundle.load_models()
+            if warmup:
+                bundle.warmup()
+        except Exception as e:
+            self._set_status(name, "failed", error=str(e))
+            logger.error(f"❌ Could not activate model version {name}: {e}")
+            raise
+        self._bundles[name] = bundle
+
+        with self._lock:
+            previous = self._active
+            self._active = bundle
+            if record_history and previous is not None and previous is not bundle:
+                self._history.append(previous.name)
+
+        if previous is not None and previous is not bundle:
+            self._set_status(previous.name, "ready")
+        self._set_status(name, "active")
+        logger.info(
+            f"🔁 Active model version: {name} ({bundle.version}) "
+            f"after {time.perf_counter() - started:.2f}s"
+        )
+        return bundle
+
+    def rollback(self, warmup: bool = True, blocking: bool = True) -> MLModels:
+        """
+        Re-activate the version that was active before the current one
+
+        The history is only read and changed while holding the activation
+        slot, so concurrent rollbacks cannot pop two entries.
+
+        Raises:
+            ValueError: if there is no previous version
+            ActivationInProgressError: if ``blocking`` is False and another
+                activation is running
+        """
+        self._claim_activation(blocking)
+        try:
+            with self._lock:
+                if not self._history:
+                    raise ValueError("No previous model version to roll back to")
+                name = self._history.pop()
+            try:
+                return self._activate(name, warmup=warmup, record_history=False)
+            except Exception:
+                with self._lock:
+                    self._history.append(name)
+                raise
+        finally:
+            self._activation_lock.release()
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """Discovered versions with their load state"""
+        active = self._active
+        versions = []
+        for name, path in self.discover().items():
+            bundle = self._bundles.get(name)
+            status = self._status.get(name, {})
+            versions.append(
+                {
+                    "version": name,
+                    "path": str(path),
+                    "state": status.get("state", "available"),
+                    "active": active is not None and active.name == name,
+                    "fingerprint": bundle.version if bundle else None,
+                    "error": status.get("error"),
+                    "updated_at": status.get("updated_at"),
+                }
+            )
+        return versions
+
+    def previous_versions(self) -> List[str]:
+        return list(self._history)
+
+    # ------------------------------------------------------------------
+    # Active version
+    # ------------------------------------------------------------------
+
+    def load_models(
+        self,
+        version: Optional[str] = None,
+        path: Optional[Path] = None,
+        eager: bool = False,
+    ):
+        """
+        Activate a version at startup (latest one by default)
+
+        Args:
+            version: Version directory name, e.g. "v2"
+            path: Explicit version directory (takes precedence over version)
+            eager: Materialize and warm up every artifact now instead of
+                loading each one on first use
+        """
+        if path is not None:
+            version = self.register_path(Path(path))
+        elif self._active is not None and version is None:
+            logger.info("Models already loaded, skipping...")
+            return
+        if version is None:
+            versions = self.discover()
+            if not versions:
+                raise FileNotFoundError(f"No model versions found in {self.root_path}")
+            version = list(versions)[-1]
+        self.activate(version, warmup=eager)
+
+    def active(self) -> MLModels:
+        """
+        Active version; take it once per request and use it throughout
+
+        Raises:
+            RuntimeError: if no version has been activated yet
+        """
+        bundle = self._active
+        if bundle is None:
             raise RuntimeError("Models not loaded. Call load_models() first.")
-        return self.anomalies_artifacts
+        return bundle
+
+    def is_loaded(self) -> bool:
+        return self._active is not None
+
+    def load_report(self) -> Dict[str, Dict[str, Any]]:
+        return self._active.load_report() if self._active is not None else {}
+
+    @property
+    def lgbm_classifier(self):
+        return self._active.lgbm_classifier if self._active is not None else None
+
+    @property
+    def isolation_forest(self):
+        return self._active.isolation_forest if self._active is not None else None
+
+    def get_version(self) -> str:
+        return self.active().get_version()
+
+    def get_classifier(self):
+        return self.active().get_classifier()
+
+    def get_model_artifacts(self) -> Dict[str, Any]:
+        return self.active().get_model_artifacts()
+
+    def get_anomaly_detector(self):
+        return self.active().get_anomaly_detector()
+
+    def get_anomaly_artifacts(self) -> Dict[str, Any]:
+        return self.active().get_anomaly_artifacts()
+
+    def get_anomaly_preprocessor(self) -> "AnomalyPreprocessor":
+        return self.active().get_anomaly_preprocessor()
+
+    def get_anomaly_scorer(self) -> "FlatIsolationForest":
+        return self.active().get_anomaly_scorer()
 
 
 # Global singleton instance
-ml_models = MLModels()
+ml_models = ModelRegistry()
@@ -0,0 +1,89 @@
+"""
+Compiled preprocessing for the anomaly detector
+Turns the list-based encoders and the scaler dict from the anomaly artifacts
+into hash tables and NumPy arrays once, at model load time
+"""
+
+import numpy as np
+from typing import Any, Dict, List, Mapping
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AnomalyPreprocessor:
+    """Label-encodes and scales a whole batch with array operations"""
+
+    def __init__(self, artifacts: Dict[str, Any]):
+        self.features: List[str] = list(artifacts.get("features", []))
+
+        # Listas de categorías -> diccionarios {valor: índice} (búsqueda O(1)).
+        # setdefault conserva el primer índice, igual que list.index()
+        self.encoders: Dict[str, Dict[Any, int]] = {}
+        for col_name, categories_list in artifacts.get("encoders", {}).items():
+            lookup: Dict[Any, int] = {}
+            for idx, value in enumerate(categories_list):
+                lookup.setdefault(value, idx)
+            self.encoders[col_name] = lookup
+
+        scaler_dict = artifacts.get("scaler", {})
+        if scaler_dict and "mean" in scaler_dict and "scale" in scaler_dict:
+            self.mean = np.asarray(scaler_dict["mean"], dtype=np.float64)
+            self.scale = np.asarray(scaler_dict["scale"], dtype=np.float64)
+            self.n_features_scaled = int(scaler_dict.get("n_features", len(self.mean)))
+        else:
+            logger.warning("No scaler information found, using raw values")
+            self.mean = None
+            self.scale = None
+            self.n_features_scaled = 0
+
+    def encode(self, col_name: str, values: Any) -> np.ndarray:
+        """
+        Encode a column of categories into their training indices.
+
+        Unseen categories are encoded as 0, same as the original per-row path.
+        """
+        lookup = self.encoders[col_name]
+        items = np.asarray(values, dtype=object).tolist()
+        codes = np.fromiter(
+            (lookup.get(value, -1) for value in items),
+            dtype=np.int64,
+            count=len(items),
+        )
+        unseen = codes < 0
+        if unseen.any():
+            logger.warning(
+                f"{int(unseen.sum())} unseen categories in {col_name}, using 0"
+            )
+            codes[unseen] = 0
+        return codes
+
+    def transform(self, columns: Mapping[str, Any]) -> np.ndarray:
+        """
+        Build the scaled feature matrix expected by the Isolation Forest.
+
+        Args:
+            columns: Mapping from feature name to a column of values
+                (a DataFrame works as well as a dict of arrays)
+
+        Returns:
+            float64 array of shape (n_rows, n_features), in ``features`` order
+        """
+        n_rows = len(columns[self.features[0]]) if self.features else 0
+        matrix = np.empty((n_rows, len(self.features)), dtype=np.float64)
+
+        for j, col_name in enumerate(self.features):
+            if col_name in self.encoders:
+                matrix[:, j] = self.encode(col_name, columns[col_name])
+            else:
+                matrix[:, j] = np.asarray(columns[col_name], dtype=np.float64)
+
+        return self.scale_columns(matrix)
+
+    def scale_columns(self, matrix: np.ndarray) -> np.ndarray:
+        """Standardize, in place, the leading columns covered by the scaler"""
+        # El scaler solo aplica a las primeras n_features columnas
+        if self.mean is not None:
+            k = self.n_features_scaled
+            matrix[:, :k] = (matrix[:, :k] - self.mean) / self.scale
+        return matrix
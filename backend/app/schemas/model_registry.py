@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class ModelVersionInfo(BaseModel):
+    """Versión de modelos encontrada en ml_models/"""
+
+    version: str
+    path: str
+    state: str  # available, loading, ready, active, failed
+    active: bool
+    fingerprint: Optional[str] = None
+    error: Optional[str] = None
+    updated_at: Optional[str] = None
+
+
+class ModelVersionsResponse(BaseModel):
+    active_version: Optional[str] = None
+    activating: bool = False
+    previous_versions: List[str] = []
+    versions: List[ModelVersionInfo]
+
+
+class ModelActivationResponse(BaseModel):
+    version: str
+    state: str
+    message: str
@@ -3,7 +3,7 @@ Pydantic schemas for ML prediction requests and responses
 """
 
 from pydantic import BaseModel, Field
-from typing import Dict
+from typing import Any, Dict, List, Literal, Optional
 
 
 class PredioInput(BaseModel):
@@ -148,3 +148,43 @@ class PredictionFullResponse(BaseModel):
                 },
             }
         }
+
+
+class PredictionBatchRequest(BaseModel):
+    """Request schema for batch predictions"""
+
+    predios: List[Dict[str, Any]] = Field(
+        ...,
+        description="Lista de predios con la misma estructura de PredioInput",
+        min_length=1,
+        max_length=50000,
+    )
+    modo: Literal["full", "classify-price", "detect-anomaly"] = Field(
+        "full", description="Modelos a ejecutar sobre el lote"
+    )
+
+
+class PredictionBatchItem(BaseModel):
+    """Result for a single row of a batch prediction"""
+
+    indice: int = Field(..., description="Posición del predio en la lista de entrada")
+    clasificacion: Optional[PriceClassificationResponse] = Field(
+        None, description="Resultado de clasificación de precio"
+    )
+    deteccion_anomalia: Optional[AnomalyDetectionResponse] = Field(
+        None, description="Resultado de detección de anomalías"
+    )
+    error: Optional[str] = Field(
+        None, description="Mensaje de error si esta fila no pudo procesarse"
+    )
+
+
+class PredictionBatchResponse(BaseModel):
+    """Response schema for batch predictions"""
+
+    total: int = Field(..., description="Número de predios recibidos")
+    exitosos: int = Field(..., description="Número de predios procesados sin error")
+    fallidos: int = Field(..., description="Número de predios con error")
+    resultados: List[PredictionBatchItem] = Field(
+        ..., description="Resultados en el mismo orden de la entrada"
+    )
@@ -0,0 +1,266 @@
+"""
+Offline bulk scoring
+Streams a transactions CSV/Parquet file in fixed-size chunks, scores each
+chunk with the same preprocessing as PredictionService on a process pool and
+appends rango_precio / ES_ANOMALIA / SCORE_ANOMALIA columns to an output CSV.
+
+Usage:
+    python -m app.scoring transacciones.csv tablero_riesgos.csv
+    python -m app.scoring transacciones.parquet salida.csv --workers 8 --resume
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+import logging
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def _read_chunks(
+    input_path: Path, chunk_size: int, skip_rows: int = 0
+) -> Iterator[pd.DataFrame]:
+    """Yield the input file in chunks of ``chunk_size`` rows"""
+    if input_path.suffix.lower() in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError(
+                "Reading Parquet requires pyarrow (pip install pyarrow)"
+            ) from e
+
+        # Parquet no permite saltar filas sin leerlas: se descartan los lotes
+        # ya procesados sin materializarlos como DataFrame
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            yield batch.slice(skip_rows).to_pandas()
+            skip_rows = 0
+    else:
+        yield from pd.read_csv(
+            input_path,
+            chunksize=chunk_size,
+            skiprows=range(1, skip_rows + 1) if skip_rows else None,
+            dtype={"ORIP": str},
+        )
+
+
+# ----------------------------------------------------------------------
+# Worker process
+# ----------------------------------------------------------------------
+
+_worker_service = None
+
+
+def _init_worker(models_path: Optional[str]):
+    """Load the models once per worker process"""
+    global _worker_service
+    from app.models_ml.model_loader import ml_models
+    from app.services.prediction_service import PredictionService
+
+    ml_models.load_models(path=Path(models_path) if models_path else None)
+    _worker_service = PredictionService()
+
+
+def _score_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Score one chunk and return it with the output columns appended"""
+    results = _worker_service.prediccion_completa_batch(chunk)
+
+    rango, es_anomalia, score, error = [], [], [], []
+    for result in results:
+        if "error" in result:
+            rango.append(None)
+            es_anomalia.append(None)
+            score.append(None)
+            error.append(result["error"])
+            continue
+        anomalia = result["deteccion_anomalia"]
+        rango.append(result["clasificacion"]["rango_precio"])
+        es_anomalia.append(int(anomalia["anomalia_detectada"]))
+        score.append(anomalia["score_anomalia"])
+        error.append(None)
+
+    chunk = chunk.copy()
+    chunk["rango_precio"] = rango
+    chunk["ES_ANOMALIA"] = pd.array(es_anomalia, dtype="Int8")
+    chunk["SCORE_ANOMALIA"] = score
+    chunk["ERROR_SCORING"] = error
+    return chunk
+
+
+# ----------------------------------------------------------------------
+# Checkpoints
+# ----------------------------------------------------------------------
+
+
+def _checkpoint_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".checkpoint.json")
+
+
+def _load_checkpoint(
+    output_path: Path, input_path: Path, chunk_size: int
+) -> Optional[Dict]:
+    path = _checkpoint_path(output_path)
+    if not path.exists():
+        return None
+    checkpoint = json.loads(path.read_text(encoding="utf-8"))
+    if checkpoint.get("input") != str(input_path.resolve()) or (
+        checkpoint.get("chunk_size") != chunk_size
+    ):
+        raise ValueError(
+            f"Checkpoint {path} belongs to another input or chunk size; "
+            "remove it or run without --resume"
+        )
+    return checkpoint
+
+
+def _save_checkpoint(output_path: Path, checkpoint: Dict):
+    """Write the checkpoint atomically (temporary file + rename)"""
+    path = _checkpoint_path(output_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(checkpoint), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+# ----------------------------------------------------------------------
+# Main loop
+# ----------------------------------------------------------------------
+
+
+def score_file(
+    input_path: Path,
+    output_path: Path,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: Optional[int] = None,
+    resume: bool = False,
+    models_path: Optional[str] = None,
+) -> Dict:
+    """
+    Score ``input_path`` into ``output_path`` chunk by chunk
+
+    At most ``2 * workers`` chunks are in flight, so memory stays constant
+    regardless of the input size. Chunks are written in input order and a
+    checkpoint is saved after each one; with ``resume`` an interrupted run
+    continues after the last chunk written.
+
+    Returns:
+        Final checkpoint dictionary (rows and chunks written)
+    """
+    workers = workers or os.cpu_count() or 1
+    checkpoint = (
+        _load_checkpoint(output_path, input_path, chunk_size) if resume else None
+    )
+
+    if checkpoint:
+        # Descartar cualquier escritura parcial posterior al último checkpoint
+        with open(output_path, "r+b") as f:
+            f.truncate(checkpoint["output_bytes"])
+        logger.info(
+            f"Resuming after {checkpoint['chunks_done']} chunks "
+            f"({checkpoint['rows_done']} rows)"
+        )
+    else:
+        checkpoint = {
+            "input": str(input_path.resolve()),
+            "chunk_size": chunk_size,
+            "chunks_done": 0,
+            "rows_done": 0,
+            "output_bytes": 0,
+        }
+        output_path.write_bytes(b"")
+
+    started = time.perf_counter()
+    rows_at_start = checkpoint["rows_done"]
+    chunks = _read_chunks(input_path, chunk_size, skip_rows=checkpoint["rows_done"])
+    in_flight: Dict[int, Future] = {}
+    next_to_submit = next_to_write = checkpoint["chunks_done"]
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(models_path,)
+    ) as pool, open(output_path, "a", encoding="utf-8", newline="") as out:
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < 2 * workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                in_flight[next_to_submit] = pool.submit(_score_chunk, chunk)
+                next_to_submit += 1
+
+            if next_to_write not in in_flight:
+                break
+
+            scored = in_flight.pop(next_to_write).result()
+            scored.to_csv(out, index=False, header=checkpoint["output_bytes"] == 0)
+            out.flush()
+            os.fsync(out.fileno())
+
+            next_to_write += 1
+            checkpoint["chunks_done"] = next_to_write
+            checkpoint["rows_done"] += len(scored)
+            checkpoint["output_bytes"] = os.fstat(out.fileno()).st_size
+            _save_checkpoint(output_path, checkpoint)
+
+            elapsed = time.perf_counter() - started
+            rate = (checkpoint["rows_done"] - rows_at_start) / elapsed
+            logger.info(
+                f"Chunk {next_to_write}: {checkpoint['rows_done']} rows written "
+                f"({rate:,.0f} rows/s)"
+            )
+
+    _checkpoint_path(output_path).unlink(missing_ok=True)
+    logger.info(f"Done: {checkpoint['rows_done']} rows in {output_path}")
+    return checkpoint
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.scoring",
+        description="Bulk scoring of transactions with the IMDADIC models",
+    )
+    parser.add_argument("input", type=Path, help="Input CSV or Parquet file")
+    parser.add_argument("output", type=Path, help="Output CSV file")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Rows per chunk (default {DEFAULT_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its checkpoint",
+    )
+    parser.add_argument(
+        "--models-path",
+        default=None,
+        help="Directory with the model artifacts (default: latest ml_models/vN)",
+    )
+    args = parser.parse_args(argv)
+
+    score_file(
+        args.input,
+        args.output,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        resume=args.resume,
+        models_path=args.models_path,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Answer cache for FAQ-style chat questions
+Serves questions that match a knowledge base FAQ entry, or a question
+answered before, straight from memory instead of a Gemini round trip.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+from app.core.config import settings
+from app.services.knowledge_base import FAQ
+from app.services.knowledge_index import STOPWORDS, tokenize
+
+FAQ_SOURCE = "faq"
+CACHE_SOURCE = "cache"
+
+# Negaciones e interrogativos cambian la pregunta ("¿Qué NO es...?",
+# "¿Dónde...?" vs "¿Cómo...?"): para la búsqueda BM25 son ruido, pero aquí
+# forman parte de la clave
+QUESTION_WORDS = frozenset("""
+    no sin que cual cuales cuando cuanto cuanta cuantos cuantas donde como
+    quien por hay
+    """.split())
+QUESTION_STOPWORDS = STOPWORDS - QUESTION_WORDS
+
+
+def question_terms(question: str) -> frozenset:
+    """
+    Normalized terms of a question (accents, casing and stopwords removed;
+    negations and question words are kept)
+    """
+    return frozenset(tokenize(question, QUESTION_STOPWORDS))
+
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two term sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class AnswerCache:
+    """
+    Question -> answer lookup with a similarity threshold
+
+    FAQ entries are permanent; answers stored with ``store`` are kept in an
+    LRU of ``max_entries`` with a per-entry TTL. A lookup first tries the
+    exact normalized question, then every entry sharing a term with it
+    (through an inverted index) and returns the most similar answer at or
+    above ``threshold``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        threshold: float = 0.8,
+        faq: Optional[Dict[str, str]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._faq: Dict[frozenset, str] = {}
+        self._entries: "OrderedDict[frozenset, Tuple[float, str]]" = OrderedDict()
+        self._postings: Dict[str, Set[frozenset]] = {}
+        self._lock = threading.Lock()
+        self.hits = {FAQ_SOURCE: 0, CACHE_SOURCE: 0}
+        self.misses = 0
+        self.evictions = 0
+        for question, answer in (faq or {}).items():
+            terms = question_terms(question)
+            if terms:
+                self._faq[terms] = answer
+                self._index(terms)
+
+    def lookup(self, question: str) -> Optional[str]:
+        """Answer for ``question`` or None"""
+        terms = question_terms(question)
+        if not terms:
+            return None
+        with self._lock:
+            match = self._match(terms, time.monotonic())
+            if match is None:
+                self.misses += 1
+                return None
+            source, answer = match
+            self.hits[source] += 1
+            return answer
+
+    def store(self, question: str, answer: str):
+        """Remember a generated answer for similar questions"""
+        terms = question_terms(question)
+        if not terms or not answer or self.max_entries <= 0:
+            return
+        with self._lock:
+            if terms in self._faq:
+                return
+            if terms not in self._entries:
+                self._index(terms)
+            self._entries[terms] = (time.monotonic() + self.ttl_seconds, answer)
+            self._entries.move_to_end(terms)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _match(self, terms: frozenset, now: float) -> Optional[Tuple[str, str]]:
+        if terms in self._faq:
+            return FAQ_SOURCE, self._faq[terms]
+        if self._fresh(terms, now):
+            self._entries.move_to_end(terms)
+            return CACHE_SOURCE, self._entries[terms][1]
+
+        best, best_score = None, self.threshold
+        for candidate in self._candidates(terms):
+            score = similarity(terms, candidate)
+            if score < best_score:
+                continue
+            if candidate in self._faq or self._fresh(candidate, now):
+                best, best_score = candidate, score
+        if best is None:
+            return None
+        if best in self._faq:
+            return FAQ_SOURCE, self._faq[best]
+        self._entries.move_to_end(best)
+        return CACHE_SOURCE, self._entries[best][1]
+
+    def _candidates(self, terms: Iterable[str]) -> Set[frozenset]:
+        candidates: Set[frozenset] = set()
+        for term in terms:
+            candidates.update(self._postings.get(term, ()))
+        return candidates
+
+    def _fresh(self, terms: frozenset, now: float) -> bool:
+        entry = self._entries.get(terms)
+        if entry is None:
+            return False
+        if entry[0] <= now:
+            self._drop(terms)
+            return False
+        return True
+
+    def _index(self, terms: frozenset):
+        for term in terms:
+            self._postings.setdefault(term, set()).add(terms)
+
+    def _drop(self, terms: frozenset):
+        del self._entries[terms]
+        for term in terms:
+            keys = self._postings.get(term)
+            if keys is not None:
+                keys.discard(terms)
+                if not keys:
+                    del self._postings[term]
+
+    def stats(self) -> Dict[str, float]:
+        hits = sum(self.hits.values())
+        lookups = hits + self.misses
+        return {
+            "faq_entries": len(self._faq),
+            "entries": len(self._entries),
+            "faq_hits": self.hits[FAQ_SOURCE],
+            "cache_hits": self.hits[CACHE_SOURCE],
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global answer cache instance
+answer_cache = AnswerCache(
+    max_entries=settings.CHAT_ANSWER_CACHE_SIZE,
+    ttl_seconds=settings.CHAT_ANSWER_CACHE_TTL,
+    threshold=settings.CHAT_ANSWER_CACHE_THRESHOLD,
+    faq=FAQ,
+)
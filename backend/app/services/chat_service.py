@@ -1,241 +1,384 @@
+import asyncio
 import time
 import uuid
-from google import genai
-from google.genai import types
 from app.core.config import settings
-from typing import List, Dict, Optional
+from app.core.executor import inference_executor
+from app.core.metrics import CHAT_TOOL_CALL_SECONDS, GEMINI_REQUEST_SECONDS
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import threading
+from app.services.answer_cache import AnswerCache, answer_cache
+from app.services.history_window import (
+    HistoryWindow,
+    extractive_summary,
+    history_window,
+)
+from app.services.knowledge_index import KnowledgeIndex, get_knowledge_index
+from app.services.session_store import SessionStore, get_session_store
 from app.services.tools import tool_predict_price, tool_detect_anomaly
 
+GEMINI_MODEL = "gemini-2.0-flash"
 
-class ChatSessionManager:
-    """
-    Gestiona historiales de chat en memoria para usuarios anónimos.
-    Implementa patrón Singleton y limpieza automática.
-    """
-
-    _instance = None
-    _lock = threading.Lock()
-
-    def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(ChatSessionManager, cls).__new__(cls)
-                    cls._instance.sessions = {}
-                    cls._instance.max_sessions = 1000
-                    cls._instance.session_timeout = 3600  # 1 hora en segundos
-                    cls._instance.last_cleanup = time.time()
-        return cls._instance
-
-    def get_history(self, session_id: str) -> List[Dict[str, str]]:
-        """Recupera el historial de una sesión"""
-        self._cleanup_if_needed()
-        if session_id in self.sessions:
-            self.sessions[session_id]["last_activity"] = time.time()
-            return self.sessions[session_id]["history"]
-        return []
-
-    def add_message(self, session_id: str, role: str, content: str):
-        """Agrega un mensaje al historial de la sesión"""
-        self._cleanup_if_needed()
-
-        if session_id not in self.sessions:
-            # Si llegamos al límite, forzar limpieza o eliminar el más antiguo
-            if len(self.sessions) >= self.max_sessions:
-                self._force_cleanup()
-
-            self.sessions[session_id] = {"history": [], "last_activity": time.time()}
-
-        self.sessions[session_id]["history"].append({"role": role, "content": content})
-        self.sessions[session_id]["last_activity"] = time.time()
-
-    def _cleanup_if_needed(self):
-        """Ejecuta limpieza si ha pasado suficiente tiempo"""
-        now = time.time()
-        if now - self.last_cleanup > 300:  # Limpiar cada 5 minutos
-            self._force_cleanup()
-            self.last_cleanup = now
-
-    def _force_cleanup(self):
-        """Elimina sesiones inactivas"""
-        now = time.time()
-        expired_sessions = [
-            sid
-            for sid, data in self.sessions.items()
-            if now - data["last_activity"] > self.session_timeout
-        ]
-        for sid in expired_sessions:
-            del self.sessions[sid]
-
-        # Si aún hay demasiadas, eliminar las LRU (Least Recently Used)
-        if len(self.sessions) >= self.max_sessions:
-            sorted_sessions = sorted(
-                self.sessions.items(), key=lambda x: x[1]["last_activity"]
-            )
-            # Eliminar el 10% más antiguo
-            to_remove = int(self.max_sessions * 0.1) or 1
-            for i in range(to_remove):
-                if i < len(sorted_sessions):
-                    del self.sessions[sorted_sessions[i][0]]
+# Vueltas de herramientas por pregunta antes de exigir una respuesta
+MAX_TOOL_ROUNDS = 3
 
 
 class GeminiService:
-    def __init__(self, api_key: str, system_prompt: str | None = None):
-        self.api_key = api_key
-        self.system_prompt = system_prompt
-        self.client = genai.Client(api_key=api_key)
-        self.session_manager = ChatSessionManager()
-
-        self.tools = [tool_predict_price, tool_detect_anomaly]
+    """
+    Chat with Gemini and the prediction tools.
+
+    The ``google.genai`` client is created on first use (importing the SDK
+    alone takes about half a second), and the system prompt can be given as
+    a ``system_prompt_loader`` rendered on first use too, so importing the
+    app needs neither a Gemini key nor the knowledge base. Anonymous
+    session histories go to ``session_store`` (the configured store by
+    default, see ``app.services.session_store``). Only the recent turns
+    that fit the history token budget are sent; older ones go as a rolling
+    summary (see ``app.services.history_window``).
+
+    With a ``knowledge_index_loader`` the system prompt is a short core
+    prompt sent on every turn together with the knowledge base chunks
+    retrieved for the question; without it the full system prompt is sent
+    on the first turn only.
+
+    With an ``answer_cache``, questions matching an FAQ entry (or, on the
+    first turn, a question answered before) are answered from memory.
+
+    ``tools`` are offered to the model as functions; the calls of one turn
+    run concurrently on the inference executor and all their results go
+    back in a single follow-up request.
+    """
 
-    def generate_response(
+    def __init__(
         self,
-        prompt: str,
-        history: Optional[List[Dict[str, str]]] = None,
-        session_id: Optional[str] = None,
-    ) -> str:
+        api_key: str | None,
+        system_prompt: str | None = None,
+        system_prompt_loader: Callable[[], str] | None = None,
+        session_store: SessionStore | None = None,
+        history_window: HistoryWindow = history_window,
+        knowledge_index_loader: Callable[[], KnowledgeIndex] | None = None,
+        retrieval_top_k: int = 4,
+        answer_cache: AnswerCache | None = None,
+        tools: List[Callable] | None = None,
+    ):
+        self.api_key = api_key
+        self._system_prompt = system_prompt
+        self._system_prompt_loader = system_prompt_loader
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._session_store = session_store
+        self.history_window = history_window
+        self._knowledge_index_loader = knowledge_index_loader
+        self.retrieval_top_k = retrieval_top_k
+        self.answer_cache = answer_cache
+
+        self.tools = tools or [tool_predict_price, tool_detect_anomaly]
+        self._tool_functions = {tool.__name__: tool for tool in self.tools}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    if not self.api_key:
+                        raise RuntimeError(
+                            "GEMINI_API_KEY is not configured; the chat is unavailable"
+                        )
+                    from google import genai
+
+                    self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        # Permite inyectar un cliente (p. ej. el stub de las pruebas de carga)
+        self._client = client
+
+    @property
+    def session_manager(self) -> SessionStore:
+        if self._session_store is None:
+            self._session_store = get_session_store()
+        return self._session_store
+
+    @property
+    def knowledge_index(self) -> KnowledgeIndex | None:
+        if self._knowledge_index_loader is None:
+            return None
+        return self._knowledge_index_loader()
+
+    @property
+    def system_prompt(self) -> str | None:
+        if self._system_prompt is None and self._system_prompt_loader is not None:
+            self._system_prompt = self._system_prompt_loader()
+            self._system_prompt_loader = None
+        return self._system_prompt
+
+    async def _timed_generate(self, call: str, **kwargs):
+        """
+        Async generate_content recording its latency in GEMINI_REQUEST_SECONDS
+
+        Uses the SDK's async client, so the event loop keeps serving other
+        requests during the round trip (tools passed in ``config`` are run
+        by the SDK in a worker thread).
+        """
+        started = time.perf_counter()
+        status = "error"
         try:
-            # 1. Preparar historial (Igual que antes)
-            chat_history = []
-            if session_id:
-                chat_history = self.session_manager.get_history(session_id)
-            elif history:
-                chat_history = history
-
-            contents = []
-            if self.system_prompt and not chat_history:
-                contents.append(
-                    types.Content(
-                        role="model", parts=[types.Part(text=self.system_prompt)]
-                    )
-                )
-
-            for msg in chat_history:
-                role = "user" if msg["role"] == "user" else "model"
-                contents.append(
-                    types.Content(role=role, parts=[types.Part(text=msg["content"])])
-                )
+            response = await self.client.aio.models.generate_content(**kwargs)
+            status = "ok"
+            return response
+        finally:
+            GEMINI_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, call=call, status=status
+            )
 
-            contents.append(types.Content(role="user", parts=[types.Part(text=prompt)]))
+    async def _session_call(self, method: Callable[..., Any], *args) -> Any:
+        """Llamada al almacén de sesiones; las que hacen E/S (SQLite) van a un hilo"""
+        if self.session_manager.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def _chat_history(
+        self, history: Optional[List[Dict[str, str]]], session_id: Optional[str]
+    ) -> List[Dict[str, str]]:
+        if session_id:
+            return await self._session_call(
+                self.session_manager.get_history, session_id
+            )
+        return history or []
+
+    def _cached_answer(
+        self, prompt: str, chat_history: List[Dict[str, str]]
+    ) -> Optional[str]:
+        """
+        Respuesta de la FAQ o de la caché, solo en la primera vuelta: a mitad
+        de conversación la pregunta depende del contexto ("¿y cómo funciona?")
+        """
+        if self.answer_cache is None or chat_history:
+            return None
+        return self.answer_cache.lookup(prompt)
+
+    def _cache_answer(self, prompt: str, chat_history, response_text: str):
+        # Solo respuestas que dependen únicamente de la pregunta
+        if self.answer_cache is not None and not chat_history:
+            self.answer_cache.store(prompt, response_text)
+
+    async def _remember(
+        self, session_id: Optional[str], prompt: str, response_text: str
+    ):
+        if session_id:
+            await self._session_call(
+                self.session_manager.add_messages,
+                session_id,
+                [
+                    {"role": "user", "content": prompt},
+                    {"role": "model", "content": response_text},
+                ],
+            )
 
-            # 2. Llamada inicial al modelo (Usamos gemini-2.0-flash que tienes disponible)
-            # NOTA: Quitamos 'automatic_function_calling' si da problemas y lo hacemos manual
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=contents,
+    async def _prepare_history(
+        self, chat_history: List[Dict[str, str]], key: Optional[str]
+    ) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """(resumen de los turnos antiguos, ventana reciente) del historial"""
+        summarizer = (
+            self._summarize_history
+            if settings.CHAT_HISTORY_SUMMARIZER == "gemini"
+            else None
+        )
+        return await self.history_window.prepare(
+            chat_history, key=key, summarizer=summarizer
+        )
+
+    async def _summarize_history(
+        self, previous: Optional[str], messages: List[Dict[str, str]]
+    ) -> str:
+        """Resumen con Gemini; si falla, el resumen extractivo local"""
+        from google.genai import types
+
+        max_tokens = self.history_window.summary_tokens
+        transcript = "\n".join(
+            f"{'Usuario' if m['role'] == 'user' else 'Asistente'}: {m['content']}"
+            for m in messages
+        )
+        prompt = (
+            "Actualiza el resumen de esta conversación con los mensajes nuevos. "
+            "Conserva los datos concretos (municipios, áreas, valores, resultados) "
+            f"y no superes {max_tokens * 3 // 4} palabras.\n\n"
+            f"Resumen actual:\n{previous or '(vacío)'}\n\n"
+            f"Mensajes nuevos:\n{transcript}"
+        )
+        try:
+            response = await self._timed_generate(
+                "summary",
+                model=GEMINI_MODEL,
+                contents=prompt,
                 config=types.GenerateContentConfig(
-                    temperature=0.7,
-                    max_output_tokens=2048,
-                    tools=self.tools,
+                    temperature=0.2, max_output_tokens=max_tokens
                 ),
             )
-
-            # 3. Procesar respuesta inicial
-            response_text = ""
             if response.text:
-                response_text = response.text
-            elif response.candidates and response.candidates[0].content.parts:
-                parts = response.candidates[0].content.parts
-                response_text = "".join([p.text for p in parts if p.text])
-            else:
-                # Intento de recuperar function_call nativo si existe
-                if response.function_calls:
-                    # Si la librería lo capturó como objeto, aquí iría la lógica nativa
-                    # Pero asumiremos que falla y devuelve texto para este parche
-                    pass
-                return "Lo siento, no pude generar una respuesta válida."
-
-            # 4. DETECCIÓN Y EJECUCIÓN MANUAL DE HERRAMIENTAS
-            # Si el modelo devuelve algo como "tool_predict_price(...)" como texto
-            if (
-                "tool_predict_price(" in response_text
-                or "tool_detect_anomaly(" in response_text
-            ):
-                print(f"🛠️ Detectada llamada a herramienta en texto: {response_text}")
-
-                try:
-                    import re
-
-                    tool_result = "Error ejecutando herramienta."
+                return response.text.strip()
+        except Exception as e:
+            print(f"⚠️ No se pudo resumir el historial con Gemini: {e}")
+        return extractive_summary(previous, messages, max_tokens)
 
-                    if "tool_predict_price" in response_text:
-                        # Extraer argumentos con Regex (simple y efectivo para este caso)
-                        dept_match = re.search(
-                            r"departamento=['\"]([^'\"]*)['\"]", response_text
-                        )
-                        muni_match = re.search(
-                            r"municipio=['\"]([^'\"]*)['\"]", response_text
-                        )
-                        area_match = re.search(
-                            r"area_construida=([\d.]+)", response_text
-                        )
-                        estrato_match = re.search(r"estrato=(\d+)", response_text)
-
-                        if dept_match and muni_match and area_match and estrato_match:
-                            from app.services.tools import (
-                                tool_predict_price,
-                            )  # Import local
-
-                            tool_result = tool_predict_price(
-                                departamento=dept_match.group(1),
-                                municipio=muni_match.group(1),
-                                area_construida=float(area_match.group(1)),
-                                estrato=int(estrato_match.group(1)),
-                            )
-                        else:
-                            tool_result = "Error: No pude entender los parámetros de la predicción."
-
-                    elif "tool_detect_anomaly" in response_text:
-                        val_match = re.search(r"valor=([\d.]+)", response_text)
-                        area_match = re.search(r"area=([\d.]+)", response_text)
-                        muni_match = re.search(
-                            r"municipio=['\"]([^'\"]*)['\"]", response_text
+    def _build_contents(
+        self,
+        prompt: str,
+        chat_history: List[Dict[str, str]],
+        summary: Optional[str] = None,
+    ):
+        """System prompt (y contexto recuperado), resumen, historial y pregunta"""
+        from google.genai import types
+
+        preamble = None
+        if self.knowledge_index is not None:
+            # Prompt base + fragmentos relevantes para esta pregunta
+            context = self.knowledge_index.context(prompt, self.retrieval_top_k)
+            preamble = "\n\n".join(p for p in (self.system_prompt, context) if p)
+        elif not chat_history and not summary:
+            # Prompt completo solo en la primera vuelta
+            preamble = self.system_prompt
+
+        contents = []
+        if preamble:
+            contents.append(
+                types.Content(role="model", parts=[types.Part(text=preamble)])
+            )
+        if summary:
+            contents.append(
+                types.Content(
+                    role="model",
+                    parts=[
+                        types.Part(
+                            text=f"Resumen de la conversación anterior:\n{summary}"
                         )
+                    ],
+                )
+            )
 
-                        if val_match and area_match and muni_match:
-                            from app.services.tools import tool_detect_anomaly
+        for msg in chat_history:
+            role = "user" if msg["role"] == "user" else "model"
+            contents.append(
+                types.Content(role=role, parts=[types.Part(text=msg["content"])])
+            )
 
-                            tool_result = tool_detect_anomaly(
-                                valor=float(val_match.group(1)),
-                                area=float(area_match.group(1)),
-                                municipio=muni_match.group(1),
-                            )
+        contents.append(types.Content(role="user", parts=[types.Part(text=prompt)]))
+        return contents
+
+    def _generation_config(self):
+        """
+        Tools are declared to the model but not run by the SDK: their calls
+        come back as function-call parts and are run by ``_run_tools``
+        """
+        from google.genai import types
+
+        return types.GenerateContentConfig(
+            temperature=0.7,
+            max_output_tokens=2048,
+            tools=self.tools,
+            automatic_function_calling=types.AutomaticFunctionCallingConfig(
+                disable=True
+            ),
+        )
+
+    async def _run_tools(self, call_parts: List[Any]) -> List[Any]:
+        """
+        Run the function calls of one model turn concurrently on the
+        inference executor; one function-response part per call, in order.
+        Failures are reported to the model as ``{"error": ...}``.
+        """
+        from google.genai import types
+
+        async def run(call) -> Any:
+            started = time.perf_counter()
+            status = "error"
+            function = self._tool_functions.get(call.name)
+            try:
+                if function is None:
+                    response = {"error": f"Herramienta desconocida: {call.name}"}
+                else:
+                    result = await inference_executor.run(
+                        function, **_coerce_args(function, call.args or {})
+                    )
+                    response = {"result": result}
+                    status = "ok"
+            except Exception as e:
+                print(f"❌ Error ejecutando {call.name}: {e}")
+                response = {"error": str(e)}
+            finally:
+                CHAT_TOOL_CALL_SECONDS.observe(
+                    time.perf_counter() - started,
+                    tool=call.name or "",
+                    status=status,
+                )
+            return types.Part(
+                function_response=types.FunctionResponse(
+                    id=call.id, name=call.name, response=response
+                )
+            )
 
-                    # 5. Enviar el resultado de vuelta al modelo para que genere la respuesta final
-                    print(f"✅ Resultado herramienta: {tool_result}")
+        print(f"🛠️ Herramientas: {', '.join(p.function_call.name for p in call_parts)}")
+        return list(await asyncio.gather(*(run(p.function_call) for p in call_parts)))
 
-                    # Agregamos lo que el modelo "dijo" (la llamada)
-                    contents.append(
-                        types.Content(
-                            role="model", parts=[types.Part(text=response_text)]
-                        )
-                    )
+    @staticmethod
+    def _tool_turn(contents, call_parts: List[Any], response_parts: List[Any]):
+        """Conversación + llamadas del modelo + todas sus respuestas"""
+        from google.genai import types
 
-                    # Agregamos el resultado como si fuera un mensaje del sistema/usuario
-                    tool_feedback = f"SYSTEM: La herramienta se ejecutó exitosamente. Resultado: {tool_result}. \nPor favor responde al usuario basándote en este resultado."
-                    contents.append(
-                        types.Content(
-                            role="user", parts=[types.Part(text=tool_feedback)]
-                        )
-                    )
+        return contents + [
+            types.Content(role="model", parts=call_parts),
+            types.Content(role="user", parts=response_parts),
+        ]
 
-                    # Segunda llamada
-                    final_response = self.client.models.generate_content(
-                        model="gemini-2.0-flash", contents=contents
-                    )
-                    response_text = final_response.text
+    async def generate_response(
+        self,
+        prompt: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        session_id: Optional[str] = None,
+        history_key: Optional[str] = None,
+    ) -> str:
+        """
+        ``history_key`` identifies a DB conversation so its history summary
+        is cached (anonymous sessions use ``session_id``)
+        """
+        try:
+            # 1. Preparar historial: ventana reciente + resumen de lo anterior
+            full_history = await self._chat_history(history, session_id)
+            cached = self._cached_answer(prompt, full_history)
+            if cached is not None:
+                await self._remember(session_id, prompt, cached)
+                return cached
+            summary, chat_history = await self._prepare_history(
+                full_history, session_id or history_key
+            )
+            contents = self._build_contents(prompt, chat_history, summary)
+
+            # 2. Llamada al modelo; si pide herramientas, se ejecutan todas a la
+            # vez y sus resultados van juntos en la siguiente llamada
+            call = "initial"
+            for turn in range(MAX_TOOL_ROUNDS + 1):
+                response = await self._timed_generate(
+                    call,
+                    model=GEMINI_MODEL,
+                    contents=contents,
+                    config=self._generation_config(),
+                )
+                response_text, call_parts = _response_parts(response)
+                if not call_parts or turn == MAX_TOOL_ROUNDS:
+                    break
+                contents = self._tool_turn(
+                    contents, call_parts, await self._run_tools(call_parts)
+                )
+                call = "tool_followup"
 
-                except Exception as e:
-                    print(f"❌ Error ejecutando tool manualmente: {e}")
-                    # CAMBIO TEMPORAL: Devuelve el error real en el chat para verlo
-                    response_text += f"\nDEBUG ERROR: {str(e)}"
+            if not response_text:
+                return "Lo siento, no pude generar una respuesta válida."
 
-            # 6. Guardar y Retornar
-            if session_id:
-                self.session_manager.add_message(session_id, "user", prompt)
-                self.session_manager.add_message(session_id, "model", response_text)
+            # 3. Guardar y Retornar
+            if call == "initial":
+                self._cache_answer(prompt, full_history, response_text)
+            await self._remember(session_id, prompt, response_text)
 
             return response_text
 
@@ -246,15 +389,150 @@ class GeminiService:
             traceback.print_exc()
             return f"Lo siento, ocurrió un error al procesar tu pregunta."
 
+    async def _timed_stream(self, call: str, **kwargs) -> AsyncIterator[Any]:
+        """
+        generate_content_stream yielding each chunk
 
-# Importar y usar el system prompt mejorado
-try:
-    from app.services.knowledge_base import get_system_prompt
-
-    enhanced_system_prompt = get_system_prompt()
-except ImportError:
-    enhanced_system_prompt = "Eres un asistente experto en análisis inmobiliario."
+        Closing this generator early (client gone) closes the Gemini stream
+        and records the call as ``cancelled``.
+        """
+        started = time.perf_counter()
+        status = "error"
+        stream = None
+        try:
+            stream = await self.client.aio.models.generate_content_stream(**kwargs)
+            async for chunk in stream:
+                yield chunk
+            status = "ok"
+        except (GeneratorExit, asyncio.CancelledError):
+            status = "cancelled"
+            raise
+        finally:
+            if stream is not None and hasattr(stream, "aclose"):
+                await stream.aclose()
+            GEMINI_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, call=call, status=status
+            )
 
-gemini_service = GeminiService(
-    api_key=settings.GEMINI_API_KEY, system_prompt=enhanced_system_prompt
-)
+    async def stream_response(
+        self,
+        prompt: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        session_id: Optional[str] = None,
+        history_key: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the answer as text deltas, as Gemini produces them
+
+        When the model asks for tools, they run once its turn is complete
+        and the follow-up answer is streamed after the text already sent.
+        The exchange is stored in the session only once the stream
+        completes, so an interrupted stream (client disconnect) leaves the
+        history untouched. Errors are raised to the caller. FAQ / cached
+        answers are yielded in one piece.
+        """
+        full_history = await self._chat_history(history, session_id)
+        cached = self._cached_answer(prompt, full_history)
+        if cached is not None:
+            yield cached
+            await self._remember(session_id, prompt, cached)
+            return
+
+        summary, chat_history = await self._prepare_history(
+            full_history, session_id or history_key
+        )
+        contents = self._build_contents(prompt, chat_history, summary)
+
+        response_text = ""
+        call = "initial_stream"
+        for turn in range(MAX_TOOL_ROUNDS + 1):
+            call_parts: List[Any] = []
+            stream = self._timed_stream(
+                call,
+                model=GEMINI_MODEL,
+                contents=contents,
+                config=self._generation_config(),
+            )
+            try:
+                async for chunk in stream:
+                    delta, parts = _response_parts(chunk)
+                    call_parts.extend(parts)
+                    if delta:
+                        response_text += delta
+                        yield delta
+            finally:
+                await stream.aclose()
+            if not call_parts or turn == MAX_TOOL_ROUNDS:
+                break
+            contents = self._tool_turn(
+                contents, call_parts, await self._run_tools(call_parts)
+            )
+            call = "tool_followup_stream"
+
+        if call == "initial_stream":
+            self._cache_answer(prompt, full_history, response_text)
+        await self._remember(session_id, prompt, response_text)
+
+
+def _response_parts(response) -> Tuple[str, List[Any]]:
+    """Texto y partes con llamadas a funciones de una respuesta (o fragmento)"""
+    candidates = getattr(response, "candidates", None)
+    content = candidates[0].content if candidates else None
+    if content is None or not content.parts:
+        from google.genai import types
+
+        calls = getattr(response, "function_calls", None) or []
+        return response.text or "", [types.Part(function_call=c) for c in calls]
+
+    text, call_parts = [], []
+    for part in content.parts:
+        if part.function_call:
+            call_parts.append(part)
+        elif part.text and not part.thought:
+            text.append(part.text)
+    return "".join(text), call_parts
+
+
+def _coerce_args(function: Callable, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Argumentos del modelo con los tipos numéricos de la firma (4.0 -> 4)"""
+    annotations = getattr(function, "__annotations__", {})
+    coerced = {}
+    for name, value in args.items():
+        kind = annotations.get(name)
+        if kind in (int, float) and isinstance(value, (int, float, str)):
+            value = kind(float(value)) if kind is int else kind(value)
+        coerced[name] = value
+    return coerced
+
+
+def enhanced_system_prompt() -> str:
+    """System prompt mejorado desde la base de conocimiento"""
+    try:
+        from app.services.knowledge_base import get_system_prompt
+
+        return get_system_prompt()
+    except ImportError:
+        return "Eres un asistente experto en análisis inmobiliario."
+
+
+def core_system_prompt() -> str:
+    """Prompt base para usar con la recuperación de la base de conocimiento"""
+    from app.services.knowledge_base import get_core_prompt
+
+    return get_core_prompt()
+
+
+if settings.CHAT_RETRIEVAL_ENABLED:
+    gemini_service = GeminiService(
+        api_key=settings.GEMINI_API_KEY,
+        system_prompt_loader=core_system_prompt,
+        knowledge_index_loader=get_knowledge_index,
+        retrieval_top_k=settings.CHAT_RETRIEVAL_TOP_K,
+        answer_cache=answer_cache if settings.CHAT_ANSWER_CACHE_ENABLED else None,
+    )
+else:
+    gemini_service = GeminiService(
+        api_key=settings.GEMINI_API_KEY,
+        system_prompt_loader=enhanced_system_prompt,
+        answer_cache=answer_cache if settings.CHAT_ANSWER_CACHE_ENABLED else None,
+    )
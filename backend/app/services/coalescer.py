@@ -0,0 +1,163 @@
+"""
+Micro-batching coalescer for single-predio predictions
+Groups concurrent single-row requests for a few milliseconds and scores them
+as one matrix on the inference executor
+"""
+
+import asyncio
+from typing import Any, Dict, List, Set, Tuple
+import logging
+from app.core.config import settings
+from app.core.executor import InferenceExecutor, inference_executor
+from app.models_ml.model_loader import MLModels, ml_models
+from app.services.prediction_service import PredictionService, prediction_service
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCoalescer:
+    """
+    Collects concurrent single-predio requests per prediction kind.
+
+    A pending group is flushed when it reaches ``max_batch`` rows or when
+    ``max_wait_ms`` has passed since its first request, whichever comes
+    first. The whole group takes a single slot in the inference executor.
+    """
+
+    def __init__(
+        self,
+        service: PredictionService,
+        executor: InferenceExecutor,
+        max_wait_ms: float,
+        max_batch: int,
+        enabled: bool = True,
+    ):
+        self.service = service
+        self.executor = executor
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self._batch_fns = {
+            "clasificacion": service.clasificar_precio_batch,
+            "anomalia": service.detectar_anomalia_batch,
+            "completa": service.prediccion_completa_batch,
+        }
+        self._pending: Dict[str, List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.rows = 0
+
+    def _cached(self, kind: str, predio_dict: Dict[str, Any]):
+        """Result served from the prediction cache, or None"""
+        if kind != "completa":
+            return self.service.resultado_cacheado(kind, predio_dict)
+        clasificacion = self.service.resultado_cacheado("clasificacion", predio_dict)
+        anomalia = self.service.resultado_cacheado("anomalia", predio_dict)
+        if clasificacion is None or anomalia is None:
+            return None
+        return {"clasificacion": clasificacion, "deteccion_anomalia": anomalia}
+
+    def _store(
+        self,
+        kind: str,
+        predio_dict: Dict[str, Any],
+        result: Dict[str, Any],
+        models: MLModels,
+    ):
+        if kind != "completa":
+            self.service.guardar_resultado(kind, predio_dict, result, models)
+            return
+        self.service.guardar_resultado(
+            "clasificacion", predio_dict, result["clasificacion"], models
+        )
+        self.service.guardar_resultado(
+            "anomalia", predio_dict, result["deteccion_anomalia"], models
+        )
+
+    async def submit(self, kind: str, predio_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Score one predio as part of the next micro-batch
+
+        Args:
+            kind: "clasificacion", "anomalia" or "completa"
+            predio_dict: Dictionary with property features
+
+        Returns:
+            Same result as the matching single-predio service method
+
+        Raises:
+            ValueError: if the row could not be scored
+            InferenceSaturatedError: if the executor rejected the batch
+        """
+        result = self._cached(kind, predio_dict)
+        if result is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            group = self._pending.setdefault(kind, [])
+            group.append((predio_dict, future))
+
+            if len(group) >= self.max_batch:
+                self._flush(kind)
+            elif kind not in self._timers:
+                self._timers[kind] = loop.call_later(self.max_wait, self._flush, kind)
+
+            result = await future
+
+        if kind == "completa":
+            result = {**result, "predio_input": predio_dict}
+        return result
+
+    def _flush(self, kind: str):
+        timer = self._timers.pop(kind, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._pending.pop(kind, [])
+        if group:
+            task = asyncio.ensure_future(self._run(kind, group))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, kind: str, group: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        predios = [predio for predio, _ in group]
+        self.batches += 1
+        self.rows += len(predios)
+        try:
+            # Toda la micro-tanda se puntúa con la misma versión del modelo
+            models = ml_models.active()
+            results = await self.executor.run(
+                self._batch_fns[kind], predios, models=models
+            )
+        except Exception as e:
+            logger.warning(f"Coalesced {kind} batch of {len(predios)} failed: {e}")
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (predio, future), result in zip(group, results):
+            if "error" in result:
+                if not future.done():
+                    future.set_exception(ValueError(result["error"]))
+                continue
+            self._store(kind, predio, result, models)
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": self.rows / self.batches if self.batches else 0.0,
+        }
+
+
+# Global coalescer instance (opt-in through PREDICTION_COALESCE_ENABLED)
+prediction_coalescer = PredictionCoalescer(
+    service=prediction_service,
+    executor=inference_executor,
+    max_wait_ms=settings.PREDICTION_COALESCE_MAX_WAIT_MS,
+    max_batch=settings.PREDICTION_COALESCE_MAX_BATCH,
+    enabled=settings.PREDICTION_COALESCE_ENABLED,
+)
@@ -0,0 +1,286 @@
+"""
+Per-municipio default features for the chat tools
+In a chat the user gives a municipio and maybe a value; the other model
+features are filled from a template for that municipio, precomputed from
+the training data and loaded once per model version.
+
+Usage (precompute the templates of a model version):
+    python -m app.services.feature_templates transacciones.csv ../ml_models/v1
+"""
+
+import argparse
+import json
+import re
+import threading
+import unicodedata
+import weakref
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+import logging
+from app.models_ml.model_loader import MLModels, ml_models
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Archivo de plantillas dentro de la carpeta de la versión (ml_models/vN)
+TEMPLATES_FILE = "feature_templates.json"
+
+# Valores típicos cuando una plantilla no trae un campo
+# (ejemplo de entrada de ml_models/README.md)
+DEFAULT_FEATURES: Dict[str, Any] = {
+    "TIPO_PREDIO_ZONA": "URBANO",
+    "CATEGORIA_RURALIDAD": "Urbano",
+    "ORIP": "001",
+    "ESTADO_FOLIO": "ACTIVO",
+    "YEAR_RADICA": 2024,
+    "NUM_ANOTACION": 5,
+    "Dinámica_Inmobiliaria": 10,
+    "COD_NATUJUR": 125,
+    "COUNT_A": 1,
+    "COUNT_DE": 1,
+    "PREDIOS_NUEVOS": 0,
+    "TIENE_MAS_DE_UN_VALOR": 0,
+}
+
+# Lo que el usuario escribe -> clave del nombre de entrenamiento
+ALIASES = {
+    "BOGOTA": "BOGOTA D C",
+    "BOGOTA DC": "BOGOTA D C",
+    "CARTAGENA": "CARTAGENA DE INDIAS",
+    "CUCUTA": "SAN JOSE DE CUCUTA",
+}
+
+# El valor de la transacción lo da el usuario, nunca la plantilla
+VALUE_FEATURE = "VALOR_CONSTANTE_2024"
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+
+
+def place_key(name: Any) -> str:
+    """Lookup key of a municipio/departamento: upper case, no accents or punctuation"""
+    text = unicodedata.normalize("NFKD", str(name or "").upper())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    key = _NON_ALNUM.sub(" ", text).strip()
+    return ALIASES.get(key, key)
+
+
+class FeatureTemplates:
+    """
+    Full feature rows indexed by normalized (DEPARTAMENTO, MUNICIPIO)
+
+    Each template holds the training spelling of MUNICIPIO (and DEPARTAMENTO
+    when known) plus typical values of the other features. Municipio names
+    repeat across departamentos (e.g. ALBANIA), so a lookup by name alone
+    only resolves when the name is unambiguous; otherwise the departamento
+    is needed. Templates without DEPARTAMENTO (no precomputed file) are
+    found by name and take the departamento given by the caller.
+    """
+
+    def __init__(
+        self,
+        municipios: Iterable[Dict[str, Any]],
+        departamentos: Iterable[str] = (),
+        defaults: Optional[Dict[str, Any]] = None,
+        precomputed: bool = False,
+    ):
+        self.defaults = {**DEFAULT_FEATURES, **(defaults or {})}
+        # True cuando las plantillas traen valores propios de cada municipio
+        # (TEMPLATES_FILE); False si solo son los valores por defecto
+        self.precomputed = precomputed
+        self._departamentos = {place_key(d): d for d in departamentos}
+        self._templates: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._by_name: Dict[str, List[Dict[str, Any]]] = {}
+        for template in municipios:
+            municipio = place_key(template.get("MUNICIPIO"))
+            if not municipio:
+                continue
+            template = {**self.defaults, **template}
+            departamento = place_key(template.get("DEPARTAMENTO"))
+            if departamento:
+                if (departamento, municipio) in self._templates:
+                    continue
+                self._templates[(departamento, municipio)] = template
+                self._departamentos.setdefault(departamento, template["DEPARTAMENTO"])
+            self._by_name.setdefault(municipio, []).append(template)
+
+    def __len__(self) -> int:
+        return sum(map(len, self._by_name.values()))
+
+    def __contains__(self, municipio: str) -> bool:
+        return place_key(municipio) in self._by_name
+
+    def departamento(self, name: str) -> str:
+        """Training spelling of a departamento (``name`` upper-cased if unknown)"""
+        return self._departamentos.get(place_key(name), str(name).upper().strip())
+
+    def fill(
+        self,
+        municipio: str,
+        departamento: Optional[str] = None,
+        overrides: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Predio for ``municipio`` with the given fields over its template
+
+        Returns None for an unknown municipio, or one that has no template
+        in the given departamento. DEPARTAMENTO is left out (and only the
+        defaults are filled in) when the caller does not give it and it
+        cannot be told from the name: the template has none or the name
+        exists in several departamentos.
+        """
+        key = place_key(municipio)
+        candidates = self._by_name.get(key)
+        if not candidates:
+            return None
+        if departamento:
+            template = self._templates.get((place_key(departamento), key))
+            if template is None:
+                # Plantillas sin departamento: se usa el que da el usuario
+                unplaced = [t for t in candidates if not t.get("DEPARTAMENTO")]
+                if not unplaced:
+                    return None
+                template = unplaced[0]
+            predio = dict(template)
+            predio["DEPARTAMENTO"] = self.departamento(departamento)
+        elif len(candidates) == 1:
+            predio = dict(candidates[0])
+        else:
+            # Mismo nombre en varios departamentos: hace falta el departamento
+            predio = {**self.defaults, "MUNICIPIO": candidates[0]["MUNICIPIO"]}
+        for field, value in (overrides or {}).items():
+            if value is not None:
+                predio[field] = value
+        return predio
+
+    @classmethod
+    def from_models(cls, models: MLModels) -> "FeatureTemplates":
+        """
+        Templates of a model version
+
+        Read from ``TEMPLATES_FILE`` in the version folder when it exists;
+        otherwise one template per municipio seen by the anomaly encoders,
+        with the default values and no DEPARTAMENTO (except for municipios
+        named like a departamento, e.g. Bogotá).
+        """
+        encoders = models.get_anomaly_artifacts().get("encoders", {})
+        departamentos = [str(d) for d in encoders.get("DEPARTAMENTO", [])]
+
+        path = Path(models.models_path) / TEMPLATES_FILE
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return cls(
+                data.get("municipios", []),
+                departamentos,
+                data.get("defaults"),
+                precomputed=True,
+            )
+
+        by_key = {place_key(d): d for d in departamentos}
+        municipios = []
+        for municipio in encoders.get("MUNICIPIO", []):
+            template = {"MUNICIPIO": str(municipio)}
+            if place_key(municipio) in by_key:
+                template["DEPARTAMENTO"] = by_key[place_key(municipio)]
+            municipios.append(template)
+        return cls(municipios, departamentos)
+
+
+def build_templates(frame: "pd.DataFrame", features: List[str]) -> List[Dict[str, Any]]:
+    """
+    One template per (DEPARTAMENTO, MUNICIPIO) of ``frame``, busiest first
+
+    Categorical features take the most frequent value of the municipio and
+    numeric ones the median (rounded for integer columns).
+    """
+    import pandas as pd
+
+    keys = ["DEPARTAMENTO", "MUNICIPIO"]
+    columns = [f for f in features if f in frame.columns and f not in keys]
+    groups = frame.groupby(keys, sort=False)
+
+    aggregations = {}
+    for feature in columns:
+        if frame[feature].dtype.kind in "biuf":
+            aggregations[feature] = "median"
+        else:
+            aggregations[feature] = lambda s: (
+                s.mode().iat[0] if s.notna().any() else None
+            )
+    summary = groups.agg(aggregations) if aggregations else groups.size().to_frame()
+    summary = summary.loc[
+        groups.size().sort_values(ascending=False, kind="stable").index
+    ]
+
+    templates = []
+    for (departamento, municipio), row in summary.iterrows():
+        template = {"DEPARTAMENTO": departamento, "MUNICIPIO": municipio}
+        for feature in columns:
+            value = row[feature]
+            if pd.isna(value):
+                continue  # sin datos: se usa el valor por defecto
+            if frame[feature].dtype.kind in "biu":
+                value = int(round(value))
+            elif hasattr(value, "item"):
+                value = value.item()
+            template[feature] = value
+        templates.append(template)
+    return templates
+
+
+_templates: "weakref.WeakKeyDictionary[MLModels, FeatureTemplates]" = (
+    weakref.WeakKeyDictionary()
+)
+_templates_lock = threading.Lock()
+
+
+def get_feature_templates(models: Optional[MLModels] = None) -> FeatureTemplates:
+    """Templates of ``models`` (default: the active version), loaded on first use"""
+    models = models or ml_models.active()
+    templates = _templates.get(models)
+    if templates is None:
+        with _templates_lock:
+            templates = _templates.get(models)
+            if templates is None:
+                templates = FeatureTemplates.from_models(models)
+                _templates[models] = templates
+                logger.info(
+                    f"Feature templates loaded ({models.name}): {len(templates)} municipios"
+                )
+    return templates
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(
+        prog="python -m app.services.feature_templates",
+        description="Precompute the per-municipio feature templates of a model version",
+    )
+    parser.add_argument("input", type=Path, help="Training transactions CSV")
+    parser.add_argument("models_path", type=Path, help="Model version folder (vN)")
+    args = parser.parse_args(argv)
+
+    models = MLModels(args.models_path)
+    models.load_models()
+    features = list(
+        dict.fromkeys(
+            models.get_model_artifacts().get("all_features", [])
+            + models.get_anomaly_artifacts().get("features", [])
+        )
+    )
+    features = [f for f in features if f != VALUE_FEATURE]
+
+    frame = pd.read_csv(args.input, usecols=features, dtype={"ORIP": str})
+    templates = build_templates(frame, features)
+    output = args.models_path / TEMPLATES_FILE
+    output.write_text(
+        json.dumps({"municipios": templates}, ensure_ascii=False, indent=1),
+        encoding="utf-8",
+    )
+    logger.info(f"{len(templates)} templates written to {output}")
+
+
+if __name__ == "__main__":
+    main()
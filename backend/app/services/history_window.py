@@ -0,0 +1,187 @@
+"""
+Token-budgeted chat history
+Keeps the most recent turns of a conversation within a token budget and
+folds the older ones into a rolling summary, cached per conversation so it
+is only updated when the window moves.
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+
+Message = Dict[str, str]
+
+# (resumen anterior, mensajes nuevos a integrar) -> resumen actualizado
+Summarizer = Callable[[Optional[str], List[Message]], Awaitable[str]]
+
+# Aproximación de tokens para texto en español (sin tokenizador local)
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Longitud máxima de cada línea del resumen extractivo
+SUMMARY_LINE_CHARS = 160
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s|\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated token count of ``text``"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def message_tokens(message: Message) -> int:
+    return estimate_tokens(message["content"] or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def _digest(message: Message) -> bytes:
+    payload = f"{message['role']}\0{message['content'] or ''}"
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+def extractive_summary(
+    previous: Optional[str], messages: List[Message], max_tokens: int
+) -> str:
+    """
+    Local summary: one line per message with its first sentence
+
+    The oldest lines are dropped when the summary goes over ``max_tokens``.
+    """
+    lines = previous.splitlines() if previous else []
+    for message in messages:
+        content = " ".join((message["content"] or "").split())
+        if not content:
+            continue
+        sentence = _SENTENCE_END.split(content, maxsplit=1)[0]
+        if len(sentence) > SUMMARY_LINE_CHARS:
+            sentence = sentence[: SUMMARY_LINE_CHARS - 1].rstrip() + "…"
+        speaker = "Usuario" if message["role"] == "user" else "Asistente"
+        lines.append(f"- {speaker}: {sentence}")
+
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class _SummaryState:
+    """Resumen de una conversación hasta el mensaje ``last_folded``"""
+
+    __slots__ = ("last_folded", "summary")
+
+    def __init__(self, last_folded: bytes, summary: str):
+        self.last_folded = last_folded
+        self.summary = summary
+
+
+class HistoryWindow:
+    """
+    Splits a history into a rolling summary and a recent window
+
+    The window holds the newest messages whose estimated tokens fit in
+    ``token_budget`` and starts on a user turn. Everything before it is
+    folded into a summary of at most ``summary_tokens``. Summaries are
+    cached per conversation key (LRU, ``cache_size`` keys) together with
+    the last message they cover: when the window moves, only the messages
+    that left it since are folded into the cached summary. The cached
+    summary survives the store trimming the oldest messages of the
+    history.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        summary_tokens: int = 300,
+        cache_size: int = 1000,
+    ):
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.cache_size = cache_size
+        self._summaries: "OrderedDict[str, _SummaryState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.summary_hits = 0
+        self.summary_updates = 0
+
+    def split(self, history: Sequence[Message]) -> Tuple[List[Message], List[Message]]:
+        """(older messages, recent window) of ``history``"""
+        used = 0
+        start = len(history)
+        while start > 0:
+            tokens = message_tokens(history[start - 1])
+            if used + tokens > self.token_budget:
+                break
+            used += tokens
+            start -= 1
+        # La ventana empieza en un turno del usuario
+        while start < len(history) and start > 0 and history[start]["role"] != "user":
+            start += 1
+        return list(history[:start]), list(history[start:])
+
+    async def prepare(
+        self,
+        history: Sequence[Message],
+        key: Optional[str] = None,
+        summarizer: Optional[Summarizer] = None,
+    ) -> Tuple[Optional[str], List[Message]]:
+        """
+        (summary of the older messages or None, recent window)
+
+        ``key`` identifies the conversation (session or conversation id);
+        without it the summary is rebuilt every call. ``summarizer``
+        defaults to ``extractive_summary``.
+        """
+        older, window = self.split(history)
+        if not older:
+            return None, window
+
+        previous, pending = None, older
+        state = self._cached(key) if key else None
+        if state is not None:
+            # Buscar el último mensaje ya resumido (desde el final)
+            for index in range(len(older) - 1, -1, -1):
+                if _digest(older[index]) == state.last_folded:
+                    previous, pending = state.summary, older[index + 1 :]
+                    break
+
+        if not pending:
+            self.summary_hits += 1
+            return previous, window
+
+        if summarizer is None:
+            summary = extractive_summary(previous, pending, self.summary_tokens)
+        else:
+            summary = await summarizer(previous, pending)
+        self.summary_updates += 1
+        if key:
+            self._store(key, _SummaryState(_digest(older[-1]), summary))
+        return summary, window
+
+    def _cached(self, key: str) -> Optional[_SummaryState]:
+        with self._lock:
+            state = self._summaries.get(key)
+            if state is not None:
+                self._summaries.move_to_end(key)
+            return state
+
+    def _store(self, key: str, state: _SummaryState):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._summaries[key] = state
+            self._summaries.move_to_end(key)
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+
+    def forget(self, key: str):
+        with self._lock:
+            self._summaries.pop(key, None)
+
+
+# Global history window instance
+history_window = HistoryWindow(
+    token_budget=settings.CHAT_HISTORY_TOKEN_BUDGET,
+    summary_tokens=settings.CHAT_HISTORY_SUMMARY_TOKENS,
+    cache_size=settings.CHAT_HISTORY_SUMMARY_CACHE_SIZE,
+)
@@ -3,6 +3,8 @@ Knowledge base for the IMDADIC chat assistant
 Contains structured information about the system, capabilities, and data
 """
 
+from typing import List, Tuple
+
 # Sistema Overview
 SYSTEM_INFO = {
     "name": "IMDADIC",
@@ -231,6 +233,20 @@ IMDADIC tiene 4 funcionalidades principales:
 """,
 }
 
+# Instrucciones comunes al prompt completo y al prompt base
+RESPONSE_INSTRUCTIONS = """1. **Sé claro y conciso**: Responde en español de forma directa y amigable
+2. **Proporciona contexto**: Si mencionas una funcionalidad, explica dónde encontrarla (URL)
+3. **Usa ejemplos**: Si es posible, da ejemplos concretos
+4. **Guía al usuario**: Si no estás seguro de qué pregunta, ofrece opciones
+5. **Reconoce limitaciones**: Si no tienes la información, indícalo claramente
+6. **Enlaces útiles**: Menciona rutas como /detection, /dashboard, /maps cuando sea relevante
+7. **Datos específicos**: Si preguntan por estadísticas exactas actuales de la BD, indica que tienen que verlas en el Dashboard en tiempo real"""
+
+TOOL_INSTRUCTIONS = """- A diferencia de la versión web manual, TÚ TIENES PERMISO Y CAPACIDAD para ejecutar predicciones directamente en el chat si el usuario te da los datos.
+- NO envíes al usuario a la página /detection si ya te dio los datos (Municipio y Departamento; para anomalías también el Valor de la transacción).
+- SI EL USUARIO PROPORCIONA LOS DATOS, **EJECUTA LA HERRAMIENTA (tool_predict_price o tool_detect_anomaly) INMEDIATAMENTE** sin pedir confirmación.
+- Los demás campos del predio se completan con los valores típicos del municipio; solo si faltan datos esenciales, pídelos amablemente."""
+
 
 def get_system_prompt() -> str:
     """Generate comprehensive system prompt for the chat assistant"""
@@ -280,13 +296,7 @@ def get_system_prompt() -> str:
 
 # INSTRUCCIONES DE RESPUESTA
 
-1. **Sé claro y conciso**: Responde en español de forma directa y amigable
-2. **Proporciona contexto**: Si mencionas una funcionalidad, explica dónde encontrarla (URL)
-3. **Usa ejemplos**: Si es posible, da ejemplos concretos
-4. **Guía al usuario**: Si no estás seguro de qué pregunta, ofrece opciones
-5. **Reconoce limitaciones**: Si no tienes la información, indícalo claramente
-6. **Enlaces útiles**: Menciona rutas como /detection, /dashboard, /maps cuando sea relevante
-7. **Datos específicos**: Si preguntan por estadísticas exactas actuales de la BD, indica que tienen que verlas en el Dashboard en tiempo real
+{RESPONSE_INSTRUCTIONS}
 
 # PREGUNTAS FRECUENTES
 
@@ -303,9 +313,103 @@ def get_system_prompt() -> str:
 - Si te preguntan sobre datos estadísticos globales (ej: "cuántas anomalías hay HOY"), indícales que vean el Dashboard (/dashboard).
 
 # USO DE HERRAMIENTAS (CRÍTICO)
-- A diferencia de la versión web manual, TÚ TIENES PERMISO Y CAPACIDAD para ejecutar predicciones directamente en el chat si el usuario te da los datos.
-- NO envíes al usuario a la página /detection si ya te dio los datos (Municipio, Departamento, Área, Estrato).
-- SI EL USUARIO PROPORCIONA LOS DATOS, **EJECUTA LA HERRAMIENTA (tool_predict_price o tool_detect_anomaly) INMEDIATAMENTE** sin pedir confirmación.
-- Solo si faltan datos esenciales, pídelos amablemente.
+{TOOL_INSTRUCTIONS}
 """
     return prompt
+
+
+def get_core_prompt() -> str:
+    """
+    Short fixed prompt sent on every turn when the knowledge base is
+    retrieved per question (see ``get_chunks``)
+    """
+    return f"""Eres un asistente experto del sistema IMDADIC ({SYSTEM_INFO["full_name"]}) del {SYSTEM_INFO["institution"]}.
+Propósito: {SYSTEM_INFO["purpose"]}. Rutas: /detection (análisis de propiedades), /dashboard (KPIs), /maps (mapa de anomalías), /chat (esta interfaz).
+
+# INSTRUCCIONES DE RESPUESTA
+
+{RESPONSE_INSTRUCTIONS}
+
+# USO DE HERRAMIENTAS (CRÍTICO)
+{TOOL_INSTRUCTIONS}
+
+Usa el CONTEXTO RELEVANTE que acompaña cada pregunta; si no cubre la pregunta, dilo claramente.
+"""
+
+
+def get_chunks() -> List[Tuple[str, str]]:
+    """Knowledge base split into (title, text) chunks for retrieval"""
+    coverage = SYSTEM_INFO["coverage"]
+    chunks = [
+        (
+            "Información del sistema",
+            f"{SYSTEM_INFO['full_name']} ({SYSTEM_INFO['name']}), "
+            f"{SYSTEM_INFO['institution']}. {SYSTEM_INFO['purpose']}. Cobertura: "
+            f"{coverage['records']}, período {coverage['period']}, "
+            f"{coverage['municipalities']}, {coverage['departments']}.",
+        ),
+        (
+            "Tecnología y fuente de datos",
+            "\n".join(
+                f"- {k}: {v}" for k, v in SYSTEM_STATS["technology_stack"].items()
+            )
+            + f"\nFuente: {SYSTEM_STATS['data_source']}",
+        ),
+    ]
+
+    for capability in CAPABILITIES.values():
+        lines = [capability["description"]]
+        for key in ("models", "outputs", "use_cases", "features", "capabilities"):
+            lines.extend(f"- {item}" for item in capability.get(key, []))
+        if "data_source" in capability:
+            lines.append(f"Fuente: {capability['data_source']}")
+        chunks.append((capability["name"], "\n".join(lines)))
+
+    chunks.append(
+        (
+            "Tipos de anomalías",
+            "\n".join(f"- {anomaly}" for anomaly in ANOMALY_TYPES),
+        )
+    )
+    chunks.append(
+        (
+            "Campos del modelo",
+            "\n".join(f"- {field}" for field in MODEL_INPUTS["required_fields"]),
+        )
+    )
+    chunks.append(
+        (
+            "Códigos ORIP y de naturaleza jurídica",
+            "\n".join(
+                f"- {name} {value}"
+                for name, values in MODEL_INPUTS["common_values"].items()
+                for value in values
+            ),
+        )
+    )
+    chunks.append(
+        (
+            "Rangos de precio",
+            "\n".join(f"- {k}: {v}" for k, v in PRICE_RANGES.items()),
+        )
+    )
+    chunks.append(
+        (
+            "Niveles de severidad y score de anomalía",
+            "\n".join(f"- {k}: {v}" for k, v in SEVERITY_LEVELS.items()),
+        )
+    )
+
+    for name, flow in USER_FLOWS.items():
+        lines = list(flow["steps"])
+        if "output" in flow:
+            lines.append(f"Resultado: {flow['output']}")
+        chunks.append((f"Cómo {name.replace('_', ' ')}", "\n".join(lines)))
+
+    for question, answer in FAQ.items():
+        chunks.append((question, answer))
+
+    for name, template in RESPONSE_TEMPLATES.items():
+        chunks.append((name.replace("_", " ").capitalize(), template.strip()))
+
+    return chunks
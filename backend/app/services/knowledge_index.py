@@ -0,0 +1,132 @@
+"""
+Retrieval over the chat knowledge base
+An in-process BM25 inverted index over the knowledge base chunks, so each
+chat turn carries only the chunks relevant to the question instead of the
+whole knowledge base.
+"""
+
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+from app.core.metrics import KNOWLEDGE_RETRIEVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+    a al algo como con cual cuales cuando cuanto cuanta cuantos cuantas de del
+    donde el ella en entre es esta este esto fue ha hay la las le les lo los mas
+    me mi mis muy no nos o para pero por que quien se ser si sin sobre son su
+    sus te tiene tu un una uno y ya yo puedo puede quiero saber dime explica
+    explicame
+    """.split())
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)
+    )
+
+
+def _stem(word: str) -> str:
+    """Plural simple: anomalías -> anomalia, precios -> precio"""
+    if len(word) > 4 and word.endswith("es") and word[-3] not in "aeiou":
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str, stopwords: frozenset = STOPWORDS) -> List[str]:
+    """Lowercase, accent-free, stopword-free terms of ``text``"""
+    words = _WORD.findall(_strip_accents(text.lower()))
+    return [_stem(w) for w in words if len(w) > 1 and w not in stopwords]
+
+
+class KnowledgeIndex:
+    """
+    BM25 (Okapi) index over (title, text) chunks
+
+    The title is counted twice so a chunk named after the question (an FAQ
+    entry, "Rangos de precio") ranks first. Postings hold precomputed term
+    weights, so a search is one dict lookup and a few additions per query
+    term.
+    """
+
+    def __init__(
+        self, chunks: Sequence[Tuple[str, str]], k1: float = 1.5, b: float = 0.75
+    ):
+        self.chunks = list(chunks)
+        documents = [tokenize(f"{title} {title} {text}") for title, text in chunks]
+        average = sum(map(len, documents)) / max(len(documents), 1)
+
+        frequencies: Dict[str, Dict[int, int]] = {}
+        for doc_id, terms in enumerate(documents):
+            for term, count in Counter(terms).items():
+                frequencies.setdefault(term, {})[doc_id] = count
+
+        total = len(documents)
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        for term, docs in frequencies.items():
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            self.postings[term] = [
+                (
+                    doc_id,
+                    idf
+                    * tf
+                    * (k1 + 1)
+                    / (tf + k1 * (1 - b + b * len(documents[doc_id]) / average)),
+                )
+                for doc_id, tf in docs.items()
+            ]
+
+    def search(
+        self, query: str, k: int = 4, min_ratio: float = 0.3
+    ) -> List[Tuple[float, str, str]]:
+        """
+        Top ``k`` chunks for ``query`` as (score, title, text)
+
+        Chunks scoring below ``min_ratio`` times the best score are left out.
+        """
+        started = time.perf_counter()
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            for doc_id, weight in self.postings.get(term, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        if best:
+            cutoff = best[0][1] * min_ratio
+            best = [(doc_id, score) for doc_id, score in best if score >= cutoff]
+        KNOWLEDGE_RETRIEVAL_SECONDS.observe(time.perf_counter() - started)
+        return [(score, *self.chunks[doc_id]) for doc_id, score in best]
+
+    def context(self, query: str, k: int = 4) -> str:
+        """Top chunks rendered as a prompt section (empty if nothing matches)"""
+        results = self.search(query, k)
+        if not results:
+            return ""
+        sections = "\n\n".join(f"## {title}\n{text}" for _, title, text in results)
+        return f"# CONTEXTO RELEVANTE\n\n{sections}"
+
+
+_index: Optional[KnowledgeIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """Index over ``knowledge_base.get_chunks()``, built on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from app.services.knowledge_base import get_chunks
+
+                _index = KnowledgeIndex(get_chunks())
+                logger.info(f"Knowledge index built: {len(_index.chunks)} chunks")
+    return _index
@@ -0,0 +1,81 @@
+"""
+In-process cache for prediction results
+LRU with per-entry TTL, keyed on the normalized feature vector and the
+version of the loaded models. After a model swap the previous version's
+entries are never hit again and age out through the LRU and the TTL, so
+requests still running on the old version do not disturb the new one.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+from app.core.config import settings
+
+
+class PredictionCache:
+    """Thread-safe LRU/TTL cache with hit and miss counters"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(kind: str, model_version: str, values: Sequence[Any]) -> bytes:
+        """Canonical 16-byte key for a prediction kind and feature vector"""
+        payload = json.dumps(
+            [kind, model_version, list(values)], ensure_ascii=False, default=str
+        )
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: bytes, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+# Global cache instance
+prediction_cache = PredictionCache(
+    max_entries=settings.PREDICTION_CACHE_SIZE,
+    ttl_seconds=settings.PREDICTION_CACHE_TTL,
+)
@@ -1,19 +1,94 @@
-import pandas as pd
-import numpy as np
+import copy
+import time
 import unicodedata
-from typing import Dict, Any
-from app.models_ml.model_loader import ml_models
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
+from app.core.metrics import PREPROCESSING_SECONDS, observe_model_call
+from app.models_ml.model_loader import MLModels, ml_models
+from app.services.prediction_cache import PredictionCache, prediction_cache
 import logging
 
+if TYPE_CHECKING:
+    # pandas / numpy se importan al primer uso para no pagar su carga al importar la app
+    import numpy as np
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
+# Campos de texto que se normalizan antes de pasar a los modelos
+NORMALIZED_FIELDS = ["DEPARTAMENTO", "MUNICIPIO"]
+
+# Entrada por lotes: lista de predios o DataFrame columnar
+Predios = Union[List[Dict[str, Any]], "pd.DataFrame"]
+
+# Número máximo de filas que se envían al modelo en una sola llamada
+BATCH_CHUNK_SIZE = 5000
+
+
+class PreparedPredios:
+    """
+    Predios normalized and materialized once, shared by both models.
+
+    ``frame`` holds the union of the classifier and anomaly features, with
+    the classifier features first, so each model reads its own columns
+    without copying the input again. ``models`` is the model version the
+    predios were prepared for; both models are run from that same version.
+    """
+
+    def __init__(
+        self,
+        frame: "pd.DataFrame",
+        classifier_features: List[str],
+        anomaly_features: List[str],
+        models: MLModels,
+    ):
+        self.frame = frame
+        self.classifier_features = classifier_features
+        self.anomaly_features = anomaly_features
+        self.models = models
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def classifier_view(self) -> "pd.DataFrame":
+        """Columns used by the LightGBM classifier (leading slice of the frame)"""
+        return self.frame.iloc[:, : len(self.classifier_features)]
+
+    def anomaly_view(self) -> "pd.DataFrame":
+        """Frame read column by column by the anomaly preprocessor"""
+        return self.frame
+
+    def take(self, positions: "np.ndarray") -> "PreparedPredios":
+        """Subset of rows, used to score a batch chunk by chunk"""
+        return PreparedPredios(
+            self.frame.iloc[positions].reset_index(drop=True),
+            self.classifier_features,
+            self.anomaly_features,
+            self.models,
+        )
+
+    def missing_errors(self, features: List[str]) -> List[Optional[str]]:
+        """Return a per-row error message for rows missing required features"""
+        import numpy as np
+
+        missing = self.frame[features].isna().to_numpy()
+        errors: List[Optional[str]] = [None] * len(self.frame)
+        for pos in np.flatnonzero(missing.any(axis=1)):
+            campos = [f for f, falta in zip(features, missing[pos]) if falta]
+            errors[pos] = f"Faltan campos requeridos: {', '.join(campos)}"
+        return errors
+
 
 class PredictionService:
     """Service for ML predictions"""
 
-    def __init__(self):
-        """Initialize prediction service"""
-        pass
+    def __init__(self, cache: Optional[PredictionCache] = None):
+        """
+        Initialize prediction service
+
+        Args:
+            cache: Optional result cache for single-predio predictions
+        """
+        self.cache = cache
 
     def _normalize_text(self, text: Any) -> Any:
         """
@@ -49,6 +124,172 @@ class PredictionService:
         # NOTA: Ya NO quitamos tildes automáticamente porque tu modelo las usa.
         return text
 
+    def preparar(
+        self, predios: Predios, models: Optional[MLModels] = None
+    ) -> PreparedPredios:
+        """
+        Normalize and materialize the input once for both models
+
+        Text normalization runs once per distinct value, and categorical
+        columns are converted to ``category`` once for the whole input.
+        Fields absent from a predio are left as missing values.
+
+        Args:
+            predios: List of dictionaries with property features, or a
+                DataFrame with one column per feature (columnar input)
+            models: Model version to prepare for (default: the active one)
+
+        Returns:
+            PreparedPredios with the superset of classifier and anomaly features
+        """
+        import pandas as pd
+
+        started = time.perf_counter()
+        models = models or ml_models.active()
+        artifacts = models.get_model_artifacts()
+        classifier_features = artifacts.get("all_features", [])
+        cat_features = artifacts.get("cat_features", [])
+        anomaly_features = models.get_anomaly_artifacts().get("features", [])
+
+        columns: Dict[str, Any] = {}
+        for feature in dict.fromkeys(classifier_features + anomaly_features):
+            if isinstance(predios, pd.DataFrame):
+                values = (
+                    predios[feature].tolist()
+                    if feature in predios.columns
+                    else [None] * len(predios)
+                )
+            else:
+                values = [predio.get(feature) for predio in predios]
+            if feature in NORMALIZED_FIELDS:
+                mapping = {value: self._normalize_text(value) for value in set(values)}
+                values = [mapping[value] for value in values]
+            if feature in cat_features:
+                values = pd.Categorical(values)
+            columns[feature] = values
+
+        prepared = PreparedPredios(
+            pd.DataFrame(columns), classifier_features, anomaly_features, models
+        )
+        PREPROCESSING_SECONDS.observe(time.perf_counter() - started, stage="preparar")
+        return prepared
+
+    def _require_features(self, prepared: PreparedPredios, features: List[str]):
+        """Raise if the (single) prepared predio lacks any required feature"""
+        for error in prepared.missing_errors(features):
+            if error:
+                raise KeyError(error)
+
+    def _classify_prepared(self, prepared: PreparedPredios) -> List[Dict[str, Any]]:
+        """Run the LightGBM classifier once over prepared predios"""
+        import numpy as np
+
+        classifier = prepared.models.get_classifier()  # This is a LightGBM Booster
+        target_classes = prepared.models.get_model_artifacts().get(
+            "target_classes", []
+        )  # ['ALTO', 'BAJO', 'LUJO', 'MEDIO']
+
+        # predict() returns one row of class probabilities per predio
+        with observe_model_call("lightgbm", len(prepared)):
+            raw = classifier.predict(prepared.classifier_view())
+        probabilities = np.asarray(raw).reshape(len(prepared), -1)
+        predicted_idx = probabilities.argmax(axis=1)
+        class_names = [str(c) for c in target_classes]
+
+        return [
+            {
+                "rango_precio": target_classes[idx],
+                "probabilidades": dict(zip(class_names, map(float, row))),
+            }
+            for idx, row in zip(predicted_idx, probabilities)
+        ]
+
+    def _detect_prepared(self, prepared: PreparedPredios) -> List[Dict[str, Any]]:
+        """Run the Isolation Forest once over prepared predios"""
+        scorer = prepared.models.get_anomaly_scorer()
+        preprocessor = prepared.models.get_anomaly_preprocessor()
+
+        # Encode (O(1) lookups) and scale with precompiled tables, then get
+        # labels (-1 = anomaly, 1 = normal) and scores (lower = more anomalous)
+        # from a single traversal of the flattened forest
+        with PREPROCESSING_SECONDS.time(stage="anomaly_transform"):
+            matrix = preprocessor.transform(prepared.anomaly_view())
+        with observe_model_call("isolation_forest", len(prepared)):
+            predictions, scores = scorer.predict_and_score(matrix)
+
+        return [
+            {
+                "anomalia_detectada": bool(prediction == -1),
+                "es_normal": bool(prediction == 1),
+                "score_anomalia": float(score),
+                "prediccion_raw": int(prediction),
+            }
+            for prediction, score in zip(predictions, scores)
+        ]
+
+    def _cache_key(
+        self, kind: str, predio_dict: Dict[str, Any], models: MLModels
+    ) -> Optional[bytes]:
+        """
+        Key a single-predio result on its normalized feature vector.
+
+        ``kind`` is "clasificacion" or "anomalia" and selects the features of
+        the corresponding model. Numbers are compared as floats so 5 and 5.0
+        share an entry, and the model version is part of the key.
+        """
+        if self.cache is None:
+            return None
+        version = models.get_version()
+
+        if kind == "clasificacion":
+            features = models.get_model_artifacts().get("all_features", [])
+        else:
+            features = models.get_anomaly_artifacts().get("features", [])
+
+        values = []
+        for feature in features:
+            value = predio_dict.get(feature)
+            if feature in NORMALIZED_FIELDS:
+                value = self._normalize_text(value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = float(value)
+            values.append(value)
+        return self.cache.make_key(kind, version, values)
+
+    def _cache_get(self, key: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        cached = self.cache.get(key)
+        return copy.deepcopy(cached) if cached is not None else None
+
+    def _cache_set(self, key: Optional[bytes], result: Dict[str, Any]):
+        if key is not None:
+            self.cache.set(key, copy.deepcopy(result))
+
+    def resultado_cacheado(
+        self, kind: str, predio_dict: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Cached "clasificacion" or "anomalia" result for a predio, if any"""
+        return self._cache_get(self._cache_key(kind, predio_dict, ml_models.active()))
+
+    def guardar_resultado(
+        self,
+        kind: str,
+        predio_dict: Dict[str, Any],
+        result: Dict[str, Any],
+        models: Optional[MLModels] = None,
+    ):
+        """
+        Store a "clasificacion" or "anomalia" result computed elsewhere
+
+        ``models`` is the version that produced the result; results from a
+        version that is no longer active are not stored.
+        """
+        active = ml_models.active()
+        if models is not None and models is not active:
+            return
+        self._cache_set(self._cache_key(kind, predio_dict, active), result)
+
     def clasificar_precio(self, predio_dict: Dict[str, Any]) -> Dict[str, Any]:
         """
         Classify price range for a property
@@ -60,52 +301,17 @@ class PredictionService:
             Dictionary with predicted class and probabilities
         """
         try:
-            # Get model and artifacts
-            classifier = ml_models.get_classifier()  # This is a LightGBM Booster
-            artifacts = ml_models.get_model_artifacts()
-
-            # Get required features and target info
-            all_features = artifacts.get("all_features", [])
-            cat_features = artifacts.get("cat_features", [])
-            target_classes = artifacts.get(
-                "target_classes", []
-            )  # ['ALTO', 'BAJO', 'LUJO', 'MEDIO']
-
-            # Create a copy to avoid modifying the original dict
-            input_data = predio_dict.copy()
-
-            # Normalize text fields
-            for key in ["DEPARTAMENTO", "MUNICIPIO"]:
-                if key in input_data:
-                    input_data[key] = self._normalize_text(input_data[key])
-
-            # Convert to DataFrame with only required features
-            df = pd.DataFrame([input_data])
-
-            # Select only the features that were used in training
-            df = df[all_features]
-
-            # For LightGBM Booster, categorical features should be specified by name
-            # Make sure categorical features are strings
-            for cat_col in cat_features:
-                if cat_col in df.columns:
-                    df[cat_col] = df[cat_col].astype("category")
-
-            # Make prediction using Booster API
-            # predict() returns probabilities for multiclass
-            probabilities = classifier.predict(df)[0]  # Get first row's probabilities
-
-            # Get the predicted class (index with highest probability)
-            predicted_class_idx = np.argmax(probabilities)
-            predicted_class = target_classes[predicted_class_idx]
-
-            # Build probability dictionary
-            prob_dict = {
-                str(target_classes[i]): float(probabilities[i])
-                for i in range(len(target_classes))
-            }
-
-            return {"rango_precio": predicted_class, "probabilidades": prob_dict}
+            models = ml_models.active()
+            key = self._cache_key("clasificacion", predio_dict, models)
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+            prepared = self.preparar([predio_dict], models)
+            self._require_features(prepared, prepared.classifier_features)
+            result = self._classify_prepared(prepared)[0]
+            self._cache_set(key, result)
+            return result
 
         except Exception as e:
             logger.error(f"Error in price classification: {e}")
@@ -125,95 +331,17 @@ class PredictionService:
             Dictionary with anomaly detection results
         """
         try:
-            # Get model and artifacts
-            detector = ml_models.get_anomaly_detector()
-            artifacts = ml_models.get_anomaly_artifacts()
-
-            # Get required info
-            features = artifacts.get("features", [])
-            encoders = artifacts.get("encoders", {})  # Dict with lists as values
-            scaler_dict = artifacts.get("scaler", {})
-
-            # Create a copy and normalize
-            input_data = predio_dict.copy()
-            for key in ["DEPARTAMENTO", "MUNICIPIO"]:
-                if key in input_data:
-                    input_data[key] = self._normalize_text(input_data[key])
-
-            # Convert to DataFrame
-            df = pd.DataFrame([input_data])
-
-            # Select only the required features
-            df = df[features]
-
-            # Apply label encoding for categorical features
-            # Encoders are lists - encode by finding index in the list
-            for col_name, categories_list in encoders.items():
-                if col_name in df.columns:
-                    original_value = df[col_name].iloc[0]
-                    try:
-                        # Find index of value in categories list
-                        encoded_value = categories_list.index(original_value)
-                        df[col_name] = encoded_value
-                        logger.info(
-                            f"Encoded {col_name}: '{original_value}' -> {encoded_value}"
-                        )
-                    except ValueError:
-                        # Handle unseen categories - use 0
-                        logger.warning(
-                            f"Unseen category in {col_name}: '{original_value}', using 0"
-                        )
-                        df[col_name] = 0
-
-            # Apply manual scaling
-            # The scaler only applies to the first n_features (3 in this case)
-            # which are the numerical features, not the encoded categorical ones
-            if scaler_dict and "mean" in scaler_dict and "scale" in scaler_dict:
-                mean = np.array(scaler_dict["mean"])
-                scale = np.array(scaler_dict["scale"])
-                n_features_scaled = scaler_dict.get("n_features", len(mean))
-
-                # Get the values as numpy array
-                df_values = df.values[0]  # Get the 1D array
-
-                # Only scale the first n_features_scaled features
-                # The rest (encoded categoricals) are left as-is
-                scaled_features = (df_values[:n_features_scaled] - mean) / scale
-
-                # Combine scaled numerical features with unscaled encoded categoricals
-                if len(df_values) > n_features_scaled:
-                    df_scaled = np.concatenate(
-                        [scaled_features, df_values[n_features_scaled:]]
-                    )
-                else:
-                    df_scaled = scaled_features
-
-                # Reshape to 2D array (1 row, n features)
-                df_scaled = df_scaled.reshape(1, -1)
-
-                logger.info(f"Scaling applied to first {n_features_scaled} features")
-            else:
-                # No scaler, use raw values
-                logger.warning("No scaler information found, using raw values")
-                df_scaled = df.values
-
-            # --- FIX: Reconstruct DataFrame with feature names ---
-            # IsolationForest was fitted with feature names, so we must provide them
-            # to avoid UserWarning and potential mismatches.
-            df_final = pd.DataFrame(df_scaled, columns=features)
-
-            # Make prediction (-1 = anomaly, 1 = normal)
-            prediction = detector.predict(df_final)[0]
-
-            # Get anomaly score (lower = more anomalous)
-            score = detector.score_samples(df_final)[0]
-
-            return {
-                "anomalia_detectada": prediction == -1,
-                "es_normal": prediction == 1,
-                "score_anomalia": float(score),
-                "prediccion_raw": int(prediction),
-            }
+            models = ml_models.active()
+            key = self._cache_key("anomalia", predio_dict, models)
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+            prepared = self.preparar([predio_dict], models)
+            self._require_features(prepared, prepared.anomaly_features)
+            result = self._detect_prepared(prepared)[0]
+            self._cache_set(key, result)
+            return result
 
         except Exception as e:
             logger.error(f"Error in anomaly detection: {e}")
@@ -226,6 +354,9 @@ class PredictionService:
         """
         Perform both price classification and anomaly detection
 
+        The input is normalized and materialized once and shared by both
+        models. Results already in the cache are reused per model.
+
         Args:
             predio_dict: Dictionary with property features
 
@@ -233,8 +364,23 @@ class PredictionService:
             Dictionary with both classification and anomaly detection results
         """
         try:
-            clasificacion = self.clasificar_precio(predio_dict)
-            anomalia = self.detectar_anomalia(predio_dict)
+            models = ml_models.active()
+            key_clasificacion = self._cache_key("clasificacion", predio_dict, models)
+            key_anomalia = self._cache_key("anomalia", predio_dict, models)
+            clasificacion = self._cache_get(key_clasificacion)
+            anomalia = self._cache_get(key_anomalia)
+
+            # Only the models without a cached result are run
+            if clasificacion is None or anomalia is None:
+                prepared = self.preparar([predio_dict], models)
+                if clasificacion is None:
+                    self._require_features(prepared, prepared.classifier_features)
+                    clasificacion = self._classify_prepared(prepared)[0]
+                    self._cache_set(key_clasificacion, clasificacion)
+                if anomalia is None:
+                    self._require_features(prepared, prepared.anomaly_features)
+                    anomalia = self._detect_prepared(prepared)[0]
+                    self._cache_set(key_anomalia, anomalia)
 
             return {
                 "clasificacion": clasificacion,
@@ -246,6 +392,131 @@ class PredictionService:
             logger.error(f"Error in full prediction: {e}")
             raise
 
+    # ------------------------------------------------------------------
+    # Predicción por lotes
+    # ------------------------------------------------------------------
+
+    def _run_in_chunks(
+        self,
+        prepared: PreparedPredios,
+        features: List[str],
+        score_chunk: Callable[[PreparedPredios], List[Dict[str, Any]]],
+        etiqueta: str,
+    ) -> List[Dict[str, Any]]:
+        """
+        Score the valid rows of ``prepared`` chunk by chunk, keeping input order.
+
+        Rows with missing features, or belonging to a chunk whose model call
+        fails, get an ``{"error": ...}`` entry instead of a result.
+        """
+        import numpy as np
+
+        errors = prepared.missing_errors(features)
+        results: List[Dict[str, Any]] = [
+            {"error": error} if error else {} for error in errors
+        ]
+        valid_positions = np.array(
+            [i for i, error in enumerate(errors) if error is None], dtype=np.intp
+        )
+
+        for start in range(0, len(valid_positions), BATCH_CHUNK_SIZE):
+            positions = valid_positions[start : start + BATCH_CHUNK_SIZE]
+            try:
+                chunk_results = score_chunk(prepared.take(positions))
+            except Exception as e:
+                logger.error(f"Error in batch {etiqueta} chunk at row {start}: {e}")
+                chunk_results = [{"error": str(e)} for _ in positions]
+            for pos, result in zip(positions, chunk_results):
+                results[pos] = result
+
+        return results
+
+    def clasificar_precio_batch(
+        self, predios: Predios, models: Optional[MLModels] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Classify the price range of many properties in one vectorized pass
+
+        Args:
+            predios: List of dictionaries with property features, or a
+                DataFrame with one column per feature
+            models: Model version to use (default: the active one)
+
+        Returns:
+            One entry per input row, in input order. Each entry is either a
+            classification result or ``{"error": message}``.
+        """
+        if len(predios) == 0:
+            return []
+        prepared = self.preparar(predios, models)
+        return self._run_in_chunks(
+            prepared,
+            prepared.classifier_features,
+            self._classify_prepared,
+            "price classification",
+        )
+
+    def detectar_anomalia_batch(
+        self, predios: Predios, models: Optional[MLModels] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Detect anomalies for many properties in one vectorized pass
+
+        Args:
+            predios: List of dictionaries with property features, or a
+                DataFrame with one column per feature
+            models: Model version to use (default: the active one)
+
+        Returns:
+            One entry per input row, in input order. Each entry is either an
+            anomaly detection result or ``{"error": message}``.
+        """
+        if len(predios) == 0:
+            return []
+        prepared = self.preparar(predios, models)
+        return self._run_in_chunks(
+            prepared,
+            prepared.anomaly_features,
+            self._detect_prepared,
+            "anomaly detection",
+        )
+
+    def prediccion_completa_batch(
+        self, predios: Predios, models: Optional[MLModels] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Perform price classification and anomaly detection for many properties
+
+        Args:
+            predios: List of dictionaries with property features, or a
+                DataFrame with one column per feature
+            models: Model version to use (default: the active one)
+
+        Returns:
+            One entry per input row, in input order, with ``clasificacion``
+            and ``deteccion_anomalia`` keys, or ``{"error": message}``.
+        """
+        if len(predios) == 0:
+            return []
+        prepared = self.preparar(predios, models)
+
+        def score_chunk(chunk: PreparedPredios) -> List[Dict[str, Any]]:
+            clasificaciones = self._classify_prepared(chunk)
+            anomalias = self._detect_prepared(chunk)
+            return [
+                {"clasificacion": c, "deteccion_anomalia": a}
+                for c, a in zip(clasificaciones, anomalias)
+            ]
+
+        return self._run_in_chunks(
+            prepared,
+            list(
+                dict.fromkeys(prepared.classifier_features + prepared.anomaly_features)
+            ),
+            score_chunk,
+            "full prediction",
+        )
+
 
 # Global service instance
-prediction_service = PredictionService()
+prediction_service = PredictionService(cache=prediction_cache)
@@ -0,0 +1,543 @@
+"""
+Chat session stores
+History of the anonymous chat sessions, behind a small interface with two
+backends: in process memory (one worker) and SQLite in WAL mode on local
+disk, shared by every worker of the host so a session survives landing on
+another worker.
+"""
+
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Deque, Dict, Iterable, List, Optional
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, str]
+
+SESSION_BACKENDS = ("memory", "sqlite")
+
+
+def _message_bytes(message: Message) -> int:
+    """Tamaño del mensaje: texto en UTF-8 más el rol"""
+    return len(message["content"].encode("utf-8")) + len(message["role"])
+
+
+def _clean(message: Message) -> Message:
+    return {"role": message["role"], "content": message["content"] or ""}
+
+
+class SessionStore(ABC):
+    """
+    History per session id, expiring after ``session_timeout`` seconds idle
+
+    Reading a session counts as activity. Each history is capped at
+    ``max_session_bytes``, dropping the oldest messages first (the last one
+    is always kept).
+    """
+
+    # Las llamadas hacen E/S y se ejecutan fuera del event loop
+    blocking = True
+
+    def get_history(self, session_id: str) -> List[Message]:
+        return self.get_histories([session_id]).get(session_id, [])
+
+    @abstractmethod
+    def get_histories(self, session_ids: Iterable[str]) -> Dict[str, List[Message]]:
+        """History of several sessions in one read (missing ones are omitted)"""
+
+    def add_message(self, session_id: str, role: str, content: str):
+        self.add_messages(session_id, [{"role": role, "content": content}])
+
+    def add_messages(self, session_id: str, messages: List[Message]):
+        """Append messages to one session (e.g. question and answer)"""
+        self.add_many({session_id: messages})
+
+    @abstractmethod
+    def add_many(self, batch: Dict[str, List[Message]]):
+        """Append messages to several sessions in one write"""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Remove a session and its history"""
+
+    @abstractmethod
+    def memory_usage(self) -> Dict[str, int]:
+        """{"sessions", "messages", "bytes", "evictions"}"""
+
+    def close(self):
+        pass
+
+
+class _Session:
+    """Historial de una sesión y su tamaño en bytes"""
+
+    __slots__ = ("history", "bytes", "last_activity")
+
+    def __init__(self):
+        self.history: Deque[Message] = deque()
+        self.bytes = 0
+        self.last_activity = time.time()
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Sessions in process memory, for a single worker.
+
+    Sessions live in an ``OrderedDict`` kept in least-recently-used order:
+    every read or write moves the session to the end, so expired sessions
+    and eviction candidates are always at the front and are removed in
+    O(1). Besides the per-session cap, all sessions together are capped at
+    ``max_total_bytes``. A lock makes it safe to use from the event loop
+    and worker threads.
+    """
+
+    blocking = False
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        session_timeout: float = 3600,
+        max_session_bytes: int = 64 * 1024,
+        max_total_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self.max_sessions = max_sessions
+        self.session_timeout = session_timeout  # segundos
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+
+    def get_histories(self, session_ids: Iterable[str]) -> Dict[str, List[Message]]:
+        """Recupera (copias de) los historiales"""
+        histories = {}
+        with self._lock:
+            self._expire(time.time())
+            for session_id in session_ids:
+                session = self.sessions.get(session_id)
+                if session is not None:
+                    self._touch(session_id, session)
+                    histories[session_id] = list(session.history)
+        return histories
+
+    def add_many(self, batch: Dict[str, List[Message]]):
+        with self._lock:
+            self._expire(time.time())
+            for session_id, messages in batch.items():
+                self._append(session_id, messages)
+            while self.total_bytes > self.max_total_bytes and len(self.sessions) > 1:
+                self._evict_oldest()
+
+    def _append(self, session_id: str, messages: List[Message]):
+        session = self.sessions.get(session_id)
+        if session is None:
+            # Si llegamos al límite, eliminar la sesión menos usada
+            while len(self.sessions) >= self.max_sessions:
+                self._evict_oldest()
+            session = self.sessions[session_id] = _Session()
+
+        for message in messages:
+            message = _clean(message)
+            size = _message_bytes(message)
+            session.history.append(message)
+            session.bytes += size
+            self.total_bytes += size
+
+        # Recortar los mensajes más antiguos (se conserva el último)
+        while session.bytes > self.max_session_bytes and len(session.history) > 1:
+            size = _message_bytes(session.history.popleft())
+            session.bytes -= size
+            self.total_bytes -= size
+
+        self._touch(session_id, session)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+            if session is not None:
+                self.total_bytes -= session.bytes
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Sesiones, mensajes y bytes de texto retenidos"""
+        with self._lock:
+            return {
+                "sessions": len(self.sessions),
+                "messages": sum(len(s.history) for s in self.sessions.values()),
+                "bytes": self.total_bytes,
+                "evictions": self.evictions,
+            }
+
+    def _touch(self, session_id: str, session: _Session):
+        session.last_activity = time.time()
+        self.sessions.move_to_end(session_id)
+
+    def _evict_oldest(self):
+        _, session = self.sessions.popitem(last=False)
+        self.total_bytes -= session.bytes
+        self.evictions += 1
+
+    def _expire(self, now: float):
+        """Elimina sesiones inactivas: por el orden LRU están al principio"""
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if now - session.last_activity <= self.session_timeout:
+                break
+            self._evict_oldest()
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id TEXT PRIMARY KEY,
+    last_activity REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_chat_sessions_activity
+    ON chat_sessions (last_activity);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_chat_messages_session
+    ON chat_messages (session_id, id);
+"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite file shared by all the workers of a host.
+
+    WAL mode lets readers run while another worker writes. Each call is a
+    single short transaction: histories of several sessions are read with
+    one query in a deferred (read-only) transaction and messages are
+    written with ``executemany``. Reads refresh the activity of a session
+    only when it is older than ``touch_interval`` seconds, so most reads
+    do not write. Expired
+    sessions are never returned and are purged, together with the least
+    recently used ones over ``max_sessions``, at most every
+    ``purge_interval`` seconds in a background thread, off the request
+    path; the same thread samples the usage counters reported by
+    ``memory_usage``. Each thread uses its own connection.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_sessions: int = 100000,
+        session_timeout: float = 3600,
+        max_session_bytes: int = 64 * 1024,
+        purge_interval: float = 60,
+        touch_interval: float = 60,
+        stats_interval: float = 30,
+    ):
+        self.path = Path(path)
+        self.max_sessions = max_sessions
+        self.session_timeout = session_timeout
+        self.max_session_bytes = max_session_bytes
+        self.purge_interval = purge_interval
+        self.touch_interval = touch_interval
+        self.stats_interval = stats_interval
+        self.evictions = 0
+        self._last_purge = 0.0
+        self._maintenance_thread: Optional[threading.Thread] = None
+        self._usage = {"sessions": 0, "messages": 0, "bytes": 0}
+        self._sampled_at = 0.0
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connection()
+        connection.executescript(SQLITE_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit: cada operación abre su propia transacción
+        connection = sqlite3.connect(
+            self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._connections.append(connection)
+        return connection
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def get_histories(self, session_ids: Iterable[str]) -> Dict[str, List[Message]]:
+        session_ids = list(dict.fromkeys(session_ids))
+        if not session_ids:
+            return {}
+        now = time.time()
+        placeholders = ",".join("?" * len(session_ids))
+        connection = self._connection()
+        # Transacción de lectura diferida: en WAL no bloquea a los demás
+        # lectores ni espera a los escritores
+        connection.execute("BEGIN")
+        try:
+            live = connection.execute(
+                f"SELECT session_id, last_activity FROM chat_sessions "
+                f"WHERE session_id IN ({placeholders}) AND last_activity >= ?",
+                (*session_ids, now - self.session_timeout),
+            ).fetchall()
+            histories: Dict[str, List[Message]] = {sid: [] for sid, _ in live}
+            if live:
+                placeholders = ",".join("?" * len(live))
+                for session_id, role, content in connection.execute(
+                    f"SELECT session_id, role, content FROM chat_messages "
+                    f"WHERE session_id IN ({placeholders}) ORDER BY session_id, id",
+                    list(histories),
+                ):
+                    histories[session_id].append({"role": role, "content": content})
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        # La lectura cuenta como actividad, pero solo se escribe cuando la
+        # marca tiene más de touch_interval segundos
+        stale = [sid for sid, last in live if now - last > self.touch_interval]
+        if stale:
+            placeholders = ",".join("?" * len(stale))
+            connection.execute(
+                f"UPDATE chat_sessions SET last_activity = ? "
+                f"WHERE session_id IN ({placeholders}) AND last_activity < ?",
+                (now, *stale, now),
+            )
+        return histories
+
+    def add_many(self, batch: Dict[str, List[Message]]):
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for session_id, messages in batch.items():
+                self._append(connection, session_id, messages, now)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._schedule_maintenance(now)
+
+    def _schedule_maintenance(self, now: float):
+        """
+        Purge (every ``purge_interval``) and sample the usage counters
+        (every ``stats_interval``) in a background thread, one at a time
+        """
+        with self._lock:
+            purge_due = now - self._last_purge > self.purge_interval
+            sample_due = now - self._sampled_at > self.stats_interval
+            running = (
+                self._maintenance_thread is not None
+                and self._maintenance_thread.is_alive()
+            )
+            if running or not (purge_due or sample_due):
+                return
+            if purge_due:
+                self._last_purge = now
+            self._maintenance_thread = threading.Thread(
+                target=self._maintenance,
+                args=(purge_due,),
+                name="chat-session-maintenance",
+                daemon=True,
+            )
+            self._maintenance_thread.start()
+
+    def _maintenance(self, purge: bool):
+        connection = self._connect()
+        try:
+            if purge:
+                self.purge(connection=connection)
+            self.sample_usage(connection)
+        except Exception as e:
+            logger.warning(f"Chat session maintenance failed: {e}")
+        finally:
+            with self._lock:
+                if connection in self._connections:
+                    self._connections.remove(connection)
+            connection.close()
+
+    def _append(
+        self,
+        connection: sqlite3.Connection,
+        session_id: str,
+        messages: List[Message],
+        now: float,
+    ):
+        # Una sesión vencida empieza de cero, igual que en memoria
+        connection.execute(
+            "DELETE FROM chat_messages WHERE session_id = ? AND session_id IN "
+            "(SELECT session_id FROM chat_sessions WHERE last_activity < ?)",
+            (session_id, now - self.session_timeout),
+        )
+        rows = [
+            (session_id, m["role"], m["content"], _message_bytes(m))
+            for m in map(_clean, messages)
+        ]
+        connection.executemany(
+            "INSERT INTO chat_messages (session_id, role, content, bytes) "
+            "VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        # Recortar los más antiguos: se conservan los más recientes que caben
+        kept, total, cutoff = 0, 0, None
+        for message_id, size in connection.execute(
+            "SELECT id, bytes FROM chat_messages WHERE session_id = ? ORDER BY id DESC",
+            (session_id,),
+        ):
+            if kept and total + size > self.max_session_bytes:
+                cutoff = message_id
+                break
+            kept += 1
+            total += size
+        if cutoff is not None:
+            connection.execute(
+                "DELETE FROM chat_messages WHERE session_id = ? AND id <= ?",
+                (session_id, cutoff),
+            )
+        connection.execute(
+            "INSERT INTO chat_sessions (session_id, last_activity, bytes) "
+            "VALUES (?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET "
+            "last_activity = excluded.last_activity, bytes = excluded.bytes",
+            (session_id, now, total),
+        )
+
+    def purge(
+        self,
+        now: Optional[float] = None,
+        connection: Optional[sqlite3.Connection] = None,
+    ) -> int:
+        """Delete expired sessions and the oldest ones over ``max_sessions``"""
+        now = now or time.time()
+        self._last_purge = max(self._last_purge, now)
+        connection = connection or self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            stale = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT session_id FROM chat_sessions WHERE last_activity < ? "
+                    "UNION SELECT session_id FROM ("
+                    "SELECT session_id FROM chat_sessions "
+                    "ORDER BY last_activity DESC LIMIT -1 OFFSET ?)",
+                    (now - self.session_timeout, self.max_sessions),
+                )
+            ]
+            connection.executemany(
+                "DELETE FROM chat_messages WHERE session_id = ?",
+                [(sid,) for sid in stale],
+            )
+            connection.executemany(
+                "DELETE FROM chat_sessions WHERE session_id = ?",
+                [(sid,) for sid in stale],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self.evictions += len(stale)
+        return len(stale)
+
+    def delete(self, session_id: str):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "DELETE FROM chat_messages WHERE session_id = ?", (session_id,)
+            )
+            connection.execute(
+                "DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def sample_usage(
+        self, connection: Optional[sqlite3.Connection] = None
+    ) -> Dict[str, int]:
+        """Count live sessions, messages and bytes in the file (full scan)"""
+        connection = connection or self._connection()
+        now = time.time()
+        sessions, size = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM chat_sessions "
+            "WHERE last_activity >= ?",
+            (now - self.session_timeout,),
+        ).fetchone()
+        (messages,) = connection.execute(
+            "SELECT COUNT(*) FROM chat_messages"
+        ).fetchone()
+        usage = {"sessions": sessions, "messages": messages, "bytes": size}
+        with self._lock:
+            self._usage = usage
+            self._sampled_at = now
+        return dict(usage)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Last sample of ``sample_usage`` (refreshed in the background every
+        ``stats_interval`` seconds, so a /metrics scrape never scans the file)
+        """
+        self._schedule_maintenance(time.time())
+        with self._lock:
+            return {**self._usage, "evictions": self.evictions}
+
+    def close(self):
+        maintenance_thread = self._maintenance_thread
+        if maintenance_thread is not None:
+            maintenance_thread.join(timeout=10)
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    """Store configured by ``CHAT_SESSION_BACKEND`` ("memory" or "sqlite")"""
+    backend = backend or settings.CHAT_SESSION_BACKEND
+    if backend == "memory":
+        return InMemorySessionStore(
+            max_sessions=settings.CHAT_MAX_SESSIONS,
+            session_timeout=settings.CHAT_SESSION_TTL,
+            max_session_bytes=settings.CHAT_SESSION_MAX_BYTES,
+            max_total_bytes=settings.CHAT_SESSIONS_MAX_TOTAL_BYTES,
+        )
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            settings.CHAT_SESSION_SQLITE_PATH,
+            max_sessions=settings.CHAT_MAX_SESSIONS,
+            session_timeout=settings.CHAT_SESSION_TTL,
+            max_session_bytes=settings.CHAT_SESSION_MAX_BYTES,
+        )
+    raise ValueError(
+        f"Unknown CHAT_SESSION_BACKEND '{backend}', expected one of "
+        f"{', '.join(SESSION_BACKENDS)}"
+    )
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide session store, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_session_store()
+                logger.info(f"Chat sessions stored in: {type(_store).__name__}")
+    return _store
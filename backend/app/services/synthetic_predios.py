@@ -0,0 +1,101 @@
+"""
+Synthetic predios for the model warmup, benchmarks and load tests
+Valid PredioInput payloads with realistic categories, reproducible by seed.
+Lives with the services because the serving path (warmup) uses it.
+"""
+
+import random
+from typing import Any, Dict, List, Optional, Sequence
+
+# Categorías por defecto cuando no hay modelos cargados (p. ej. contra un
+# servidor remoto); con modelos se usan las de los encoders de entrenamiento
+DEFAULT_DEPARTAMENTOS = [
+    "ANTIOQUIA",
+    "BOGOTÁ, D. C.",
+    "VALLE DEL CAUCA",
+    "CUNDINAMARCA",
+    "ATLÁNTICO",
+    "SANTANDER",
+    "BOLÍVAR",
+    "NARIÑO",
+]
+DEFAULT_MUNICIPIOS = [
+    "MEDELLÍN",
+    "BOGOTÁ, D.C.",
+    "CALI",
+    "SOACHA",
+    "BARRANQUILLA",
+    "BUCARAMANGA",
+    "CARTAGENA DE INDIAS",
+    "PASTO",
+]
+
+
+def categorias_de_modelos(models) -> Dict[str, List[str]]:
+    """DEPARTAMENTO / MUNICIPIO categories seen by the anomaly encoders"""
+    encoders = models.get_anomaly_preprocessor().encoders
+    return {
+        col: [str(value) for value in encoders[col]]
+        for col in ("DEPARTAMENTO", "MUNICIPIO")
+        if col in encoders
+    }
+
+
+def generar_predios(
+    n: int,
+    seed: int = 0,
+    departamentos: Optional[Sequence[str]] = None,
+    municipios: Optional[Sequence[str]] = None,
+    como_usuario: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Generate ``n`` valid predio payloads
+
+    A share of the names comes in lower case or without accents, as typed by
+    users, so text normalization is exercised too.
+
+    Args:
+        n: Number of predios
+        seed: Random seed (same seed, same predios)
+        departamentos / municipios: Categories to draw from
+        como_usuario: Whether to vary the names as users type them
+    """
+    rng = random.Random(seed)
+    departamentos = list(departamentos or DEFAULT_DEPARTAMENTOS)
+    municipios = list(municipios or DEFAULT_MUNICIPIOS)
+
+    def escrito_por_usuario(value: str) -> str:
+        if not como_usuario:
+            return value
+        roll = rng.random()
+        if roll < 0.1:
+            return value.lower()
+        if roll < 0.15:
+            return value.translate(str.maketrans("ÁÉÍÓÚ", "AEIOU"))
+        return value
+
+    predios = []
+    for _ in range(n):
+        rural = rng.random() < 0.3
+        predios.append(
+            {
+                "DEPARTAMENTO": escrito_por_usuario(rng.choice(departamentos)),
+                "MUNICIPIO": escrito_por_usuario(rng.choice(municipios)),
+                "TIPO_PREDIO_ZONA": "RURAL" if rural else "URBANO",
+                "CATEGORIA_RURALIDAD": rng.choice(
+                    ["Rural", "Rural disperso", "Intermedio"] if rural else ["Urbano"]
+                ),
+                "ORIP": f"{rng.randint(1, 400):03d}",
+                "ESTADO_FOLIO": "ACTIVO" if rng.random() < 0.95 else "CERRADO",
+                "YEAR_RADICA": rng.randint(2015, 2024),
+                "NUM_ANOTACION": rng.randint(1, 40),
+                "Dinámica_Inmobiliaria": rng.randint(0, 30),
+                "COD_NATUJUR": rng.choice([125, 126, 129, 150, 168, 169]),
+                "COUNT_A": rng.randint(1, 4),
+                "COUNT_DE": rng.randint(1, 4),
+                "PREDIOS_NUEVOS": int(rng.random() < 0.1),
+                "TIENE_MAS_DE_UN_VALOR": int(rng.random() < 0.2),
+                "VALOR_CONSTANTE_2024": round(10 ** rng.uniform(6.5, 10.5), 2),
+            }
+        )
+    return predios
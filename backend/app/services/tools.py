@@ -1,70 +1,103 @@
-from app.services.prediction_service import PredictionService
-from app.models_ml.model_loader import ml_models
-import pandas as pd
+"""
+Prediction tools for the chat
+Gemini calls these functions with the fields the user gave; the other model
+features come from the municipio template (``feature_templates``) and the
+predio goes through the shared ``prediction_service``, the same path (and
+cache) as the prediction API.
+"""
 
-# Instancia del servicio existente
-prediction_service = PredictionService()
+from typing import Any, Dict, Optional, Union
+from app.services.feature_templates import (
+    VALUE_FEATURE,
+    FeatureTemplates,
+    get_feature_templates,
+)
+from app.services.prediction_service import prediction_service
 
+ZONAS = {"URBANO": "Urbano", "RURAL": "Rural"}
 
-def tool_predict_price(
-    departamento: str, municipio: str, area_construida: float, estrato: int
-):
-    """
-    Realiza una predicción rápida del rango de precios para una propiedad.
 
-    Args:
-        departamento: Nombre del departamento (ej. ANTIOQUIA).
-        municipio: Nombre del municipio (ej. MEDELLIN).
-        area_construida: Área en metros cuadrados.
-        estrato: Estrato socioeconómico (1-6).
-    """
-    try:
-        # 1. Construir un DataFrame con los datos mínimos requeridos
-        # Nota: Los modelos ML suelen requerir MUCHAS columnas.
-        # Aquí llenamos las faltantes con valores por defecto/promedio para permitir una "predicción rápida".
-        input_data = {
-            "DEPARTAMENTO": [departamento.upper()],
-            "MUNICIPIO": [municipio.upper()],
-            "AREA_CONSTRUIDA": [area_construida],
-            "ESTRATO": [estrato],
-            # --- Valores por defecto para lo que el usuario no dice en el chat ---
-            "TIPO_PREDIO_ZONA": ["URBANO"],
-            "CATEGORIA_RURALIDAD": ["Urbano"],
-            "DESTINO_ECONOMICO": ["HABITACIONAL"],
-            "CLASE_SUELO": ["URBANO"],
-            "YEAR_RADICA": [2024],
-            "NUM_ANOTACION": [1],
-            "Dinámica_Inmobiliaria": [50],  # Valor medio
-            "COD_NATUJUR": [1],
-            "PREDIOS_NUEVOS": [0],
-            "VALOR_CONSTANTE_2024": [0],  # No influye en clasificación si no es target
-        }
+def _completados(templates: FeatureTemplates) -> str:
+    """Cómo se completaron los campos que el usuario no indicó"""
+    if templates.precomputed:
+        return "Los datos no indicados se tomaron de los valores típicos del municipio."
+    return (
+        "No hay valores típicos por municipio para esta versión del modelo: los "
+        "datos no indicados se completaron con valores genéricos, así que el "
+        "resultado es solo orientativo."
+    )
 
-        df = pd.DataFrame(input_data)
 
-        # 2. Llamar al servicio de predicción real
-        # Asegúrate de que tu prediction_service tenga un método que acepte DataFrame
-        # O usa directamente el modelo si es necesario:
+def _predio(
+    templates: FeatureTemplates,
+    municipio: str,
+    departamento: str = "",
+    overrides: Optional[Dict[str, Any]] = None,
+) -> Union[Dict[str, Any], str]:
+    """Predio completo para los modelos, o el mensaje de lo que falta"""
+    predio = templates.fill(municipio, departamento or None, overrides)
+    if predio is None:
+        lugar = f"{municipio} ({departamento})" if departamento else municipio
+        return (
+            f"No hay datos del municipio '{lugar}' en los modelos. "
+            "Pide al usuario que revise el nombre."
+        )
+    if not predio.get("DEPARTAMENTO"):
+        return f"Falta el departamento de {predio['MUNICIPIO']}. Pídeselo al usuario."
+    return predio
 
-        # SIMULACIÓN (Ajusta esto a tu método real en prediction_service.py)
-        # result = prediction_service.classify_price(df)
 
-        # Como no tengo tu prediction_service completo, aquí muestro cómo usaría el modelo cargado:
-        if ml_models.lgbm_classifier:
-            # Aquí iría tu lógica de preprocesamiento real
-            prediction = "RANGO_MEDIO"  # Placeholder si falta preprocesamiento
-            confidence = 0.85
-            return f"El modelo estima que esta propiedad está en el rango: {prediction} con una confianza del {confidence * 100}%."
-        else:
-            return "El modelo de predicción no está cargado actualmente."
+def tool_predict_price(municipio: str, departamento: str = "", zona: str = ""):
+    """
+    Predice el rango de precio (BAJO, MEDIO, ALTO, LUJO) de los predios de un municipio con el modelo LightGBM.
 
-    except Exception as e:
-        return f"Error ejecutando el modelo: {str(e)}"
+    Args:
+        municipio: Nombre del municipio (ej. MEDELLÍN).
+        departamento: Nombre del departamento (ej. ANTIOQUIA).
+        zona: URBANO o RURAL; vacío si el usuario no lo indica.
+    """
+    zona = zona.upper().strip()
+    overrides = (
+        {"TIPO_PREDIO_ZONA": zona, "CATEGORIA_RURALIDAD": ZONAS[zona]}
+        if zona in ZONAS
+        else None
+    )
+    templates = get_feature_templates()
+    predio = _predio(templates, municipio, departamento, overrides)
+    if isinstance(predio, str):
+        return predio
+
+    result = prediction_service.clasificar_precio(predio)
+    probabilidades = sorted(
+        result["probabilidades"].items(), key=lambda item: item[1], reverse=True
+    )
+    detalle = ", ".join(f"{rango} {p * 100:.1f}%" for rango, p in probabilidades)
+    return (
+        f"Rango de precio estimado en {predio['MUNICIPIO']} ({predio['DEPARTAMENTO']}): "
+        f"{result['rango_precio']} con una confianza del {probabilidades[0][1] * 100:.1f}% "
+        f"({detalle}). {_completados(templates)}"
+    )
 
 
-def tool_detect_anomaly(valor: float, area: float, municipio: str):
+def tool_detect_anomaly(valor: float, municipio: str, departamento: str = ""):
     """
-    Analiza si una transacción parece anómala basada en valor y área.
+    Analiza con el modelo Isolation Forest si el valor de una transacción es anómalo para el municipio.
+
+    Args:
+        valor: Valor de la transacción en pesos colombianos.
+        municipio: Nombre del municipio (ej. MEDELLÍN).
+        departamento: Nombre del departamento (ej. ANTIOQUIA).
     """
-    # Lógica similar llamando a Isolation Forest
-    return f"Análisis completado: La transacción de {valor} para {area}m2 en {municipio} se considera NORMAL."
+    templates = get_feature_templates()
+    predio = _predio(templates, municipio, departamento, {VALUE_FEATURE: float(valor)})
+    if isinstance(predio, str):
+        return predio
+
+    result = prediction_service.detectar_anomalia(predio)
+    estado = "ANÓMALA" if result["anomalia_detectada"] else "NORMAL"
+    return (
+        f"La transacción de ${valor:,.0f} en {predio['MUNICIPIO']} "
+        f"({predio['DEPARTAMENTO']}) se considera {estado} "
+        f"(score de anomalía {result['score_anomalia']:.4f}; más bajo = más anómalo). "
+        f"{_completados(templates)}"
+    )
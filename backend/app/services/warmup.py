@@ -0,0 +1,61 @@
+"""
+Warmup of the prediction pipeline
+Runs synthetic batches through every prediction path after the models are
+loaded, so the first real requests do not pay one-time costs (LightGBM
+setup, pandas category dtypes, text normalization, scorer arrays paged in).
+"""
+
+import time
+from typing import Optional, Sequence
+import logging
+from app.models_ml.model_loader import MLModels, ml_models
+from app.services.feature_templates import get_feature_templates
+from app.services.prediction_service import PredictionService
+from app.services.synthetic_predios import categorias_de_modelos, generar_predios
+
+logger = logging.getLogger(__name__)
+
+# Tamaños de lote sintéticos: fila suelta (endpoints unitarios) y un lote
+WARMUP_BATCH_SIZES = (1, 64)
+
+
+def warmup_pipeline(
+    models: Optional[MLModels] = None,
+    batch_sizes: Sequence[int] = WARMUP_BATCH_SIZES,
+) -> float:
+    """
+    Warm up ``models`` (default: the active version) end to end
+
+    ``MLModels.warmup`` first materializes every artifact and runs each
+    model once, and the chat tool templates are loaded; then synthetic
+    predios go through the single-predio and batch paths of
+    ``PredictionService`` (the single-predio methods always use the active
+    version). An uncached service is used so the synthetic
+    results do not end up in the prediction cache.
+
+    Returns:
+        Seconds spent
+    """
+    started = time.perf_counter()
+    models = models or ml_models.active()
+    models.warmup()
+    get_feature_templates(models)
+
+    service = PredictionService()
+    categorias = categorias_de_modelos(models)
+    predios = generar_predios(
+        max(batch_sizes),
+        seed=0,
+        departamentos=categorias.get("DEPARTAMENTO"),
+        municipios=categorias.get("MUNICIPIO"),
+        como_usuario=False,
+    )
+    service.clasificar_precio(predios[0])
+    service.detectar_anomalia(predios[0])
+    service.prediccion_completa(predios[0])
+    for size in batch_sizes:
+        service.prediccion_completa_batch(predios[:size], models)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"🔥 Prediction pipeline warmed up ({models.name}) in {elapsed:.2f}s")
+    return elapsed
@@ -0,0 +1,61 @@
+"""
+Shared test doubles
+"""
+
+import asyncio
+from typing import Optional
+
+STUB_ANSWER = "Respuesta simulada para pruebas."
+
+
+class _StubGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates = []
+        self.function_calls = None
+
+
+class _StubGeminiModels:
+    """
+    ``client.aio.models`` answering ``STUB_ANSWER``
+
+    Counts the calls in flight; with ``release_at`` every call waits until
+    that many are in flight at once, so a test can check that calls really
+    overlap without measuring time (the wait fails after ``timeout``).
+    """
+
+    def __init__(self, release_at: Optional[int], timeout: float):
+        self.release_at = release_at
+        self.timeout = timeout
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._released: Optional[asyncio.Event] = None
+
+    async def generate_content(self, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.release_at is not None:
+                if self._released is None:
+                    self._released = asyncio.Event()
+                if self.in_flight >= self.release_at:
+                    self._released.set()
+                await asyncio.wait_for(self._released.wait(), self.timeout)
+            return _StubGeminiResponse(STUB_ANSWER)
+        finally:
+            self.in_flight -= 1
+
+    async def generate_content_stream(self, **kwargs):
+        return self._stream()
+
+    async def _stream(self):
+        for i, word in enumerate(STUB_ANSWER.split(" ")):
+            await asyncio.sleep(0)
+            yield _StubGeminiResponse(word if i == 0 else " " + word)
+
+
+class StubGeminiClient:
+    """Stand-in for ``genai.Client`` in the chat tests (async API only)"""
+
+    def __init__(self, release_at: Optional[int] = None, timeout: float = 5.0):
+        self.aio = type("Aio", (), {"models": _StubGeminiModels(release_at, timeout)})()
@@ -0,0 +1,49 @@
+"""
+Answer cache for FAQ-style chat questions
+"""
+
+from app.services.answer_cache import AnswerCache
+from app.services.knowledge_base import FAQ
+
+
+def test_faq_matches_ignore_accents_casing_and_stopwords():
+    cache = AnswerCache(faq=FAQ)
+
+    assert cache.lookup("que es imdadic") == FAQ["¿Qué es IMDADIC?"]
+    assert (
+        cache.lookup("¿Qué SIGNIFICA el score de las anomalías?")
+        == FAQ["¿Qué significa el score de anomalía?"]
+    )
+    # Demasiado distinta de cualquier entrada
+    assert cache.lookup("¿Qué significa el score?") is None
+    assert cache.stats()["faq_hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_negations_and_question_words_do_not_match_other_questions():
+    cache = AnswerCache(faq=FAQ)
+
+    assert cache.lookup("¿Qué NO es IMDADIC?") is None
+    assert cache.lookup("¿Cuántas anomalías hay?") is None
+    assert cache.lookup("¿Por qué es una anomalía?") is None
+    assert cache.lookup("¿Los datos no son reales?") is None
+    assert cache.lookup("¿Dónde funciona la detección?") is None
+    assert cache.lookup("¿Los datos son reales?") == FAQ["¿Los datos son reales?"]
+
+
+def test_stored_answers_are_similar_matched_bounded_and_expire():
+    cache = AnswerCache(max_entries=2, ttl_seconds=60, threshold=0.75)
+    cache.store("¿Cuántos municipios cubre el sistema?", "1.105 municipios.")
+    cache.store("¿Qué modelos de machine learning usan?", "LightGBM e IF.")
+
+    assert cache.lookup("cuantos municipios cubre sistema") == "1.105 municipios."
+    assert cache.lookup("municipios cubiertos por el sistema") is None
+
+    cache.store("¿Qué departamentos cubre?", "32 departamentos.")
+    # La menos usada ("modelos") sale del LRU
+    assert cache.lookup("¿Qué modelos de machine learning usan?") is None
+    assert cache.lookup("¿Cuántos municipios cubre el sistema?") is not None
+
+    for terms in list(cache._entries):
+        cache._entries[terms] = (0.0, cache._entries[terms][1])
+    assert cache.lookup("¿Qué departamentos cubre?") is None
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,179 @@
+"""
+POST /predictions/batch: per-row validation, per-row errors and input order
+The models are replaced by a fake service that labels each predio by its
+value, so the tests check only how the endpoint lays out the results.
+"""
+
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import predictions
+
+PREDIO = {
+    "DEPARTAMENTO": "ANTIOQUIA",
+    "MUNICIPIO": "MEDELLIN",
+    "TIPO_PREDIO_ZONA": "URBANO",
+    "CATEGORIA_RURALIDAD": "Urbano",
+    "ORIP": "001",
+    "ESTADO_FOLIO": "ACTIVO",
+    "YEAR_RADICA": 2023,
+    "NUM_ANOTACION": 5,
+    "Dinámica_Inmobiliaria": 10,
+    "COD_NATUJUR": 125,
+    "COUNT_A": 1,
+    "COUNT_DE": 1,
+    "PREDIOS_NUEVOS": 0,
+    "TIENE_MAS_DE_UN_VALOR": 0,
+    "VALOR_CONSTANTE_2024": 500000000,
+}
+
+
+class FakeService:
+    """Batch methods of PredictionService, one result per row in order"""
+
+    def __init__(self):
+        self.batches = []
+        self.threads = set()
+
+    def _rows(self, predios, result):
+        self.batches.append([p["VALOR_CONSTANTE_2024"] for p in predios])
+        self.threads.add(threading.current_thread().name)
+        return [
+            (
+                {"error": "Municipio desconocido"}
+                if p["MUNICIPIO"] == "GOTHAM"
+                else result(p)
+            )
+            for p in predios
+        ]
+
+    @staticmethod
+    def _clasificacion(predio):
+        return {
+            "rango_precio": f"R{int(predio['VALOR_CONSTANTE_2024'])}",
+            "probabilidades": {"ALTO": 1.0},
+        }
+
+    @staticmethod
+    def _anomalia(predio):
+        anomala = predio["VALOR_CONSTANTE_2024"] > 100
+        return {
+            "anomalia_detectada": anomala,
+            "es_normal": not anomala,
+            "score_anomalia": -predio["VALOR_CONSTANTE_2024"],
+            "prediccion_raw": -1 if anomala else 1,
+        }
+
+    def clasificar_precio_batch(self, predios):
+        return self._rows(predios, self._clasificacion)
+
+    def detectar_anomalia_batch(self, predios):
+        return self._rows(predios, self._anomalia)
+
+    def prediccion_completa_batch(self, predios):
+        return self._rows(
+            predios,
+            lambda p: {
+                "clasificacion": self._clasificacion(p),
+                "deteccion_anomalia": self._anomalia(p),
+            },
+        )
+
+
+@pytest.fixture
+def service(monkeypatch):
+    fake = FakeService()
+    monkeypatch.setattr(predictions, "prediction_service", fake)
+    return fake
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(predictions.router, prefix="/predictions")
+    return TestClient(app)
+
+
+def _predios():
+    return [
+        {**PREDIO, "VALOR_CONSTANTE_2024": 10},
+        {**PREDIO, "VALOR_CONSTANTE_2024": 20, "YEAR_RADICA": 1500},
+        {**PREDIO, "VALOR_CONSTANTE_2024": 30, "MUNICIPIO": "GOTHAM"},
+        {k: v for k, v in PREDIO.items() if k != "ORIP"},
+        {**PREDIO, "VALOR_CONSTANTE_2024": 500},
+    ]
+
+
+def test_batch_reports_row_errors_in_input_order(service, client):
+    response = client.post("/predictions/batch", json={"predios": _predios()})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["total"], data["exitosos"], data["fallidos"]) == (5, 2, 3)
+    resultados = data["resultados"]
+    assert [r["indice"] for r in resultados] == [0, 1, 2, 3, 4]
+
+    assert resultados[0]["clasificacion"]["rango_precio"] == "R10"
+    assert resultados[0]["deteccion_anomalia"]["anomalia_detectada"] is False
+    assert resultados[4]["clasificacion"]["rango_precio"] == "R500"
+    assert resultados[4]["deteccion_anomalia"]["anomalia_detectada"] is True
+    assert resultados[4]["error"] is None
+
+    # Filas inválidas: no llegan al modelo y nombran el campo que falló
+    assert resultados[1]["error"] == "Datos inválidos en: YEAR_RADICA"
+    assert resultados[3]["error"] == "Datos inválidos en: ORIP"
+    # Error del modelo en una fila válida: solo afecta a esa fila
+    assert resultados[2]["error"] == "Municipio desconocido"
+    assert resultados[2]["clasificacion"] is None
+    assert service.batches == [[10, 30, 500]]
+
+
+@pytest.mark.parametrize(
+    "modo, presente, ausente",
+    [
+        ("classify-price", "clasificacion", "deteccion_anomalia"),
+        ("detect-anomaly", "deteccion_anomalia", "clasificacion"),
+    ],
+)
+def test_batch_single_model_modes(service, client, modo, presente, ausente):
+    response = client.post(
+        "/predictions/batch", json={"predios": _predios(), "modo": modo}
+    )
+
+    resultados = response.json()["resultados"]
+    assert [r[presente] is not None for r in resultados] == [
+        True,
+        False,
+        False,
+        False,
+        True,
+    ]
+    assert all(r[ausente] is None for r in resultados)
+
+
+def test_batch_validates_and_scores_on_the_inference_executor(
+    service, client, monkeypatch
+):
+    class RecordingPredioInput(predictions.PredioInput):
+        @classmethod
+        def model_validate(cls, obj, **kwargs):
+            service.threads.add(threading.current_thread().name)
+            return super().model_validate(obj, **kwargs)
+
+    monkeypatch.setattr(predictions, "PredioInput", RecordingPredioInput)
+
+    client.post("/predictions/batch", json={"predios": _predios()})
+
+    # Tanto la validación como los modelos corren fuera del event loop
+    assert service.threads
+    assert all(name.startswith("inference") for name in service.threads)
+
+
+def test_batch_rejects_empty_list(service, client):
+    response = client.post("/predictions/batch", json={"predios": []})
+
+    assert response.status_code == 422
+    assert service.batches == []
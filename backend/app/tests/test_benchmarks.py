@@ -0,0 +1,55 @@
+"""
+Benchmark helpers: synthetic payloads and run comparison
+"""
+
+from app.services.synthetic_predios import generar_predios
+from app.benchmarks.pipeline import compare
+from app.schemas.prediction import PredioInput
+
+
+def test_generated_predios_are_valid_and_reproducible():
+    predios = generar_predios(200, seed=7)
+    for predio in predios:
+        PredioInput.model_validate(predio)
+    assert predios == generar_predios(200, seed=7)
+
+
+def test_compare_flags_only_real_slowdowns():
+    def run(*rows):
+        return {
+            "results": [
+                {"stage": stage, "batch_size": size, "min_s": seconds}
+                for stage, size, seconds in rows
+            ]
+        }
+
+    baseline = run(("encode", 1, 2e-6), ("end_to_end", 1000, 0.10))
+    current = run(("encode", 1, 4e-6), ("end_to_end", 1000, 0.13))
+    rows = {r["stage"]: r for r in compare(baseline, current, threshold=0.15)}
+
+    # 2x más lento pero por debajo del umbral de ruido absoluto
+    assert not rows["encode"]["regression"]
+    assert rows["end_to_end"]["regression"]
+
+
+def test_load_report_percentiles_and_error_rate():
+    import pytest
+
+    from app.benchmarks.loadgen import Recorder, parse_mix
+
+    assert parse_mix("full=3, chat") == {"full": 3.0, "chat": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("unknown=1")
+
+    recorder = Recorder()
+    for ms in range(1, 101):
+        recorder.record("full", ms / 1000, "200" if ms <= 95 else "503")
+    report = recorder.report(elapsed=2.0)
+
+    full = report["endpoints"]["full"]
+    assert full["requests"] == 100
+    assert full["error_rate"] == 0.05
+    assert full["throughput_rps"] == 50
+    assert full["status_codes"] == {"200": 95, "503": 5}
+    assert 50 <= full["latency_ms"]["p50"] <= 51
+    assert 99 <= full["latency_ms"]["p99"] <= 100
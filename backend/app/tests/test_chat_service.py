@@ -0,0 +1,266 @@
+"""
+GeminiService against an in-memory Gemini client (no network)
+"""
+
+import asyncio
+import threading
+import uuid
+
+from google.genai import types
+
+from app.services.chat_service import GeminiService
+from app.services.answer_cache import AnswerCache
+from app.services.history_window import HistoryWindow
+from app.services.knowledge_index import KnowledgeIndex
+from app.services.session_store import SQLiteSessionStore
+from app.tests.helpers import StubGeminiClient
+
+
+def test_concurrent_chats_do_not_serialize():
+    service = GeminiService(api_key=None, system_prompt="Eres un asistente.")
+    # Cada llamada espera a que las 10 estén en curso: en serie no terminaría
+    service.client = StubGeminiClient(release_at=10)
+
+    async def chats(n: int):
+        return await asyncio.gather(
+            *(
+                service.generate_response("hola", session_id=str(uuid.uuid4()))
+                for _ in range(n)
+            )
+        )
+
+    responses = asyncio.run(chats(10))
+
+    assert all(r == "Respuesta simulada para pruebas." for r in responses)
+    assert service.client.aio.models.max_in_flight == 10
+
+
+def test_missing_api_key_only_fails_the_chat():
+    service = GeminiService(api_key=None)
+
+    response = asyncio.run(service.generate_response("hola"))
+
+    assert response.startswith("Lo siento")
+
+
+def _collect(service: GeminiService, session_id: str, stop_after=None):
+    async def run():
+        deltas = []
+        stream = service.stream_response("hola", session_id=session_id)
+        try:
+            async for delta in stream:
+                deltas.append(delta)
+                if stop_after is not None and len(deltas) >= stop_after:
+                    break
+        finally:
+            await stream.aclose()
+        return deltas
+
+    return asyncio.run(run())
+
+
+def test_stream_response_yields_deltas_and_stores_the_answer():
+    service = GeminiService(api_key=None, system_prompt="Eres un asistente.")
+    service.client = StubGeminiClient()
+    session_id = str(uuid.uuid4())
+
+    deltas = _collect(service, session_id)
+
+    assert len(deltas) > 1
+    history = service.session_manager.get_history(session_id)
+    assert history[-1] == {"role": "model", "content": "".join(deltas)}
+
+
+class _RecordingSQLiteStore(SQLiteSessionStore):
+    """Anota el hilo de cada llamada al archivo"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def get_histories(self, session_ids):
+        self.threads.append(threading.current_thread())
+        return super().get_histories(session_ids)
+
+    def add_many(self, batch):
+        self.threads.append(threading.current_thread())
+        return super().add_many(batch)
+
+
+def test_sqlite_sessions_are_read_and_written_off_the_event_loop(tmp_path):
+    store = _RecordingSQLiteStore(tmp_path / "sessions.sqlite3")
+    service = GeminiService(
+        api_key=None, system_prompt="Eres un asistente.", session_store=store
+    )
+    service.client = StubGeminiClient()
+
+    async def chat():
+        loop_thread = threading.current_thread()
+        await service.generate_response("hola", session_id="s1")
+        deltas = [d async for d in service.stream_response("y?", session_id="s1")]
+        return loop_thread, deltas
+
+    loop_thread, deltas = asyncio.run(chat())
+
+    assert deltas and len(store.threads) == 4
+    assert loop_thread not in store.threads
+    assert len(store.get_history("s1")) == 4
+    store.close()
+
+
+def test_interrupted_stream_is_not_stored():
+    service = GeminiService(api_key=None, system_prompt="Eres un asistente.")
+    service.client = StubGeminiClient()
+    session_id = str(uuid.uuid4())
+
+    _collect(service, session_id, stop_after=1)
+
+    assert service.session_manager.get_history(session_id) == []
+
+
+class _ToolCallingModels:
+    """Pide dos herramientas en la primera llamada y responde en la segunda"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def generate_content(self, **kwargs):
+        self.requests.append(kwargs)
+        if len(self.requests) == 1:
+            parts = [
+                types.Part(
+                    function_call=types.FunctionCall(
+                        id="1", name="slow_price", args={"estrato": 4.0}
+                    )
+                ),
+                types.Part(
+                    function_call=types.FunctionCall(
+                        id="2", name="slow_anomaly", args={"municipio": "CALI"}
+                    )
+                ),
+            ]
+        else:
+            parts = [types.Part(text="Rango ALTO, transacción NORMAL.")]
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(content=types.Content(role="model", parts=parts))
+            ]
+        )
+
+
+def test_tool_calls_run_concurrently_with_one_followup():
+    # Cada herramienta espera a la otra: si corrieran en serie la barrera
+    # vencería y el modelo recibiría un error en lugar del resultado
+    both_running = threading.Barrier(2, timeout=5)
+
+    def slow_price(estrato: int):
+        both_running.wait()
+        return f"ALTO (estrato {estrato!r})"
+
+    def slow_anomaly(municipio: str):
+        both_running.wait()
+        return f"NORMAL en {municipio}"
+
+    service = GeminiService(
+        api_key=None,
+        system_prompt="Eres un asistente.",
+        tools=[slow_price, slow_anomaly],
+    )
+    models = _ToolCallingModels()
+    service.client = type("Client", (), {"aio": type("Aio", (), {"models": models})})()
+
+    answer = asyncio.run(service.generate_response("¿Cuánto vale y es normal?"))
+
+    assert answer == "Rango ALTO, transacción NORMAL."
+    assert len(models.requests) == 2
+    responses = models.requests[1]["contents"][-1].parts
+    assert [p.function_response.id for p in responses] == ["1", "2"]
+    assert responses[0].function_response.response == {"result": "ALTO (estrato 4)"}
+    assert responses[1].function_response.response == {"result": "NORMAL en CALI"}
+
+
+def test_long_history_is_sent_as_summary_and_recent_window():
+    service = GeminiService(
+        api_key=None,
+        system_prompt="Eres un asistente.",
+        history_window=HistoryWindow(token_budget=60),
+    )
+    service.client = StubGeminiClient()
+    sent = []
+    generate = service.client.aio.models.generate_content
+
+    def recording_generate(**kwargs):
+        sent.append(kwargs["contents"])
+        return generate(**kwargs)
+
+    service.client.aio.models.generate_content = recording_generate
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Mensaje {i} " * 10}
+        for i in range(10)
+    ]
+
+    asyncio.run(service.generate_response("hola", history=history, history_key="c1"))
+
+    texts = [content.parts[0].text for content in sent[0]]
+    assert texts[0].startswith("Resumen de la conversación anterior:")
+    assert "Eres un asistente." not in texts
+    assert texts[-1] == "hola"
+    assert len(texts) < len(history)
+
+
+def test_retrieved_context_is_sent_on_every_turn():
+    index = KnowledgeIndex(
+        [("Rangos de precio", "BAJO, MEDIO, ALTO, LUJO"), ("Mapas", "Ir a /maps")]
+    )
+    service = GeminiService(
+        api_key=None,
+        system_prompt="Eres un asistente.",
+        knowledge_index_loader=lambda: index,
+    )
+    history = [
+        {"role": "user", "content": "hola"},
+        {"role": "model", "content": "¡Hola!"},
+    ]
+
+    contents = service._build_contents("¿Qué rangos de precio hay?", history)
+
+    preamble = contents[0].parts[0].text
+    assert preamble.startswith("Eres un asistente.")
+    assert "## Rangos de precio" in preamble and "Mapas" not in preamble
+
+
+def test_faq_and_repeated_questions_skip_gemini():
+    service = GeminiService(
+        api_key=None,
+        system_prompt="Eres un asistente.",
+        answer_cache=AnswerCache(faq={"¿Qué es IMDADIC?": "Un sistema del IGAC."}),
+    )
+    service.client = StubGeminiClient()
+    calls = []
+    generate = service.client.aio.models.generate_content
+
+    def counting_generate(**kwargs):
+        calls.append(kwargs)
+        return generate(**kwargs)
+
+    service.client.aio.models.generate_content = counting_generate
+    session_id = str(uuid.uuid4())
+
+    answer = asyncio.run(
+        service.generate_response("que es imdadic", session_id=session_id)
+    )
+    assert answer == "Un sistema del IGAC."
+    assert service.session_manager.get_history(session_id)[-1]["content"] == answer
+
+    asyncio.run(service.generate_response("¿Cómo se calcula el rango de precio?"))
+    asyncio.run(service.generate_response("como se calcula el rango de precio"))
+    assert len(calls) == 1
+
+    # A mitad de conversación no se usa la caché, ni siquiera la FAQ
+    asyncio.run(service.generate_response("que es imdadic", session_id=session_id))
+    asyncio.run(
+        service.generate_response(
+            "como se calcula el rango de precio", session_id=session_id
+        )
+    )
+    assert len(calls) == 3
@@ -0,0 +1,140 @@
+"""
+Per-municipio feature templates and the chat tools that use them
+"""
+
+import json
+from types import SimpleNamespace
+
+import pandas as pd
+
+from app.services import tools
+from app.services.feature_templates import (
+    DEFAULT_FEATURES,
+    TEMPLATES_FILE,
+    FeatureTemplates,
+    build_templates,
+    place_key,
+)
+
+ENCODERS = {
+    "DEPARTAMENTO": ["ANTIOQUIA", "BOGOTÁ D.C.", "NARIÑO"],
+    "MUNICIPIO": ["ABRIAQUÍ", "BOGOTÁ D.C.", "PASTO"],
+}
+
+
+def _models(path):
+    return SimpleNamespace(
+        models_path=path,
+        get_anomaly_artifacts=lambda: {"encoders": ENCODERS},
+    )
+
+
+def test_place_key_ignores_accents_case_and_punctuation():
+    assert place_key("Abriaquí") == place_key("ABRIAQUI") == "ABRIAQUI"
+    assert place_key("nariño") == place_key("NARIÑO")
+    assert place_key("Bogotá") == place_key("BOGOTÁ D.C.") == "BOGOTA D C"
+
+
+def test_templates_from_encoders_fill_defaults(tmp_path):
+    templates = FeatureTemplates.from_models(_models(tmp_path))
+
+    predio = templates.fill("abriaqui", "antioquia", {"VALOR_CONSTANTE_2024": 1e8})
+
+    assert predio["MUNICIPIO"] == "ABRIAQUÍ"
+    assert predio["DEPARTAMENTO"] == "ANTIOQUIA"
+    assert predio["VALOR_CONSTANTE_2024"] == 1e8
+    assert all(predio[f] == v for f, v in DEFAULT_FEATURES.items())
+    # Sin archivo no se conoce el departamento, salvo en Bogotá
+    assert "DEPARTAMENTO" not in templates.fill("Pasto")
+    assert templates.fill("bogota")["DEPARTAMENTO"] == "BOGOTÁ D.C."
+    assert templates.fill("Gotham") is None
+
+
+def test_precomputed_file_takes_precedence(tmp_path):
+    frame = pd.DataFrame(
+        {
+            "DEPARTAMENTO": ["NARIÑO"] * 3 + ["ANTIOQUIA"],
+            "MUNICIPIO": ["PASTO"] * 3 + ["ABRIAQUÍ"],
+            "ORIP": ["240", "240", "241", "007"],
+            "NUM_ANOTACION": [2, 4, 9, 1],
+        }
+    )
+    municipios = build_templates(frame, ["ORIP", "NUM_ANOTACION"])
+    assert municipios[0] == {
+        "DEPARTAMENTO": "NARIÑO",
+        "MUNICIPIO": "PASTO",
+        "ORIP": "240",
+        "NUM_ANOTACION": 4,
+    }
+    (tmp_path / TEMPLATES_FILE).write_text(
+        json.dumps({"municipios": municipios}), encoding="utf-8"
+    )
+
+    predio = FeatureTemplates.from_models(_models(tmp_path)).fill("pasto")
+
+    assert predio["DEPARTAMENTO"] == "NARIÑO" and predio["ORIP"] == "240"
+    assert predio["ESTADO_FOLIO"] == DEFAULT_FEATURES["ESTADO_FOLIO"]
+
+
+def test_repeated_municipio_names_are_resolved_by_departamento():
+    templates = FeatureTemplates(
+        [
+            {"DEPARTAMENTO": "LA GUAJIRA", "MUNICIPIO": "ALBANIA", "ORIP": "210"},
+            {"DEPARTAMENTO": "SANTANDER", "MUNICIPIO": "ALBANIA", "ORIP": "300"},
+            {"DEPARTAMENTO": "NARIÑO", "MUNICIPIO": "PASTO", "ORIP": "240"},
+        ],
+        precomputed=True,
+    )
+
+    assert templates.fill("Albania", "Santander")["ORIP"] == "300"
+    assert templates.fill("albania", "la guajira")["ORIP"] == "210"
+    # Sin departamento el nombre es ambiguo: no se elige una plantilla
+    ambiguous = templates.fill("Albania")
+    assert "DEPARTAMENTO" not in ambiguous
+    assert ambiguous["ORIP"] == DEFAULT_FEATURES["ORIP"]
+    assert templates.fill("Albania", "Antioquia") is None
+    # Un nombre único se resuelve solo
+    assert templates.fill("Pasto")["DEPARTAMENTO"] == "NARIÑO"
+    assert len(templates) == 3
+
+
+def test_tools_run_one_model_call_on_the_filled_predio(tmp_path, monkeypatch):
+    templates = FeatureTemplates.from_models(_models(tmp_path))
+    calls = []
+
+    def detectar_anomalia(predio):
+        calls.append(predio)
+        return {"anomalia_detectada": True, "score_anomalia": -0.71}
+
+    def clasificar_precio(predio):
+        calls.append(predio)
+        return {"rango_precio": "ALTO", "probabilidades": {"ALTO": 0.7, "BAJO": 0.3}}
+
+    monkeypatch.setattr(tools, "get_feature_templates", lambda: templates)
+    monkeypatch.setattr(
+        tools,
+        "prediction_service",
+        SimpleNamespace(
+            detectar_anomalia=detectar_anomalia, clasificar_precio=clasificar_precio
+        ),
+    )
+
+    answer = tools.tool_detect_anomaly(5e9, "Abriaqui", "Antioquia")
+    assert "ANÓMALA" in answer and "ABRIAQUÍ" in answer
+    # Sin plantillas precalculadas la respuesta avisa de los valores genéricos
+    assert "valores genéricos" in answer and "típicos del municipio" not in answer
+    assert calls[-1]["VALOR_CONSTANTE_2024"] == 5e9
+
+    answer = tools.tool_predict_price("Bogotá", zona="rural")
+    assert "ALTO" in answer and "70.0%" in answer
+    assert calls[-1]["TIPO_PREDIO_ZONA"] == "RURAL"
+    assert calls[-1]["CATEGORIA_RURALIDAD"] == "Rural"
+
+    # Sin departamento ni plantilla no se llama al modelo
+    assert "departamento" in tools.tool_predict_price("Pasto")
+    assert "Gotham" in tools.tool_detect_anomaly(1e8, "Gotham")
+    assert len(calls) == 2
+
+    templates.precomputed = True
+    answer = tools.tool_predict_price("Abriaqui", "Antioquia")
+    assert "valores típicos del municipio" in answer
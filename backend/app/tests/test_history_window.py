@@ -0,0 +1,58 @@
+"""
+Token-budgeted history window and rolling summary
+"""
+
+import asyncio
+
+from app.services.history_window import HistoryWindow, message_tokens
+
+
+def _conversation(turns: int):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Pregunta {i}. " + "x" * 80})
+        history.append({"role": "model", "content": f"Respuesta {i}. " + "y" * 80})
+    return history
+
+
+def test_window_fits_the_budget_and_starts_on_a_user_turn():
+    history = _conversation(10)
+    window = HistoryWindow(token_budget=100)
+
+    older, recent = window.split(history)
+
+    assert older + recent == history
+    assert sum(message_tokens(m) for m in recent) <= 100
+    assert recent[0]["role"] == "user"
+    assert window.split(history[:2]) == ([], history[:2])
+
+
+def test_summary_is_cached_until_the_window_moves():
+    window = HistoryWindow(token_budget=100, summary_tokens=200)
+    history = _conversation(6)
+
+    summary, recent = asyncio.run(window.prepare(history, key="s1"))
+    assert "Pregunta 0." in summary and "Pregunta 0. x" not in summary
+    assert window.summary_updates == 1
+
+    asyncio.run(window.prepare(history, key="s1"))
+    assert (window.summary_hits, window.summary_updates) == (1, 1)
+
+    calls = []
+
+    async def summarizer(previous, messages):
+        calls.append(messages)
+        return previous + "\n- nuevo"
+
+    # Dos turnos más; el almacén ya recortó los dos más antiguos
+    history = history[2:] + _conversation(8)[12:]
+    summary, _ = asyncio.run(window.prepare(history, key="s1", summarizer=summarizer))
+
+    # Solo se resumen los mensajes que salieron de la ventana desde la última vez
+    assert [m["content"][:11] for m in calls[0]] == [
+        "Pregunta 5.",
+        "Respuesta 5",
+        "Pregunta 6.",
+        "Respuesta 6",
+    ]
+    assert summary.startswith("- Usuario: Pregunta 0.")
@@ -0,0 +1,110 @@
+"""
+Parity tests: FlatIsolationForest vs sklearn IsolationForest
+"""
+
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from app.models_ml.iforest_scorer import FlatIsolationForest
+
+MODELS_PATH = Path(__file__).resolve().parents[3] / "ml_models" / "v1"
+
+
+def _assert_parity(model, X):
+    flat = FlatIsolationForest.from_estimator(model)
+    expected_scores = model.score_samples(X)
+    expected_labels = model.predict(X)
+
+    # Lote grande (Tree.apply compilado) y filas sueltas (recorrido NumPy)
+    labels, scores = flat.predict_and_score(X)
+    assert np.array_equal(scores, expected_scores)
+    assert np.array_equal(labels, expected_labels)
+
+    for i in range(0, len(X), 97):
+        labels, scores = flat.predict_and_score(X[i : i + 1])
+        assert scores[0] == expected_scores[i]
+        assert labels[0] == expected_labels[i]
+
+
+def test_parity_production_model():
+    """Production Isolation Forest: identical scores and labels, bit for bit"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = joblib.load(MODELS_PATH / "isolation_forest_v1.pkl")
+    rng = np.random.default_rng(0)
+
+    X = rng.normal(size=(5000, model.n_features_in_))
+    X[:, 1] = rng.integers(0, 33, size=5000)
+    X[:, 2] = rng.integers(0, 763, size=5000)
+    with warnings.catch_warnings():
+        # Matriz sin nombres de columnas, igual que la que recibe el scorer
+        warnings.simplefilter("ignore")
+        _assert_parity(model, X)
+
+
+def test_parity_feature_subsampling_and_nan():
+    """Trees fitted on feature subsets, plus missing values in the input"""
+    rng = np.random.default_rng(1)
+    X_train = rng.normal(size=(2000, 6))
+    X_train[rng.random(X_train.shape) < 0.05] = np.nan
+    model = IsolationForest(
+        n_estimators=50, max_features=0.5, contamination=0.05, random_state=0
+    ).fit(X_train)
+
+    X = rng.normal(scale=2.0, size=(3000, 6))
+    X[rng.random(X.shape) < 0.05] = np.nan
+    _assert_parity(model, X)
+
+
+def test_feature_names_reordering():
+    """Input columns in a different order than the fitted feature names"""
+    import pandas as pd
+
+    rng = np.random.default_rng(2)
+    names = ["a", "b", "c", "d"]
+    model = IsolationForest(n_estimators=30, random_state=0).fit(
+        pd.DataFrame(rng.normal(size=(500, 4)), columns=names)
+    )
+    reordered = ["c", "a", "d", "b"]
+    X = pd.DataFrame(rng.normal(size=(200, 4)), columns=names)
+
+    flat = FlatIsolationForest.from_estimator(model, feature_names=reordered)
+    for rows in (slice(0, 200), slice(0, 50)):
+        labels, scores = flat.predict_and_score(X[reordered].iloc[rows].to_numpy())
+        assert np.array_equal(scores, model.score_samples(X.iloc[rows]))
+        assert np.array_equal(labels, model.predict(X.iloc[rows]))
+
+
+def test_save_and_memory_mapped_load(tmp_path):
+    """Arrays saved as .npy and memory-mapped back score identically"""
+    rng = np.random.default_rng(3)
+    model = IsolationForest(n_estimators=40, random_state=0).fit(
+        rng.normal(size=(1000, 5))
+    )
+    X = rng.normal(scale=2.0, size=(600, 5))
+    flat = FlatIsolationForest.from_estimator(model)
+    flat.save(tmp_path / "iforest")
+
+    loaded_trees = []
+
+    def trees_loader():
+        loaded_trees.append(True)
+        return FlatIsolationForest.compiled_trees(model)
+
+    mapped = FlatIsolationForest.load(tmp_path / "iforest", trees_loader=trees_loader)
+    assert isinstance(mapped.children, np.memmap)
+
+    # Filas sueltas: recorrido NumPy sobre los arreglos mapeados, sin árboles
+    labels, scores = mapped.predict_and_score(X[:5])
+    assert np.array_equal(scores, model.score_samples(X[:5]))
+    assert not loaded_trees
+
+    # Lote grande: los árboles compilados se cargan en ese momento
+    labels, scores = mapped.predict_and_score(X)
+    assert np.array_equal(scores, model.score_samples(X))
+    assert np.array_equal(labels, model.predict(X))
+    assert loaded_trees == [True]
@@ -0,0 +1,78 @@
+"""
+BM25 retrieval over the chat knowledge base
+"""
+
+import math
+
+from app.services import knowledge_index
+from app.services.knowledge_base import FAQ, get_chunks
+from app.services.knowledge_index import KnowledgeIndex, tokenize
+
+
+def test_tokenize_ignores_accents_plurals_and_stopwords():
+    assert tokenize("¿Qué son las Anomalías?") == ["anomalia"]
+    assert tokenize("precios de los predios") == ["precio", "predio"]
+
+
+def test_faq_questions_retrieve_their_own_chunk():
+    index = KnowledgeIndex(get_chunks())
+
+    for question in FAQ:
+        assert index.search(question, k=1)[0][1] == question
+
+    titles = [title for _, title, _ in index.search("niveles de severidad del score")]
+    assert "Niveles de severidad y score de anomalía" in titles
+    assert index.search("xyzzy") == []
+    assert index.context("xyzzy") == ""
+
+
+def test_search_only_tokenizes_the_query(monkeypatch):
+    # Los chunks se tokenizan al construir el índice, nunca al buscar
+    index = KnowledgeIndex(get_chunks())
+    tokenized = []
+    real_tokenize = knowledge_index.tokenize
+
+    def counting_tokenize(text, *args, **kwargs):
+        tokenized.append(text)
+        return real_tokenize(text, *args, **kwargs)
+
+    monkeypatch.setattr(knowledge_index, "tokenize", counting_tokenize)
+    index.context("¿Cómo uso el mapa de anomalías?")
+
+    assert tokenized == ["¿Cómo uso el mapa de anomalías?"]
+
+
+def test_precomputed_weights_match_bm25():
+    chunks = [
+        ("Rangos de precio", "BAJO, MEDIO, ALTO y LUJO según el precio"),
+        ("Mapas", "El mapa de anomalías muestra los municipios"),
+        ("Anomalías", "Una anomalía es una transacción atípica"),
+    ]
+    k1, b = 1.5, 0.75
+    index = KnowledgeIndex(chunks, k1=k1, b=b)
+    documents = [tokenize(f"{title} {title} {text}") for title, text in chunks]
+    average = sum(map(len, documents)) / len(documents)
+
+    def bm25(query, terms):
+        score = 0.0
+        for term in set(tokenize(query)):
+            containing = sum(term in doc for doc in documents)
+            if not containing:
+                continue
+            idf = math.log(1 + (len(documents) - containing + 0.5) / (containing + 0.5))
+            tf = terms.count(term)
+            score += (
+                idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(terms) / average))
+            )
+        return score
+
+    query = "anomalías en el mapa de precio"
+    expected = sorted(
+        ((bm25(query, terms), chunks[i][0]) for i, terms in enumerate(documents)),
+        reverse=True,
+    )
+    results = index.search(query, k=3, min_ratio=0)
+
+    assert [title for _, title, _ in results] == [title for _, title in expected]
+    for (score, _, _), (expected_score, _) in zip(results, expected):
+        assert math.isclose(score, expected_score)
@@ -0,0 +1,56 @@
+"""
+Prometheus text rendering of the hand-rolled metrics
+"""
+
+from app.core.metrics import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        "latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)
+    )
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, route="/x")
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/x",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/x"} 4' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+
+
+def test_counters_gauges_and_label_escaping():
+    registry = MetricsRegistry()
+    counter = registry.counter("calls_total", "Calls", ("name",))
+    counter.inc(name='a"b')
+    counter.inc(2, name='a"b')
+    registry.gauge_callback("queue_depth", "Queue", lambda: 7)
+    registry.gauge_callback("broken", "Broken", lambda: 1 / 0)
+
+    text = registry.render()
+    assert 'calls_total{name="a\\"b"} 3' in text
+    assert "queue_depth 7" in text
+    # Un callback que falla se omite sin romper el resto
+    assert "broken" not in text
+
+
+def test_non_finite_gauges_render_and_bad_values_are_skipped():
+    registry = MetricsRegistry()
+    registry.gauge_callback("nan_gauge", "NaN", lambda: float("nan"))
+    registry.gauge_callback("low_gauge", "-Inf", lambda: float("-inf"))
+    registry.gauge_callback(
+        "per_shard", "Shards", lambda: {("a",): float("inf"), ("b",): 2}, ("shard",)
+    )
+    registry.gauge_callback("text_gauge", "Not a number", lambda: "lleno")
+    registry.gauge_callback("after", "After", lambda: 1)
+
+    lines = registry.render().splitlines()
+    assert "nan_gauge NaN" in lines
+    assert "low_gauge -Inf" in lines
+    assert 'per_shard{shard="a"} +Inf' in lines
+    assert 'per_shard{shard="b"} 2' in lines
+    # Un valor que no se puede formatear se omite sin romper el resto
+    assert not any("text_gauge" in line for line in lines)
+    assert "after 1" in lines
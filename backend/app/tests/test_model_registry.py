@@ -0,0 +1,191 @@
+"""
+ModelRegistry: version discovery, atomic activation and rollback
+"""
+
+import threading
+
+import pytest
+
+from app.models_ml.model_loader import (
+    ARTIFACT_FILES,
+    ActivationInProgressError,
+    MLModels,
+    ModelRegistry,
+)
+
+
+def _make_version(root, name):
+    version_dir = root / name
+    version_dir.mkdir()
+    for template in ARTIFACT_FILES.values():
+        (version_dir / template.format(version=name)).write_bytes(b"")
+    return version_dir
+
+
+def test_discover_orders_versions_numerically(tmp_path):
+    for name in ("v10", "v2", "v1"):
+        _make_version(tmp_path, name)
+    (tmp_path / "notes").mkdir()
+
+    registry = ModelRegistry(tmp_path)
+    assert list(registry.discover()) == ["v1", "v2", "v10"]
+
+    # Sin versión explícita se activa la más reciente
+    registry.load_models()
+    assert registry.active().name == "v10"
+
+
+def test_activate_swaps_and_rollback_restores(tmp_path):
+    _make_version(tmp_path, "v1")
+    _make_version(tmp_path, "v2")
+    registry = ModelRegistry(tmp_path)
+    registry.load_models(version="v1")
+
+    # Una petición en curso conserva la versión que tomó al empezar
+    snapshot = registry.active()
+    registry.activate("v2", warmup=False)
+    assert snapshot.name == "v1"
+    assert registry.active().name == "v2"
+    assert registry.previous_versions() == ["v1"]
+
+    assert registry.rollback(warmup=False).name == "v1"
+    assert registry.active() is snapshot
+    with pytest.raises(ValueError):
+        registry.rollback(warmup=False)
+
+
+def test_failed_activation_keeps_active_version(tmp_path):
+    _make_version(tmp_path, "v1")
+    broken = _make_version(tmp_path, "v2")
+    next(broken.iterdir()).unlink()
+    registry = ModelRegistry(tmp_path)
+    registry.load_models(version="v1")
+
+    with pytest.raises(FileNotFoundError):
+        registry.activate("v2", warmup=False)
+    assert registry.active().name == "v1"
+    states = {v["version"]: v["state"] for v in registry.list_versions()}
+    assert states == {"v1": "active", "v2": "failed"}
+
+
+def test_admin_endpoints_fail_closed(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.v1 import admin
+    from app.core.config import settings
+
+    _make_version(tmp_path, "v1")
+    registry = ModelRegistry(tmp_path)
+    registry.load_models(version="v1")
+    monkeypatch.setattr(admin, "ml_models", registry)
+    app = FastAPI()
+    app.include_router(admin.router)
+    client = TestClient(app)
+
+    # Sin ADMIN_TOKEN configurado nadie puede administrar los modelos
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+    assert client.post("/models/rollback").status_code == 403
+    assert client.get("/models", headers={"X-Admin-Token": ""}).status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3creto")
+    assert client.get("/models").status_code == 401
+    assert client.get("/models", headers={"X-Admin-Token": "otro"}).status_code == 401
+    response = client.get("/models", headers={"X-Admin-Token": "s3creto"})
+    assert response.status_code == 200
+    assert response.json()["active_version"] == "v1"
+
+
+def _blocking_loads(monkeypatch):
+    """Make MLModels.load_models wait until the returned event is set"""
+    release = threading.Event()
+    load_models = MLModels.load_models
+
+    def blocking_load(self, eager=False):
+        assert release.wait(timeout=5)
+        return load_models(self, eager)
+
+    monkeypatch.setattr(MLModels, "load_models", blocking_load)
+    return release
+
+
+def test_activation_slot_is_claimed_atomically(tmp_path, monkeypatch):
+    for name in ("v1", "v2", "v3"):
+        _make_version(tmp_path, name)
+    registry = ModelRegistry(tmp_path)
+    registry.load_models(version="v1")
+    registry.activate("v2", warmup=False)
+    release = _blocking_loads(monkeypatch)
+
+    thread = registry.start_activation("v3", warmup=False)
+    assert registry.is_activating()
+    # Mientras tanto nadie más entra ni toca el historial
+    with pytest.raises(ActivationInProgressError):
+        registry.start_activation("v3", warmup=False)
+    with pytest.raises(ActivationInProgressError):
+        registry.rollback(warmup=False, blocking=False)
+    assert registry.previous_versions() == ["v1"]
+    with pytest.raises(KeyError):
+        registry.start_activation("v9")
+
+    release.set()
+    thread.join(timeout=5)
+    assert registry.active().name == "v3"
+    assert registry.previous_versions() == ["v1", "v2"]
+    assert not registry.is_activating()
+
+
+def test_concurrent_rollbacks_pop_one_version_each(tmp_path):
+    for name in ("v1", "v2", "v3"):
+        _make_version(tmp_path, name)
+    registry = ModelRegistry(tmp_path)
+    registry.load_models(version="v1")
+    registry.activate("v2", warmup=False)
+    registry.activate("v3", warmup=False)
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(registry.rollback(warmup=False).name)
+        )
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert sorted(results) == ["v1", "v2"]
+    assert registry.active().name == "v1"
+    assert registry.previous_versions() == []
+
+
+def test_second_activation_request_gets_409(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.v1 import admin
+    from app.core.config import settings
+
+    _make_version(tmp_path, "v1")
+    _make_version(tmp_path, "v2")
+    registry = ModelRegistry(tmp_path)
+    registry.load_models(version="v1")
+    monkeypatch.setattr(admin, "ml_models", registry)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3creto")
+    app = FastAPI()
+    app.include_router(admin.router)
+    client = TestClient(app, headers={"X-Admin-Token": "s3creto"})
+    monkeypatch.setattr(MLModels, "warmup", lambda self: None)
+    release = _blocking_loads(monkeypatch)
+
+    assert client.post("/models/v2/activate").status_code == 202
+    assert client.post("/models/v2/activate").status_code == 409
+    assert client.post("/models/rollback").status_code == 409
+    assert client.post("/models/v7/activate").status_code == 404
+
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name == "activate-v2":
+            thread.join(timeout=5)
+    assert client.get("/models").json()["active_version"] == "v2"
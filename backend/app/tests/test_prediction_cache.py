@@ -0,0 +1,24 @@
+"""
+Prediction result cache across model versions
+"""
+
+from app.services.prediction_cache import PredictionCache
+
+
+def test_versions_share_the_cache_without_invalidating_each_other():
+    cache = PredictionCache(max_entries=3, ttl_seconds=60)
+    old_key = cache.make_key("clasificacion", "v1", ["ANTIOQUIA", 5.0])
+    new_key = cache.make_key("clasificacion", "v2", ["ANTIOQUIA", 5.0])
+    assert old_key != new_key
+
+    # Durante un cambio de versión se intercalan peticiones de ambas
+    cache.set(new_key, {"rango_precio": "ALTO"})
+    cache.set(old_key, {"rango_precio": "MEDIO"})
+    assert cache.get(new_key) == {"rango_precio": "ALTO"}
+    assert cache.get(old_key) == {"rango_precio": "MEDIO"}
+
+    # Las entradas de la versión anterior salen por LRU
+    for i in range(3):
+        cache.set(cache.make_key("clasificacion", "v2", [i]), {"rango_precio": "BAJO"})
+    assert cache.get(old_key) is None
+    assert cache.stats()["evictions"] == 2
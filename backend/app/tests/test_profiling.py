@@ -0,0 +1,134 @@
+"""
+Opt-in request profiling middleware
+"""
+
+import asyncio
+import cProfile
+import json
+import pstats
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.executor import InferenceExecutor
+from app.core import profiling
+from app.core.profiling import ProfilingMiddleware
+
+
+def _trabajo_pesado(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def _app(tmp_path, **kwargs) -> FastAPI:
+    app = FastAPI()
+    executor = InferenceExecutor(max_workers=1, max_queue=4)
+
+    @app.post("/api/v1/predictions/full")
+    async def full(payload: dict):
+        return {"total": await executor.run(_trabajo_pesado, payload["n"])}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    app.add_middleware(
+        ProfilingMiddleware, enabled=True, directory=str(tmp_path), **kwargs
+    )
+    return app
+
+
+def test_header_profiles_request_including_executor_work(tmp_path, monkeypatch):
+    client = TestClient(_app(tmp_path))
+
+    assert client.post("/api/v1/predictions/full", json={"n": 1000}).status_code == 200
+    # Sin ADMIN_TOKEN configurado, o con otro valor, la cabecera se ignora
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+    client.post("/api/v1/predictions/full", json={"n": 1}, headers={"X-Profile": "1"})
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3creto")
+    client.post("/api/v1/predictions/full", json={"n": 1}, headers={"X-Profile": "1"})
+    assert list(tmp_path.iterdir()) == []
+
+    response = client.post(
+        "/api/v1/predictions/full",
+        json={"n": 1000},
+        headers={"X-Profile": "s3creto"},
+    )
+    assert response.status_code == 200
+
+    (profile,) = tmp_path.glob("*.prof")
+    meta = json.loads(profile.with_suffix(".json").read_text())
+    assert meta["route"] == "/api/v1/predictions/full"
+    assert meta["status"] == 200
+    assert meta["reason"] == "header"
+    assert meta["worker_calls"] == 1
+    assert len(meta["payload_sha256"]) == 64
+    # El trabajo del hilo del ejecutor queda en el mismo perfil
+    functions = {f for _, _, f in pstats.Stats(str(profile)).stats}
+    assert "_trabajo_pesado" in functions
+
+
+def test_sampling_is_bounded_and_scoped(tmp_path):
+    client = TestClient(_app(tmp_path, sample_rate=1.0, max_per_minute=2))
+
+    for _ in range(5):
+        client.post("/api/v1/predictions/full", json={"n": 10})
+    client.get("/health", headers={"X-Profile": "1"})
+
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+
+
+class _PerfiladorUnico(cProfile.Profile):
+    """Como cProfile en Python 3.12+: un solo perfilador activo por proceso"""
+
+    activos = 0
+
+    def enable(self, *args, **kwargs):
+        if _PerfiladorUnico.activos:
+            raise ValueError("Another profiling tool is already active")
+        _PerfiladorUnico.activos += 1
+        super().enable(*args, **kwargs)
+
+    def disable(self):
+        super().disable()
+        _PerfiladorUnico.activos -= 1
+
+
+def _calculo_ajeno() -> int:
+    return sum(range(1000))
+
+
+def test_profilers_never_nest_and_other_coroutines_are_left_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling.cProfile, "Profile", _PerfiladorUnico)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3creto")
+    app = FastAPI()
+    executor = InferenceExecutor(max_workers=2, max_queue=4)
+
+    async def otra_peticion():
+        await asyncio.sleep(0)
+        return _calculo_ajeno()
+
+    @app.post("/api/v1/predictions/full")
+    async def full(payload: dict):
+        ajena = asyncio.create_task(otra_peticion())
+        totales = await asyncio.gather(
+            executor.run(_trabajo_pesado, payload["n"]),
+            executor.run(_trabajo_pesado, payload["n"]),
+        )
+        await ajena
+        return {"total": sum(totales)}
+
+    app.add_middleware(ProfilingMiddleware, enabled=True, directory=str(tmp_path))
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/v1/predictions/full", json={"n": 50000}, headers={"X-Profile": "s3creto"}
+    )
+
+    assert response.status_code == 200
+    (profile,) = tmp_path.glob("*.prof")
+    assert json.loads(profile.with_suffix(".json").read_text())["worker_calls"] == 2
+    functions = {f for _, _, f in pstats.Stats(str(profile)).stats}
+    assert {"full", "_trabajo_pesado"} <= functions
+    # La corrutina de otra tarea corre entre los pasos del handler, sin perfilar
+    assert "_calculo_ajeno" not in functions
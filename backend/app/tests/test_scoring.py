@@ -0,0 +1,161 @@
+"""
+Offline bulk scoring: chunk order, checkpoints and resume
+The process pool is replaced by a thread pool and the models by a small fake
+service, so the tests exercise only the chunking and checkpoint logic.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from app import scoring
+
+ROWS = 23
+CHUNK_SIZE = 5
+
+
+class FakeService:
+    """Deterministic stand-in for PredictionService.prediccion_completa_batch"""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.scored_ids = []
+        self.lock = threading.Lock()
+
+    def prediccion_completa_batch(self, chunk):
+        ids = chunk["ID"].tolist()
+        with self.lock:
+            self.scored_ids.extend(ids)
+        if self.fail_at is not None and self.fail_at in ids:
+            raise RuntimeError("worker murió")
+        results = []
+        for row in chunk.itertuples():
+            if row.VALOR_CONSTANTE_2024 < 0:
+                results.append({"error": "valor negativo"})
+                continue
+            results.append(
+                {
+                    "clasificacion": {"rango_precio": f"R{row.ID % 4}"},
+                    "deteccion_anomalia": {
+                        "anomalia_detectada": row.ID % 3 == 0,
+                        "score_anomalia": -row.ID / 100,
+                    },
+                }
+            )
+        return results
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    """Run the workers as threads sharing one fake service"""
+    service = FakeService()
+
+    def init_worker(models_path):
+        scoring._worker_service = service
+
+    monkeypatch.setattr(scoring, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(scoring, "_init_worker", init_worker)
+    return service
+
+
+@pytest.fixture
+def input_csv(tmp_path):
+    path = tmp_path / "transacciones.csv"
+    pd.DataFrame(
+        {
+            "ID": range(ROWS),
+            "ORIP": [f"{i:03d}" for i in range(ROWS)],
+            "VALOR_CONSTANTE_2024": [-1.0 if i == 7 else i * 1e6 for i in range(ROWS)],
+        }
+    ).to_csv(path, index=False)
+    return path
+
+
+def _score(input_csv, output, **kwargs):
+    return scoring.score_file(input_csv, output, chunk_size=CHUNK_SIZE, **kwargs)
+
+
+def test_chunks_are_written_in_input_order(fake_pool, input_csv, tmp_path):
+    # El primer lote termina después del segundo: el orden de salida no cambia
+    second_done = threading.Event()
+    batch = fake_pool.prediccion_completa_batch
+
+    def out_of_order(chunk):
+        if chunk["ID"].iat[0] == 0:
+            assert second_done.wait(timeout=10)
+        result = batch(chunk)
+        if chunk["ID"].iat[0] == CHUNK_SIZE:
+            second_done.set()
+        return result
+
+    fake_pool.prediccion_completa_batch = out_of_order
+    output = tmp_path / "salida.csv"
+
+    checkpoint = _score(input_csv, output, workers=2)
+
+    scored = pd.read_csv(output, dtype={"ORIP": str})
+    assert scored["ID"].tolist() == list(range(ROWS))
+    assert scored["ORIP"].iat[1] == "001"
+    assert checkpoint["rows_done"] == ROWS
+    assert checkpoint["chunks_done"] == -(-ROWS // CHUNK_SIZE)
+    # La fila con error no tiene resultados pero conserva su posición
+    assert scored.loc[7, "ERROR_SCORING"] == "valor negativo"
+    assert scored.loc[7, ["rango_precio", "ES_ANOMALIA"]].isna().all()
+    assert scored.loc[6, "rango_precio"] == "R2" and scored.loc[6, "ES_ANOMALIA"] == 1
+    assert not scoring._checkpoint_path(output).exists()
+
+
+def test_interrupted_run_resumes_without_duplicates_or_gaps(
+    fake_pool, input_csv, tmp_path
+):
+    expected = tmp_path / "completo.csv"
+    _score(input_csv, expected, workers=1)
+
+    output = tmp_path / "salida.csv"
+    fake_pool.fail_at = 12  # tercer lote
+    with pytest.raises(RuntimeError):
+        _score(input_csv, output, workers=1)
+
+    checkpoint = scoring._load_checkpoint(output, input_csv, CHUNK_SIZE)
+    assert checkpoint["chunks_done"] == 2 and checkpoint["rows_done"] == 10
+    # Escritura parcial posterior al checkpoint: se descarta al reanudar
+    with open(output, "a", encoding="utf-8") as f:
+        f.write("10,010,1000")
+
+    fake_pool.fail_at = None
+    fake_pool.scored_ids.clear()
+    _score(input_csv, output, workers=1, resume=True)
+
+    # Solo se vuelven a puntuar las filas sin escribir
+    assert sorted(fake_pool.scored_ids) == list(range(10, ROWS))
+    assert output.read_bytes() == expected.read_bytes()
+    scored = pd.read_csv(output)
+    assert scored["ID"].tolist() == list(range(ROWS))
+    assert not scoring._checkpoint_path(output).exists()
+
+
+def test_resume_without_checkpoint_starts_over(fake_pool, input_csv, tmp_path):
+    output = tmp_path / "salida.csv"
+    output.write_text("basura de otra ejecución\n", encoding="utf-8")
+
+    _score(input_csv, output, workers=2, resume=True)
+
+    assert pd.read_csv(output)["ID"].tolist() == list(range(ROWS))
+
+
+def test_resume_rejects_checkpoint_of_another_run(fake_pool, input_csv, tmp_path):
+    output = tmp_path / "salida.csv"
+    fake_pool.fail_at = 0
+    with pytest.raises(RuntimeError):
+        _score(input_csv, output, workers=1)
+    # El primer lote falló: el checkpoint inicial no existe todavía
+    assert not scoring._checkpoint_path(output).exists()
+
+    fake_pool.fail_at = 20
+    with pytest.raises(RuntimeError):
+        _score(input_csv, output, workers=1)
+
+    with pytest.raises(ValueError):
+        scoring.score_file(input_csv, output, chunk_size=7, resume=True)
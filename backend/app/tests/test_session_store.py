@@ -0,0 +1,182 @@
+"""
+Chat session stores: in-memory LRU and the shared SQLite backend
+"""
+
+import sqlite3
+import threading
+
+from app.services.session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+def test_memory_store_evicts_least_recently_used():
+    manager = InMemorySessionStore(max_sessions=2)
+    manager.add_message("a", "user", "hola")
+    manager.add_message("b", "user", "hola")
+    manager.get_history("a")  # "a" pasa a ser la más reciente
+    manager.add_message("c", "user", "hola")
+
+    assert list(manager.sessions) == ["a", "c"]
+    assert manager.memory_usage()["evictions"] == 1
+
+
+def test_memory_store_caps_history_and_total_bytes():
+    manager = InMemorySessionStore(max_session_bytes=30, max_total_bytes=50)
+    for i in range(5):
+        manager.add_message("a", "user", f"mensaje {i}")  # 13 bytes cada uno
+
+    history = manager.get_history("a")
+    assert [m["content"] for m in history] == ["mensaje 3", "mensaje 4"]
+    assert manager.total_bytes == 26
+
+    manager.add_messages("b", [{"role": "user", "content": "x" * 30}])
+    # Sobre el tope global: se expulsa la sesión menos usada
+    assert list(manager.sessions) == ["b"]
+    assert manager.memory_usage() == {
+        "sessions": 1,
+        "messages": 1,
+        "bytes": 34,
+        "evictions": 1,
+    }
+
+
+def test_memory_store_expires_idle_sessions():
+    manager = InMemorySessionStore(session_timeout=60)
+    manager.add_message("a", "user", "hola")
+    manager.sessions["a"].last_activity -= 120
+
+    assert manager.get_history("a") == []
+    assert manager.total_bytes == 0
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    worker_a = SQLiteSessionStore(path)
+    worker_b = SQLiteSessionStore(path)
+
+    worker_a.add_messages(
+        "s1",
+        [{"role": "user", "content": "hola"}, {"role": "model", "content": "¡Hola!"}],
+    )
+    worker_b.add_many({"s1": [{"role": "user", "content": "precio"}], "s2": []})
+
+    histories = worker_a.get_histories(["s1", "s2", "missing"])
+    assert [m["content"] for m in histories["s1"]] == ["hola", "¡Hola!", "precio"]
+    assert histories["s2"] == []
+    assert "missing" not in histories
+    assert worker_b.sample_usage()["sessions"] == 2
+
+    worker_b.delete("s1")
+    assert worker_a.get_history("s1") == []
+    worker_a.close()
+    worker_b.close()
+
+
+def test_sqlite_store_caps_history_and_expires(tmp_path):
+    store = SQLiteSessionStore(
+        tmp_path / "sessions.sqlite3", session_timeout=60, max_session_bytes=30
+    )
+    for i in range(5):
+        store.add_message("a", "user", f"mensaje {i}")  # 13 bytes cada uno
+    assert [m["content"] for m in store.get_history("a")] == ["mensaje 3", "mensaje 4"]
+    assert store.sample_usage()["bytes"] == 26
+
+    connection = store._connection()
+    connection.execute("UPDATE chat_sessions SET last_activity = last_activity - 120")
+    assert store.get_history("a") == []
+
+    # Una sesión vencida empieza de cero
+    store.add_message("a", "user", "otra vez")
+    assert [m["content"] for m in store.get_history("a")] == ["otra vez"]
+    store.close()
+
+
+def test_sqlite_store_purges_least_recently_used(tmp_path):
+    store = SQLiteSessionStore(
+        tmp_path / "sessions.sqlite3", max_sessions=2, touch_interval=0
+    )
+    for session_id in ("a", "b", "c"):
+        store.add_message(session_id, "user", "hola")
+    store.get_history("a")
+
+    assert store.purge() == 1
+    assert set(store.get_histories(["a", "b", "c"])) == {"a", "c"}
+    store.close()
+
+
+def test_sqlite_store_purges_in_the_background(tmp_path):
+    store = SQLiteSessionStore(
+        tmp_path / "sessions.sqlite3", max_sessions=1, purge_interval=0
+    )
+    purge = store.purge
+    threads = []
+
+    def recording_purge(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return purge(*args, **kwargs)
+
+    store.purge = recording_purge
+    store.add_message("a", "user", "hola")
+    store._maintenance_thread.join()
+    store.add_message("b", "user", "hola")
+    store._maintenance_thread.join()
+
+    assert threads and threading.current_thread() not in threads
+    assert set(store.get_histories(["a", "b"])) == {"b"}
+    store.close()
+
+
+def test_sqlite_store_usage_is_sampled_off_the_scrape(tmp_path):
+    store = SQLiteSessionStore(tmp_path / "sessions.sqlite3", purge_interval=3600)
+    store.add_message("a", "user", "hola")
+    store._maintenance_thread.join()
+
+    assert store.memory_usage() == {
+        "sessions": 1,
+        "messages": 1,
+        "bytes": 8,
+        "evictions": 0,
+    }
+    # Hasta la siguiente muestra se devuelve la anterior, sin consultar el archivo
+    store.add_message("b", "user", "hola")
+    assert store.memory_usage()["sessions"] == 1
+    store._sampled_at = 0.0
+    store.memory_usage()
+    store._maintenance_thread.join()
+    assert store.memory_usage()["sessions"] == 2
+    store.close()
+
+
+def test_sqlite_store_reads_do_not_wait_for_writers(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    store = SQLiteSessionStore(path)
+    store.add_message("a", "user", "hola")
+
+    # Otro worker con una transacción de escritura abierta
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO chat_sessions VALUES ('b', 0, 0)")
+    try:
+        assert store.get_history("a") == [{"role": "user", "content": "hola"}]
+        assert store.get_history("b") == []
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+    store.close()
+
+
+def test_sqlite_store_concurrent_writers(tmp_path):
+    store = SQLiteSessionStore(tmp_path / "sessions.sqlite3")
+
+    def write(worker: int):
+        for i in range(20):
+            store.add_message(f"s{worker}", "user", f"mensaje {i}")
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    histories = store.get_histories([f"s{n}" for n in range(4)])
+    assert all(len(history) == 20 for history in histories.values())
+    store.close()
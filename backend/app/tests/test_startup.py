@@ -0,0 +1,51 @@
+"""
+Cold start: lazy heavy imports, startup timings and readiness
+"""
+
+import os
+import subprocess
+import sys
+
+from app.core.readiness import WARMUP_FAILED, WARMUP_SKIPPED, Readiness
+from app.core.startup import StartupReport
+
+HEAVY_MODULES = ("pandas", "numpy", "joblib", "lightgbm", "sklearn", "google.genai")
+
+
+def test_services_import_without_heavy_modules_or_gemini_key():
+    env = {**os.environ, "GEMINI_API_KEY": ""}
+    code = (
+        "import sys, app.api.v1.predictions\n"
+        "from app.services.chat_service import gemini_service\n"
+        "assert gemini_service._client is None\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+
+def test_startup_report_stages():
+    report = StartupReport()
+    report.record("import", 0.5)
+    with report.stage("model_load"):
+        pass
+
+    stages = report.as_dict()
+    assert list(stages) == ["import", "model_load", "total"]
+    assert stages["total"] >= 0.5
+    assert "import 500 ms" in report.summary()
+
+
+def test_readiness_waits_for_warmup():
+    state = Readiness()
+    assert not state.warmed_up
+
+    state.set_warmup(WARMUP_FAILED, "boom")
+    assert not state.warmed_up
+    assert state.as_dict() == {"status": "failed", "error": "boom"}
+
+    state.set_warmup(WARMUP_SKIPPED)
+    assert state.warmed_up